@@ -2,6 +2,15 @@ import sys
 if sys.version_info[0] < 3:
     raise Exception('Python 3 or newer is required.')
 
-from ._medinx import parse_folder, _load_metadata, format_values, unformat_values
-from ._medinx import MetadataIndex
+from ._medinx import parse_folder, aparse_folder, iter_folder, _load_metadata, format_values, unformat_values
+from ._medinx import convert_sidecars, import_xattrs, export_xattrs
+from ._medinx import MetadataIndex, IndexSnapshot, ReadOnlyIndex
+from ._medinx import StaleSnapshot, InvalidSnapshot, LoadError
+from ._tree import DirTree
+from ._views import SavedView
+from ._events import ChangeEvent
+from ._farm import SymlinkFarm, InvalidFarm
 
+from ._sqlite import SQLiteIndex
+from ._lint import lint_folder
+from ._daemon import IndexDaemon, DaemonClient, DaemonError
@@ -0,0 +1,66 @@
+"""
+Helpers to run blocking index operations from asyncio code.
+
+File I/O and parsing are offloaded to an executor (the default one of the
+loop if None is given) in batches, so that the event loop stays responsive
+and the number of pending jobs is bounded. Cancelling the awaiting task
+cancels batches that have not started yet; running batches finish but
+their results are dropped.
+
+asyncio is imported on first use, so that synchronous programs do not pay
+for it.
+"""
+# Number of items processed by one executor job
+BATCH_SIZE = 256
+
+# Maximum number of batches submitted to the executor at a time
+MAX_CONCURRENCY = 4
+
+async def run(func, *args, executor=None):
+    """ Run func(*args) in given executor and return its result """
+    import asyncio
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(executor, func, *args)
+
+async def map_batches(func, items, executor=None, max_concurrency=MAX_CONCURRENCY,
+                      batch_size=BATCH_SIZE, progress=None):
+    """
+    Apply func to all items in given executor and return results in order.
+
+    Args:
+        - func (callable): blocking function of one item
+        - items (list): items to process
+        - executor (concurrent.futures.Executor): if None, use the default
+                                                  executor of the loop
+        - max_concurrency (int): maximum number of batches submitted at
+                                 a time
+        - batch_size (int): number of items processed by one job
+        - progress (callable): called with (nb_done, nb_items) in the loop
+                               thread each time a batch completes
+    """
+    import asyncio
+    loop = asyncio.get_event_loop()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    nb_done = 0
+
+    def process(batch):
+        return [func(item) for item in batch]
+
+    async def process_batch(batch):
+        nonlocal nb_done
+        async with semaphore:
+            results = await loop.run_in_executor(executor, process, batch)
+        nb_done += len(batch)
+        if progress is not None:
+            progress(nb_done, len(items))
+        return results
+
+    batches = [items[i:i+batch_size] for i in range(0, len(items), batch_size)]
+    tasks = [asyncio.ensure_future(process_batch(batch)) for batch in batches]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    return [result for batch_results in results for result in batch_results]
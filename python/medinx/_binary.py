@@ -0,0 +1,113 @@
+"""
+Binary sidecar files (.mdfb), an alternative to JSON .mdf files.
+
+Values are stored with their type, so that they are read without text
+decoding of numbers and dates, nor schema validation. JSON stays the
+interchange format: see MetadataIndex.save for the format written and
+convert_sidecars to switch a folder from one format to the other.
+
+Layout (little-endian):
+    - magic (4 bytes), format version (u8), number of attributes (u32)
+    - for each attribute: name (u16 size, then utf-8), type code (u8, see
+      _dump.TYPE_CODES), number of values (u32), then the values:
+      u32 size and utf-8 for str, f64 for float, u8 for bool,
+      i64 epoch microseconds and i32 UTC offset in seconds for dates
+"""
+import struct
+
+from ._dates import DATE_VALUE, encode_date, decode_date
+from ._dump import STR, FLOAT, BOOL, DATE, TYPE_CODES
+
+MAGIC = b'MDFB'
+VERSION = 1
+PREAMBLE = struct.Struct('<4sBI')
+ATTR_HEADER = struct.Struct('<BI')
+SIZE16 = struct.Struct('<H')
+SIZE32 = struct.Struct('<I')
+
+def _encode_str(s):
+    data = s.encode('utf-8')
+    return SIZE32.pack(len(data)) + data
+
+def encode(md):
+    """ Return binary content of given metadata dict """
+    chunks = [PREAMBLE.pack(MAGIC, VERSION, len(md))]
+    for attr, values in md.items():
+        value_type = type(values[0]) if len(values) > 0 else str
+        if value_type not in TYPE_CODES:
+            raise TypeError('Unsupported type %s' % str(value_type))
+        name = attr.encode('utf-8')
+        chunks.append(SIZE16.pack(len(name)) + name)
+        chunks.append(ATTR_HEADER.pack(TYPE_CODES[value_type], len(values)))
+        if value_type is str:
+            chunks.extend(_encode_str(v) for v in values)
+        elif value_type is float:
+            chunks.append(struct.pack('<%dd' % len(values), *values))
+        elif value_type is bool:
+            chunks.append(struct.pack('<%dB' % len(values), *values))
+        else:
+            chunks.extend(encode_date(v) for v in values)
+    return b''.join(chunks)
+
+def decode(data):
+    """
+    Return metadata dict from binary content.
+    Raise InvalidBinarySidecar if content is not valid.
+    """
+    try:
+        magic, version, nb_attributes = PREAMBLE.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise InvalidBinarySidecar('Not a binary sidecar file')
+        if version != VERSION:
+            raise InvalidBinarySidecar('Unsupported binary sidecar version %d' %
+                                       version)
+        position = PREAMBLE.size
+        md = {}
+        for _ in range(nb_attributes):
+            size = SIZE16.unpack_from(data, position)[0]
+            position += SIZE16.size
+            attr = data[position:position+size].decode('utf-8')
+            position += size
+            type_code, count = ATTR_HEADER.unpack_from(data, position)
+            position += ATTR_HEADER.size
+            if type_code == STR:
+                values = []
+                for _ in range(count):
+                    size = SIZE32.unpack_from(data, position)[0]
+                    position += SIZE32.size
+                    values.append(data[position:position+size].decode('utf-8'))
+                    position += size
+            elif type_code == FLOAT:
+                values = list(struct.unpack_from('<%dd' % count, data, position))
+                position += 8 * count
+            elif type_code == BOOL:
+                values = [v != 0 for v in
+                          struct.unpack_from('<%dB' % count, data, position)]
+                position += count
+            elif type_code == DATE:
+                values = []
+                for _ in range(count):
+                    values.append(decode_date(*DATE_VALUE.unpack_from(data,
+                                                                       position)))
+                    position += DATE_VALUE.size
+            else:
+                raise InvalidBinarySidecar('Unknown type code %d' % type_code)
+            if attr in md:
+                raise InvalidBinarySidecar('Duplicate attribute: "%s"' % attr)
+            md[attr] = values
+    except (struct.error, UnicodeDecodeError) as error:
+        raise InvalidBinarySidecar('Truncated or corrupted content: %s' % error)
+    if position != len(data):
+        raise InvalidBinarySidecar('Unexpected trailing content')
+    return md
+
+def read_sidecar(fn):
+    with open(fn, 'rb') as fin:
+        return decode(fin.read())
+
+def write_sidecar(fn, md):
+    with open(fn, 'wb') as fout:
+        fout.write(encode(md))
+
+class InvalidBinarySidecar(Exception):
+    pass
@@ -0,0 +1,104 @@
+"""
+Shared query logic of the command-line tools (lsx, cdx).
+
+Short-lived commands should not pay for scanning and parsing a whole folder
+on each call. Queries are answered, by order of preference:
+    - by a running IndexDaemon (see medinxd), without loading anything
+      but the standard library;
+    - from a snapshot given explicitly, used as is;
+    - from a snapshot cached in the user cache folder, if indexed sidecar
+      files did not change since it was written (only stat'ed, not parsed).
+      The cache is (re)written after a scan otherwise.
+
+Only the daemon client is imported at module level: the index machinery is
+imported on the first fallback.
+"""
+import os
+import os.path as op
+import hashlib
+import logging
+
+from ._daemon import DaemonClient
+
+logger = logging.getLogger('medinx')
+
+def cache_folder():
+    return op.join(os.environ.get('XDG_CACHE_HOME', None) or \
+                   op.join(op.expanduser('~'), '.cache'), 'medinx')
+
+def cached_snapshot_path(root):
+    """ Return the path of the cached snapshot of given folder """
+    key = hashlib.sha1(op.abspath(root).encode('utf-8', 'surrogateescape'))
+    return op.join(cache_folder(), key.hexdigest()[:16] + '.mdxs')
+
+def add_query_arguments(parser):
+    """ Add options selecting the index to an argparse.ArgumentParser """
+    parser.add_argument('criteria', nargs='*',
+                        help='Filter criteria, eg author=me "rating>3" '
+                             '(default: all indexed files)')
+    parser.add_argument('-r', '--root', default=None,
+                        help='Indexed folder (default: current folder)')
+    parser.add_argument('-s', '--snapshot', default=None,
+                        help='Index snapshot to use instead of scanning the '
+                             'folder (see MetadataIndex.dump)')
+    parser.add_argument('--no-daemon', action='store_true',
+                        help='Do not query a running medinxd')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Neither read nor write the cached snapshot')
+
+def _query_daemon(root, criteria):
+    """ Return matching files from a running daemon, None if there is none """
+    try:
+        client = DaemonClient(timeout=5)
+    except OSError:
+        return None
+    with client:
+        return client.request('filter', root=root, criteria=criteria)
+
+def load_index(root, use_cache=True):
+    """
+    Return the MetadataIndex of given folder, from its cached snapshot if it
+    is up to date, else by scanning the folder then refreshing the cache.
+    """
+    from ._medinx import MetadataIndex, StaleSnapshot, InvalidSnapshot
+    cache_fn = cached_snapshot_path(root)
+    if use_cache and op.exists(cache_fn):
+        try:
+            return MetadataIndex.open_snapshot(cache_fn, check_stale=True)
+        except (StaleSnapshot, InvalidSnapshot, ValueError) as error:
+            logger.info('Cached snapshot not used: %s', error)
+    index = MetadataIndex.from_folder(root)
+    if use_cache:
+        try:
+            os.makedirs(cache_folder(), exist_ok=True)
+            index.dump(cache_fn)
+        except OSError as error:
+            logger.warning('Cannot write cached snapshot: %s', error)
+    return index
+
+def query(options):
+    """
+    Return files matching options.criteria, given options parsed from
+    arguments of add_query_arguments. Paths are absolute, except when
+    using a snapshot given explicitly, whose paths are returned as stored.
+    """
+    criteria = ' '.join(options.criteria)
+    if options.snapshot is not None:
+        from ._medinx import MetadataIndex
+        index = MetadataIndex.open_snapshot(options.snapshot)
+        scope = None if options.root is None else op.abspath(options.root)
+        return index.filter(criteria, scope).get_files()
+
+    root = op.abspath(options.root or os.curdir)
+    if not op.isdir(root):
+        raise FileNotFoundError('Folder not found: %s' % root)
+    if not options.no_daemon:
+        files = _query_daemon(root, criteria)
+        if files is not None:
+            return files
+    return load_index(root, not options.no_cache).filter(criteria).get_files()
+
+def display_path(fn):
+    """ Return given path relative to the current folder if it lies under it """
+    rel_fn = op.relpath(fn)
+    return fn if rel_fn.startswith(os.pardir) else rel_fn
@@ -0,0 +1,171 @@
+"""
+Optional columnar storage of float, bool and date attributes, backed by NumPy.
+
+Each attribute is stored as one flat array of values plus an offsets array
+giving, for each index entry, the slice of its values (multi-valued lists).
+Dates are stored as int64 microseconds since epoch.
+Comparison predicates on these attributes are then evaluated as vectorised
+masks instead of one Python call per value (see MetadataIndex.use_columnar).
+String attributes and value-based search are left to the Python scan.
+"""
+from datetime import datetime
+
+from ._dates import parse_date, date_to_epoch
+
+# NumPy module, imported on first use (see _load_numpy) to keep the import
+# of medinx fast
+np = None
+
+COLUMN_DTYPES = {
+    float : 'float64',
+    bool : 'bool',
+    datetime : 'int64',
+}
+
+COMPARATORS = {
+    '=' : lambda a, v: a == v,
+    '!=' : lambda a, v: a != v,
+    '>' : lambda a, v: a > v,
+    '<' : lambda a, v: a < v,
+    '>=' : lambda a, v: a >= v,
+    '<=' : lambda a, v: a <= v,
+}
+
+def _load_numpy():
+    """ Import NumPy if not done yet, return None if it is not installed """
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+        np = numpy
+    return np
+
+def is_available():
+    return _load_numpy() is not None
+
+class Column:
+    """
+    Values of one attribute for all entries of an index.
+
+    Args:
+        - values (numpy.ndarray): flat array of all values
+        - offsets (numpy.ndarray): int64 array of size nb_entries+1. Values of
+                                   entry i are values[offsets[i]:offsets[i+1]]
+        - value_type (type): one of float, bool, datetime
+    """
+    def __init__(self, values, offsets, value_type):
+        self.values = values
+        self.offsets = offsets
+        self.value_type = value_type
+        # Entry position of each value:
+        self.rows = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+    def convert_queried_value(self, queried_value):
+        """ Same conversion as Predicate.__call__, for the whole column """
+        if self.value_type is datetime:
+            return date_to_epoch(parse_date(queried_value.strip('#')))
+        elif self.value_type is bool:
+            return queried_value.lower() == 'true'
+        else:
+            return float(queried_value)
+
+    def entry_mask(self, operator, queried_value):
+        """
+        Return a boolean array of size nb_entries, True for entries having at
+        least one value verifying: value <operator> queried_value.
+        """
+        mask = np.zeros(len(self.offsets) - 1, dtype=bool)
+        if len(self.values) == 0:
+            return mask
+        value_mask = COMPARATORS[operator](self.values,
+                                           self.convert_queried_value(queried_value))
+        mask[self.rows[value_mask]] = True
+        return mask
+
+def build_column(file_table, attribute, value_type):
+    """
+    Build the Column of given attribute from a list of (path, metadata).
+    Return None if the attribute cannot be stored in a column (unsupported
+    or inconsistent value types, naive datetimes).
+    """
+    if value_type not in COLUMN_DTYPES:
+        return None
+
+    flat_values = []
+    offsets = [0]
+    for fn, md in file_table:
+        values = md.get(attribute, [])
+        for value in values:
+            if type(value) is not value_type:
+                return None
+            if value_type is datetime:
+                if value.tzinfo is None:
+                    return None
+                value = date_to_epoch(value)
+            flat_values.append(value)
+        offsets.append(len(flat_values))
+
+    return Column(np.array(flat_values, dtype=COLUMN_DTYPES[value_type]),
+                  np.array(offsets, dtype='int64'), value_type)
+
+class ColumnarEngine:
+    """
+    Lazily built columns of an index entry table.
+    Must be discarded when the table is modified.
+    """
+    def __init__(self, file_table, attribute_types):
+        self.file_table = file_table
+        self.attribute_types = attribute_types
+        self.columns = {}
+
+    def get_column(self, attribute):
+        if attribute not in self.columns:
+            mapped_column = getattr(self.file_table, 'get_column', None)
+            if mapped_column is not None: # mapped snapshot
+                self.columns[attribute] = mapped_column(attribute)
+            else:
+                value_type = self.attribute_types.get(attribute, None)
+                self.columns[attribute] = build_column(self.file_table,
+                                                       attribute, value_type)
+        return self.columns[attribute]
+
+    def predicate_mask(self, predicate):
+        """
+        Return the vectorised entry mask of given predicate, or None if it
+        cannot be evaluated on columns.
+        """
+        if predicate.queried_attribute is None or \
+           predicate.operator not in COMPARATORS:
+            return None
+        column = self.get_column(predicate.queried_attribute)
+        if column is None:
+            return None
+        return column.entry_mask(predicate.operator, predicate.queried_value)
+
+    def select(self, predicates, entry_matches, candidates=None):
+        """
+        Return positions of entries verifying all given predicates.
+        Predicates that cannot be vectorised are evaluated by calling
+        entry_matches(metadata, predicate) on remaining candidates only.
+        If given, *candidates* restricts the positions to consider.
+        """
+        if candidates is None:
+            selected = np.ones(len(self.file_table), dtype=bool)
+        else:
+            selected = np.zeros(len(self.file_table), dtype=bool)
+            selected[candidates] = True
+        scalar_predicates = []
+        for predicate in predicates:
+            mask = self.predicate_mask(predicate)
+            if mask is None:
+                scalar_predicates.append(predicate)
+            else:
+                selected &= mask
+
+        positions = np.flatnonzero(selected).tolist()
+        for predicate in scalar_predicates:
+            positions = [i for i in positions
+                         if entry_matches(self.file_table[i][1], predicate)]
+        return positions
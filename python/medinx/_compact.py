@@ -0,0 +1,108 @@
+"""
+Compact in-memory representation of index entries.
+
+Attribute names, attribute sets and string values are interned in a symbol
+table shared by all entries of an index, so that repeated authors, keywords
+etc. are stored once. Each entry is a __slots__ record holding tuples instead
+of a dict of lists, and UTC dates are held as integer timestamps.
+Entries still behave as metadata dicts (see CompactEntry).
+"""
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta, timezone
+
+from ._dates import EPOCH, date_to_epoch
+
+class SymbolTable:
+    """ Map each hashable value to a single shared instance """
+    def __init__(self):
+        self._symbols = {}
+
+    def intern(self, value):
+        return self._symbols.setdefault(value, value)
+
+    def __len__(self):
+        return len(self._symbols)
+
+def encode_value(value):
+    """ Hold UTC dates as integer microseconds since epoch """
+    if isinstance(value, datetime) and value.tzinfo is timezone.utc:
+        return date_to_epoch(value)
+    return value
+
+def decode_value(value):
+    # bool is a subclass of int but MDF never holds plain ints (converted to
+    # float), so a plain int can only be an encoded date
+    if type(value) is int:
+        return EPOCH + timedelta(microseconds=value)
+    return value
+
+class CompactEntry(MutableMapping):
+    """
+    Metadata of one index entry, with the same interface as a metadata dict.
+    Values are returned as new lists: modifying them does not modify the
+    entry, use item assignment instead.
+    """
+    __slots__ = ('_attributes', '_values', '_symbols')
+
+    def __init__(self, metadata, symbols):
+        """
+        Args:
+            - metadata (dict): maps attribute to list of values
+            - symbols (SymbolTable): table where to intern strings
+        """
+        self._symbols = symbols
+        self._attributes = ()
+        self._values = ()
+        self.update(metadata)
+
+    def _encode(self, values):
+        intern = self._symbols.intern
+        if all(isinstance(v, str) for v in values):
+            return intern(tuple(intern(v) for v in values))
+        # Other tuples are not interned: (True,) == (1.0,)
+        return tuple(encode_value(v) for v in values)
+
+    def __getitem__(self, attribute):
+        try:
+            values = self._values[self._attributes.index(attribute)]
+        except ValueError:
+            raise KeyError(attribute)
+        return [decode_value(v) for v in values]
+
+    def __setitem__(self, attribute, values):
+        intern = self._symbols.intern
+        encoded = self._encode(values)
+        if attribute in self._attributes:
+            iattr = self._attributes.index(attribute)
+            self._values = self._values[:iattr] + (encoded,) + \
+                           self._values[iattr+1:]
+        else:
+            self._attributes = intern(self._attributes + (intern(attribute),))
+            self._values = self._values + (encoded,)
+
+    def __delitem__(self, attribute):
+        try:
+            iattr = self._attributes.index(attribute)
+        except ValueError:
+            raise KeyError(attribute)
+        self._attributes = self._symbols.intern(self._attributes[:iattr] + \
+                                                self._attributes[iattr+1:])
+        self._values = self._values[:iattr] + self._values[iattr+1:]
+
+    def __iter__(self):
+        return iter(self._attributes)
+
+    def __len__(self):
+        return len(self._attributes)
+
+    def __contains__(self, attribute):
+        return attribute in self._attributes
+
+    def copy(self):
+        entry = CompactEntry({}, self._symbols)
+        entry._attributes = self._attributes
+        entry._values = self._values
+        return entry
+
+    def __repr__(self):
+        return 'CompactEntry(%r)' % dict(self.items())
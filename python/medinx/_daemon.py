@@ -0,0 +1,305 @@
+"""
+Local daemon keeping indexes loaded, queried by short-lived clients through
+a Unix domain socket.
+
+Protocol: each message is a u32 big-endian size followed by a JSON object
+(utf-8). A client sends requests {"op" : ..., <arguments>} on one connection
+and gets one response per request: {"ok" : true, "result" : ...} or
+{"ok" : false, "error" : exception name, "message" : ...}.
+Values are formatted as in .mdf files (dates as "#<ISO-8601>").
+
+Operations:
+    - ping: return "pong"
+    - roots: return indexed folders
+    - filter (root, criteria, scope=None, metadata=False): return matching
+      files, or [file, metadata] pairs if *metadata* is true
+    - complete (root, text, limit=100): return completions of a criterion:
+      attribute names, or "attribute=value" for str values of an attribute
+    - facets (root, attribute, criteria='', scope=None): return
+      [value, count] pairs for values of attribute among matches, by
+      decreasing count
+    - set (root, path, attribute, values): set values of attribute for given
+      file and save its metadata
+    - refresh (root): rescan indexed folder now
+    - shutdown: stop the daemon
+
+The socket is only accessible by the user running the daemon: it is created
+with mode 0600, by default in XDG_RUNTIME_DIR or else in a folder of the
+temporary folder private to the user. Clients only connect to sockets owned
+by their user.
+
+A root is loaded on its first request, then refreshed before requests
+once *refresh_interval* seconds have elapsed since the last scan (see
+MetadataIndex.refresh: unchanged folders are not listed again).
+
+The client side only depends on the standard library, so that it can be
+used without loading the index machinery.
+"""
+import os
+import os.path as op
+import stat
+import json
+import time
+import socket
+import struct
+import tempfile
+import threading
+import socketserver
+from datetime import datetime
+
+SIZE = struct.Struct('>I')
+
+# Maximum size of a message, in bytes
+MAX_MESSAGE_SIZE = 256 * 1024 * 1024
+
+# Minimum delay between two scans of an indexed folder, in seconds
+REFRESH_INTERVAL = 2.0
+
+def _private_socket_folder():
+    """ Return the socket folder of the current user when there is no XDG_RUNTIME_DIR """
+    return op.join(tempfile.gettempdir(), 'medinx-%d' % os.getuid())
+
+def default_socket_path():
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR', None)
+    if runtime_dir:
+        return op.join(runtime_dir, 'medinx-%d.sock' % os.getuid())
+    return op.join(_private_socket_folder(), 'medinx.sock')
+
+def _make_private_folder(folder):
+    """
+    Create given folder with mode 0700 if needed. Raise DaemonError if it
+    is not a folder owned by the current user and only accessible by them,
+    as one created by another user beforehand.
+    """
+    os.makedirs(folder, mode=0o700, exist_ok=True)
+    folder_stat = os.lstat(folder)
+    if not stat.S_ISDIR(folder_stat.st_mode) or folder_stat.st_uid != os.getuid() \
+       or stat.S_IMODE(folder_stat.st_mode) & 0o077:
+        raise DaemonError('Socket folder %s must be a folder owned and only '
+                          'accessible by the current user' % folder)
+
+def send_message(sock, message):
+    data = json.dumps(message, ensure_ascii=False).encode('utf-8')
+    sock.sendall(SIZE.pack(len(data)) + data)
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if len(chunk) == 0:
+            raise EOFError('Connection closed')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def recv_message(sock):
+    """ Return next message from given socket, raise EOFError if closed """
+    size = SIZE.unpack(_recv_exactly(sock, SIZE.size))[0]
+    if size > MAX_MESSAGE_SIZE:
+        raise DaemonError('Message too large: %d bytes' % size)
+    return json.loads(_recv_exactly(sock, size).decode('utf-8'))
+
+class DaemonClient:
+    """
+    Connection to a running IndexDaemon.
+    Raise OSError (eg FileNotFoundError, ConnectionRefusedError) if no
+    daemon listens on given socket, PermissionError if the socket is not
+    owned by the current user.
+    """
+    def __init__(self, socket_path=None, timeout=None):
+        socket_path = socket_path or default_socket_path()
+        if os.stat(socket_path).st_uid != os.getuid():
+            raise PermissionError('Socket %s is not owned by the current user' % \
+                                  socket_path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.connect(socket_path)
+        except OSError:
+            self._sock.close()
+            raise
+
+    def request(self, op, **arguments):
+        """ Send request and return its result. Raise DaemonError on failure """
+        arguments['op'] = op
+        send_message(self._sock, arguments)
+        response = recv_message(self._sock)
+        if not response['ok']:
+            raise DaemonError('%s: %s' % (response['error'], response['message']))
+        return response['result']
+
+    def close(self):
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (EOFError, ConnectionError):
+                return
+            send_message(self.request, self.server.index_daemon.handle_request(request))
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def _bind_private(socket_path):
+    """
+    Return a _Server listening on given path, with mode 0600.
+    The socket is bound in a new folder only accessible by the current user,
+    made private, then moved to its path: no other user can connect in
+    between. The umask is not changed, as it is shared by all threads.
+    """
+    bind_folder = tempfile.mkdtemp(dir=op.dirname(op.abspath(socket_path)),
+                                   prefix='.medinx_bind_')
+    bind_path = op.join(bind_folder, 'socket')
+    try:
+        server = _Server(bind_path, _RequestHandler)
+        try:
+            os.chmod(bind_path, 0o600)
+            os.replace(bind_path, socket_path)
+        except BaseException:
+            server.server_close()
+            raise
+    finally:
+        if op.lexists(bind_path):
+            os.remove(bind_path)
+        os.rmdir(bind_folder)
+    return server
+
+def _format_value(value):
+    from ._medinx import format_value_date
+    if isinstance(value, datetime):
+        return format_value_date(value)
+    return value
+
+class IndexDaemon:
+    """
+    Serve indexes of local folders on a Unix domain socket, see module
+    documentation for the protocol.
+
+    Args:
+        - socket_path (str): defaults to default_socket_path()
+        - roots (list of str): folders to load at startup. Other folders
+                               are loaded on their first request.
+        - refresh_interval (float): minimum delay in seconds between two
+                                    scans of a folder
+        - index_options (dict): options of MetadataIndex.from_folder
+    """
+    def __init__(self, socket_path=None, roots=(), refresh_interval=REFRESH_INTERVAL,
+                 index_options=None):
+        self.socket_path = socket_path or default_socket_path()
+        self.refresh_interval = refresh_interval
+        self.index_options = index_options or {}
+        self._indexes = {}
+        self._lock = threading.Lock()
+        for root in roots:
+            self._get_index(root)
+
+        if op.dirname(self.socket_path) == _private_socket_folder():
+            _make_private_folder(op.dirname(self.socket_path))
+        if op.exists(self.socket_path):
+            try:
+                DaemonClient(self.socket_path).close()
+            except OSError: # stale socket of a stopped daemon
+                os.remove(self.socket_path)
+            else:
+                raise DaemonError('A daemon already listens on %s' % \
+                                  self.socket_path)
+        self._server = _bind_private(self.socket_path)
+        self._server.index_daemon = self
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if op.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def shutdown(self):
+        """ Stop serve_forever, to be called from another thread """
+        self._server.shutdown()
+
+    def _get_index(self, root):
+        """ Return the index of given folder, loaded or refreshed if needed """
+        from ._medinx import MetadataIndex
+        root = op.abspath(root)
+        loaded = self._indexes.get(root, None)
+        if loaded is None:
+            index = MetadataIndex.from_folder(root, **self.index_options)
+            self._indexes[root] = [index, time.monotonic()]
+            return index
+        if time.monotonic() - loaded[1] > self.refresh_interval:
+            loaded[0].refresh()
+            loaded[1] = time.monotonic()
+        return loaded[0]
+
+    def handle_request(self, request):
+        """ Return response to given request """
+        try:
+            handler = getattr(self, '_op_' + str(request.pop('op', None)), None)
+            if handler is None:
+                raise DaemonError('Unknown operation')
+            with self._lock:
+                result = handler(**request)
+        except Exception as error:
+            return {'ok' : False, 'error' : type(error).__name__,
+                    'message' : str(error)}
+        return {'ok' : True, 'result' : result}
+
+    def _op_ping(self):
+        return 'pong'
+
+    def _op_roots(self):
+        return sorted(self._indexes)
+
+    def _op_filter(self, root, criteria, scope=None, metadata=False):
+        from ._medinx import _format_metadata
+        matches = self._get_index(root).filter(criteria, scope)
+        if metadata:
+            return [[fn, _format_metadata(md)] for fn, md in matches._file_table]
+        return matches.get_files()
+
+    def _op_complete(self, root, text, limit=100):
+        return self._get_index(root).complete(text, limit)
+
+    def _op_facets(self, root, attribute, criteria='', scope=None):
+        counts = {}
+        matches = self._get_index(root).filter(criteria, scope)
+        for fn, md in matches._file_table:
+            for value in set(md.get(attribute, [])):
+                counts[value] = counts.get(value, 0) + 1
+        return [[_format_value(v), c] for v, c in
+                sorted(counts.items(), key=lambda vc: (-vc[1], str(vc[0])))]
+
+    def _op_set(self, root, path, attribute, values):
+        from ._medinx import load_json, _save_entries
+        index = self._get_index(root)
+        values = load_json(json.dumps({attribute : values}))[attribute]
+        index.set_metadata_attr(path, attribute, values)
+        _save_entries([(path, index.get_metadata(path))],
+                      index._save_format('keep'))
+        return None
+
+    def _op_refresh(self, root):
+        loaded = self._indexes.get(op.abspath(root), None)
+        if loaded is None:
+            self._get_index(root)
+        else:
+            loaded[0].refresh()
+            loaded[1] = time.monotonic()
+        return None
+
+    def _op_shutdown(self):
+        threading.Thread(target=self._server.shutdown).start()
+        return None
+
+class DaemonError(Exception):
+    pass
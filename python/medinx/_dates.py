@@ -0,0 +1,104 @@
+"""
+Fast parsing of the ISO-8601 dates found in MDF values ("#" prefix removed).
+
+MDF dates are written in extended format ("2016-02-01T12:00:00.5+02:00"),
+possibly truncated ("2016", "2016-02", "2016-02-01T12:00"). This subset is
+matched by a single regexp and converted without intermediate dicts or
+Decimal. Other ISO-8601 forms fall back to iso8601.parse_date, with which
+results are identical: dates without time zone are in UTC.
+
+Parsed dates are memoised, since the same dates tend to be repeated across
+sidecar files and queries. Returned datetimes are immutable, so they can be
+shared.
+
+iso8601 is only imported for the fallback and to raise errors.
+
+Binary formats (snapshots, .mdfb sidecar files, compact entries, columns)
+store dates as integer microseconds since epoch, plus the UTC offset in
+seconds where the time zone is kept (see encode_date and decode_date).
+Decoded dates get the same timezone objects as parsed ones.
+"""
+import re
+import struct
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+# Maximum number of memoised date strings
+CACHE_SIZE = 8192
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+# Encoded date: epoch microseconds (i64) and UTC offset in seconds (i32)
+DATE_VALUE = struct.Struct('<qi')
+
+# UTC offset marking a naive datetime
+NAIVE_OFFSET = -2**31
+
+MDF_DATE_RE = re.compile(r'^(\d{4})(?:-(\d{2})(?:-(\d{2})'
+                         r'(?:T(\d{2})(?::(\d{2})(?::(\d{2})(?:[.,](\d+))?)?)?'
+                         r'(Z|[-+]\d{2}(?::?\d{2})?)?)?)?)?$')
+
+@lru_cache(maxsize=256)
+def _timezone(tz):
+    """ Return timezone of given designator, shared by all parsed dates """
+    if tz is None or tz == 'Z':
+        return timezone.utc
+    sign = -1 if tz[0] == '-' else 1
+    hours = int(tz[1:3])
+    minutes = int(tz[-2:]) if len(tz) > 3 else 0
+    return timezone(sign * timedelta(hours=hours, minutes=minutes),
+                    '%s%02d:%02d' % (tz[0], hours, minutes))
+
+def offset_timezone(offset_seconds):
+    """
+    Return the timezone of given UTC offset, named as the ones of parsed
+    dates ("+02:00")
+    """
+    if offset_seconds == 0:
+        return timezone.utc
+    minutes = abs(offset_seconds) // 60
+    return _timezone('%s%02d:%02d' % ('-' if offset_seconds < 0 else '+',
+                                      minutes // 60, minutes % 60))
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_date(datestring):
+    """
+    Parse given ISO-8601 date string, without "#" prefix.
+    Raise iso8601.ParseError if it is invalid.
+    """
+    match = MDF_DATE_RE.match(datestring)
+    if match is None:
+        import iso8601
+        return iso8601.parse_date(datestring)
+
+    year, month, day, hour, minute, second, fraction, tz = match.groups()
+    try:
+        return datetime(int(year), int(month or 1), int(day or 1),
+                        int(hour or 0), int(minute or 0), int(second or 0),
+                        int((fraction + '00000')[:6]) if fraction else 0,
+                        _timezone(tz))
+    except ValueError as error:
+        import iso8601
+        raise iso8601.ParseError(error)
+
+def date_to_epoch(value):
+    """ Convert timezone-aware datetime to integer microseconds since epoch """
+    return (value - EPOCH) // ONE_MICROSECOND
+
+def encode_date(value):
+    """ Return DATE_VALUE bytes of given datetime, naive or not """
+    if value.tzinfo is None:
+        return DATE_VALUE.pack(date_to_epoch(value.replace(tzinfo=timezone.utc)),
+                               NAIVE_OFFSET)
+    return DATE_VALUE.pack(date_to_epoch(value),
+                           int(value.utcoffset().total_seconds()))
+
+def decode_date(epoch, offset):
+    """ Return the datetime of given values unpacked from DATE_VALUE """
+    value = EPOCH + timedelta(microseconds=epoch)
+    if offset == NAIVE_OFFSET:
+        return value.replace(tzinfo=None)
+    elif offset == 0:
+        return value
+    return value.astimezone(offset_timezone(offset))
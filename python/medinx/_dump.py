@@ -0,0 +1,407 @@
+"""
+Binary snapshot of a whole index, opened through mmap.
+
+Layout (little-endian):
+    - magic (8 bytes), format version (u32), header size (u32)
+    - JSON header: number of entries, indexed root, attribute types and
+      position of all sections below
+    - sections, each aligned on 8 bytes:
+        - symbol_offsets (u64[nb_symbols+1]) and symbol_data (utf-8):
+          all strings (paths, attributes, str values), sorted so that
+          a string can be found by bisection
+        - paths (u32[nb_entries]): symbol of each entry path
+        - path_order (u32[nb_entries]): entry positions sorted by path
+        - entry_offsets (u64[nb_entries+1]) and entry_data: one record per
+          entry: u32 nb_attributes, then for each attribute: u32 symbol,
+          u8 type code, u32 nb_values and the values (u32 symbol for str,
+          f64 for float, u8 for bool, i64 epoch microseconds and
+          i32 UTC offset in seconds for dates)
+        - fingerprints (i64[2*nb_entries]): (mtime_ns, size) of each sidecar
+          at dump time, used to detect stale snapshots
+        - posting_keys ((u32, u32, u64, u64)[nb_keys]): for each (attribute
+          symbol, str value symbol), sorted, start and count in posting_ids
+        - posting_ids (u32): entry positions
+        - per-attribute columns of float, bool and date attributes:
+          offsets (i64[nb_entries+1]) and values (f64, u8 or i64 epoch),
+          see _columnar.Column
+
+Pages are loaded lazily by the OS and shared by processes opening the same
+snapshot. Entries are only decoded when accessed.
+"""
+import sys
+import json
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from datetime import datetime
+
+from . import _columnar
+from ._paths import subtree_bounds
+from ._files import atomic_write
+from ._dates import DATE_VALUE, date_to_epoch, encode_date, decode_date
+
+MAGIC = b'MDXSNAP\0'
+VERSION = 1
+PREAMBLE = struct.Struct('<8sII')
+
+STR, FLOAT, BOOL, DATE = range(4)
+TYPE_CODES = {str : STR, float : FLOAT, bool : BOOL, datetime : DATE}
+TYPE_NAMES = {str : 'str', float : 'float', bool : 'bool', datetime : 'date'}
+NAMED_TYPES = {name : atype for atype, name in TYPE_NAMES.items()}
+
+ATTR_HEADER = struct.Struct('<IBI')
+POSTING_KEY = struct.Struct('<IIQQ')
+
+COLUMN_ARRAY_CODES = {float : 'd', bool : 'B', datetime : 'q'}
+COLUMN_DTYPES = {float : 'float64', bool : 'bool', datetime : 'int64'}
+
+def _little_endian(a):
+    if sys.byteorder != 'little':
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes()
+
+def write_snapshot(fn, file_table, attribute_types, root=None,
+                   fingerprints=None, scan_options=None):
+    """
+    Write index entries in a binary snapshot file (see module doc).
+    The file is replaced atomically so that processes which mapped a previous
+    version keep a consistent view.
+
+    Args:
+        - fn (str): snapshot file name
+        - file_table (list): list of (path, metadata dict)
+        - attribute_types (dict): maps attribute to value type
+        - root (str): indexed folder, used to check staleness
+        - fingerprints (list): (mtime_ns, size) of sidecar of each entry
+        - scan_options (dict): options used to traverse root
+    """
+    strings = set()
+    for path, md in file_table:
+        strings.add(path)
+        for attr, values in md.items():
+            strings.add(attr)
+            strings.update(v for v in values if isinstance(v, str))
+    strings = sorted(strings)
+    symbol_ids = {s : i for i, s in enumerate(strings)}
+
+    sections = []
+    def add_section(name, data):
+        sections.append((name, data))
+
+    symbol_offsets = array('Q', [0])
+    symbol_data = bytearray()
+    for s in strings:
+        symbol_data += s.encode('utf-8')
+        symbol_offsets.append(len(symbol_data))
+    add_section('symbol_offsets', _little_endian(symbol_offsets))
+    add_section('symbol_data', bytes(symbol_data))
+
+    paths = array('I', (symbol_ids[path] for path, md in file_table))
+    add_section('paths', _little_endian(paths))
+    add_section('path_order',
+                _little_endian(array('I', sorted(range(len(paths)),
+                                                 key=paths.__getitem__))))
+
+    entry_offsets = array('Q', [0])
+    entry_data = bytearray()
+    postings = {}
+    for ientry, (path, md) in enumerate(file_table):
+        entry_data += struct.pack('<I', len(md))
+        for attr, values in md.items():
+            if len(values) > 0:
+                value_type = type(values[0])
+            else:
+                value_type = attribute_types.get(attr, None) or str
+            if value_type not in TYPE_CODES:
+                raise TypeError('Unsupported type %s' % str(value_type))
+            entry_data += ATTR_HEADER.pack(symbol_ids[attr],
+                                           TYPE_CODES[value_type], len(values))
+            if value_type is str:
+                value_ids = [symbol_ids[v] for v in values]
+                entry_data += struct.pack('<%dI' % len(values), *value_ids)
+                for value_id in set(value_ids):
+                    postings.setdefault((symbol_ids[attr], value_id),
+                                        []).append(ientry)
+            elif value_type is float:
+                entry_data += struct.pack('<%dd' % len(values), *values)
+            elif value_type is bool:
+                entry_data += struct.pack('<%dB' % len(values), *values)
+            else:
+                entry_data += b''.join(encode_date(v) for v in values)
+        entry_offsets.append(len(entry_data))
+    add_section('entry_offsets', _little_endian(entry_offsets))
+    add_section('entry_data', bytes(entry_data))
+
+    if fingerprints is None:
+        fingerprints = [(-1, -1)] * len(file_table)
+    add_section('fingerprints',
+                _little_endian(array('q', (v for fp in fingerprints for v in fp))))
+
+    posting_keys = bytearray()
+    posting_ids = array('I')
+    for key in sorted(postings):
+        posting_keys += POSTING_KEY.pack(key[0], key[1], len(posting_ids),
+                                         len(postings[key]))
+        posting_ids.extend(postings[key])
+    add_section('posting_keys', bytes(posting_keys))
+    add_section('posting_ids', _little_endian(posting_ids))
+
+    columns = {}
+    for attr, value_type in attribute_types.items():
+        if value_type not in COLUMN_ARRAY_CODES:
+            continue
+        offsets = array('q', [0])
+        values = array(COLUMN_ARRAY_CODES[value_type])
+        for path, md in file_table:
+            entry_values = md.get(attr, [])
+            if any(type(v) is not value_type for v in entry_values):
+                break
+            if value_type is datetime:
+                if any(v.tzinfo is None for v in entry_values):
+                    break
+                entry_values = [date_to_epoch(v) for v in entry_values]
+            values.extend(entry_values)
+            offsets.append(len(values))
+        else:
+            columns[attr] = TYPE_NAMES[value_type]
+            add_section('column_offsets:' + attr, _little_endian(offsets))
+            add_section('column_values:' + attr, _little_endian(values))
+
+    # Header is written last: section positions depend on its size
+    header = {'nb_entries' : len(file_table),
+              'root' : root,
+              'scan_options' : scan_options or {},
+              'attribute_types' : {a : TYPE_NAMES.get(t, None)
+                                   for a, t in attribute_types.items()},
+              'columns' : columns,
+              'sections' : {}}
+    header_size = 0
+    while True:
+        position = PREAMBLE.size + header_size
+        for name, data in sections:
+            position += -position % 8
+            header['sections'][name] = [position, len(data)]
+            position += len(data)
+        header_data = json.dumps(header).encode('utf-8')
+        if len(header_data) <= header_size:
+            header_data += b' ' * (header_size - len(header_data))
+            break
+        header_size = len(header_data) + 64
+
+    with atomic_write(fn, 'wb', prefix='.mdx_snapshot_') as fout:
+        fout.write(PREAMBLE.pack(MAGIC, VERSION, header_size))
+        fout.write(header_data)
+        for name, data in sections:
+            fout.write(b'\0' * (header['sections'][name][0] - fout.tell()))
+            fout.write(data)
+
+class _LazySequence(Sequence):
+    """ Sequence computing items on access, to bisect over mapped data """
+    def __init__(self, size, getter):
+        self._size = size
+        self._getter = getter
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        return self._getter(i)
+
+class MappedTable(Sequence):
+    """
+    Read-only entry table of a snapshot file, mapped in memory.
+    Items are (path, MappedEntry), as in MetadataIndex._file_table.
+    """
+    def __init__(self, fn):
+        with open(fn, 'rb') as fin:
+            self._mmap = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_size = PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise InvalidSnapshot('Not a medinx snapshot: %s' % fn)
+        if version != VERSION:
+            raise InvalidSnapshot('Unsupported snapshot version %d: %s' % \
+                                  (version, fn))
+        if sys.byteorder != 'little':
+            raise InvalidSnapshot('Snapshots can only be mapped on '
+                                  'little-endian hosts')
+        self.header = json.loads(self._mmap[PREAMBLE.size:
+                                            PREAMBLE.size+header_size].decode('utf-8'))
+        self.root = self.header['root']
+        self.scan_options = self.header['scan_options']
+        self.attribute_types = {a : NAMED_TYPES.get(t, None) for a, t in
+                                self.header['attribute_types'].items()}
+
+        view = memoryview(self._mmap)
+        def section(name, fmt=None):
+            start, size = self.header['sections'][name]
+            data = view[start:start+size]
+            return data.cast(fmt) if fmt is not None else data
+
+        self._nb_entries = self.header['nb_entries']
+        self._symbol_offsets = section('symbol_offsets', 'Q')
+        self._symbol_start = self.header['sections']['symbol_data'][0]
+        self._paths = section('paths', 'I')
+        self._path_order = section('path_order', 'I')
+        self._entry_offsets = section('entry_offsets', 'Q')
+        self._entry_start = self.header['sections']['entry_data'][0]
+        self.fingerprints = section('fingerprints', 'q')
+        self._posting_keys = section('posting_keys')
+        self._posting_ids = section('posting_ids', 'I')
+
+        self._symbols = _LazySequence(len(self._symbol_offsets) - 1,
+                                      self.get_symbol)
+        self._sorted_paths = _LazySequence(self._nb_entries,
+                                           lambda i: self._paths[self._path_order[i]])
+        self._sorted_posting_keys = \
+            _LazySequence(len(self._posting_keys) // POSTING_KEY.size,
+                          lambda i: POSTING_KEY.unpack_from(self._posting_keys,
+                                                            i * POSTING_KEY.size)[:2])
+
+    def get_symbol(self, symbol_id):
+        start = self._symbol_start + self._symbol_offsets[symbol_id]
+        end = self._symbol_start + self._symbol_offsets[symbol_id + 1]
+        return self._mmap[start:end].decode('utf-8')
+
+    def find_symbol(self, s):
+        """ Return id of given string in symbol table, None if not found """
+        i = bisect_left(self._symbols, s)
+        if i < len(self._symbols) and self._symbols[i] == s:
+            return i
+        return None
+
+    def __len__(self):
+        return self._nb_entries
+
+    def __getitem__(self, ientry):
+        if isinstance(ientry, slice):
+            return [self[i] for i in range(*ientry.indices(len(self)))]
+        if ientry < 0:
+            ientry += self._nb_entries
+        if not 0 <= ientry < self._nb_entries:
+            raise IndexError(ientry)
+        return (self.get_symbol(self._paths[ientry]), MappedEntry(self, ientry))
+
+    def find(self, path):
+        """ Return position of entry with given path, None if not indexed """
+        symbol_id = self.find_symbol(path)
+        if symbol_id is None:
+            return None
+        i = bisect_left(self._sorted_paths, symbol_id)
+        if i < self._nb_entries and self._sorted_paths[i] == symbol_id:
+            return self._path_order[i]
+        return None
+
+    def subtree(self, folder):
+        """ Return positions of the entries of given folder and its content """
+        position = self.find(folder)
+        positions = [] if position is None else [position]
+        # Symbols are sorted by string, so sorted paths are sorted by symbol
+        low, high = subtree_bounds(folder)
+        start = bisect_left(self._sorted_paths, bisect_left(self._symbols, low))
+        end = bisect_left(self._sorted_paths, bisect_left(self._symbols, high),
+                          start)
+        positions.extend(self._path_order[start:end].tolist())
+        return positions
+
+    def postings(self, attribute, value):
+        """ Return sorted positions of entries having given str value """
+        attr_id = self.find_symbol(attribute)
+        value_id = self.find_symbol(value)
+        if attr_id is None or value_id is None:
+            return []
+        i = bisect_left(self._sorted_posting_keys, (attr_id, value_id))
+        if i == len(self._sorted_posting_keys) or \
+           self._sorted_posting_keys[i] != (attr_id, value_id):
+            return []
+        _, _, start, count = POSTING_KEY.unpack_from(self._posting_keys,
+                                                     i * POSTING_KEY.size)
+        return self._posting_ids[start:start+count].tolist()
+
+    def get_column(self, attribute):
+        """
+        Return the _columnar.Column of given attribute, sharing memory with
+        the mapped file. None if no column was stored for it.
+        """
+        if attribute not in self.header['columns']:
+            return None
+        value_type = NAMED_TYPES[self.header['columns'][attribute]]
+        np = _columnar._load_numpy()
+        def load(name, dtype):
+            start, size = self.header['sections'][name]
+            return np.frombuffer(self._mmap, dtype=dtype,
+                                 count=size // np.dtype(dtype).itemsize,
+                                 offset=start)
+        return _columnar.Column(load('column_values:' + attribute,
+                                     COLUMN_DTYPES[value_type]),
+                                load('column_offsets:' + attribute, 'int64'),
+                                value_type)
+
+    def decode_entry(self, ientry):
+        position = self._entry_start + self._entry_offsets[ientry]
+        nb_attrs, = struct.unpack_from('<I', self._mmap, position)
+        position += 4
+        md = {}
+        for _ in range(nb_attrs):
+            attr_id, type_code, count = ATTR_HEADER.unpack_from(self._mmap,
+                                                                position)
+            position += ATTR_HEADER.size
+            if type_code == STR:
+                ids = struct.unpack_from('<%dI' % count, self._mmap, position)
+                values = [self.get_symbol(i) for i in ids]
+                position += 4 * count
+            elif type_code == FLOAT:
+                values = list(struct.unpack_from('<%dd' % count, self._mmap,
+                                                 position))
+                position += 8 * count
+            elif type_code == BOOL:
+                values = [bool(v) for v in struct.unpack_from('<%dB' % count,
+                                                              self._mmap,
+                                                              position)]
+                position += count
+            else:
+                values = []
+                for _ in range(count):
+                    values.append(decode_date(*DATE_VALUE.unpack_from(self._mmap,
+                                                                       position)))
+                    position += DATE_VALUE.size
+            md[self.get_symbol(attr_id)] = values
+        return md
+
+class MappedEntry(Mapping):
+    """
+    Metadata of one snapshot entry, decoded on first access.
+    Read-only: copy() returns a regular metadata dict.
+    """
+    __slots__ = ('_table', '_ientry', '_md')
+
+    def __init__(self, table, ientry):
+        self._table = table
+        self._ientry = ientry
+        self._md = None
+
+    def _metadata(self):
+        if self._md is None:
+            self._md = self._table.decode_entry(self._ientry)
+        return self._md
+
+    def __getitem__(self, attribute):
+        return self._metadata()[attribute]
+
+    def __iter__(self):
+        return iter(self._metadata())
+
+    def __len__(self):
+        return len(self._metadata())
+
+    def copy(self):
+        return {a : list(vs) for a, vs in self._metadata().items()}
+
+    def __repr__(self):
+        return 'MappedEntry(%r)' % self._metadata()
+
+class InvalidSnapshot(Exception):
+    pass
@@ -0,0 +1,112 @@
+"""
+Notification of changes of a MetadataIndex to subscribed listeners (see
+MetadataIndex.subscribe).
+
+Mutations of the index produce ChangeEvent objects:
+    - ENTRY_ADDED (path): on add_entry, or a new file found by refresh
+    - ENTRY_REMOVED (path): a file no longer found by refresh
+    - ATTRIBUTE_SET (path, attribute, value): on set_metadata_attr, or for
+      each attribute whose values differ after refresh. *value* holds the
+      new values, an empty list if the attribute was removed.
+    - TYPE_INTRODUCED (attribute, value): an attribute got its value type
+      (*value*), as first set on any entry
+
+Events are delivered in batches, as lists. The delivery policy of a
+subscription sets when:
+    - 'immediate': at the end of each mutation (a refresh is one mutation),
+      or at the end of MetadataIndex.batch_changes if edits are grouped
+    - 'manual': when MetadataIndex.flush_changes is called, eg from a timer
+      of a UI event loop
+
+If coalescing is enabled, a batch is reduced before delivery: successive
+values of an attribute of an entry are reduced to the last one, attribute
+sets of an entry added in the same batch are dropped (the entry is read as
+a whole) and an entry both added and removed in the batch is not reported.
+Listeners read other state from the index itself.
+"""
+
+ENTRY_ADDED = 'entry_added'
+ENTRY_REMOVED = 'entry_removed'
+ATTRIBUTE_SET = 'attribute_set'
+TYPE_INTRODUCED = 'type_introduced'
+
+POLICIES = ('immediate', 'manual')
+
+class ChangeEvent:
+    __slots__ = ('kind', 'path', 'attribute', 'value')
+
+    def __init__(self, kind, path=None, attribute=None, value=None):
+        self.kind = kind
+        self.path = path
+        self.attribute = attribute
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, ChangeEvent) and \
+            (self.kind, self.path, self.attribute, self.value) == \
+            (other.kind, other.path, other.attribute, other.value)
+
+    def __repr__(self):
+        return 'ChangeEvent(%s)' % ', '.join(
+            repr(v) for v in (self.kind, self.path, self.attribute, self.value)
+            if v is not None)
+
+def coalesce(events):
+    """ Return given events reduced as described in module documentation """
+    added = set()
+    first_kinds = {}
+    last_kinds = {}
+    for event in events:
+        if event.kind in (ENTRY_ADDED, ENTRY_REMOVED):
+            first_kinds.setdefault(event.path, event.kind)
+            last_kinds[event.path] = event.kind
+            if event.kind == ENTRY_ADDED:
+                added.add(event.path)
+    # Entries added then removed within the batch:
+    transient = set(path for path, kind in first_kinds.items()
+                    if kind == ENTRY_ADDED and last_kinds[path] == ENTRY_REMOVED)
+    # Keep the last occurrence of each key, in order of last occurrence:
+    kept = {}
+    for event in events:
+        if event.path in transient:
+            continue
+        if event.kind == ATTRIBUTE_SET:
+            if event.path in added:
+                continue
+            key = (event.kind, event.path, event.attribute)
+        elif event.kind == TYPE_INTRODUCED:
+            key = (event.kind, event.attribute)
+        else:
+            key = (event.kind, event.path)
+        kept.pop(key, None)
+        kept[key] = event
+    return list(kept.values())
+
+class Subscription:
+    """
+    Listener of index changes, created by MetadataIndex.subscribe.
+
+    Args:
+        - callback (callable): called with the list of ChangeEvent of each
+                               batch
+        - policy (str): 'immediate' or 'manual', see module documentation
+        - coalesce (bool): reduce batches before delivery
+    """
+    def __init__(self, callback, policy='immediate', coalesce=True):
+        if policy not in POLICIES:
+            raise ValueError('Unknown delivery policy: %s. Expected one of %s' % \
+                             (policy, ', '.join(POLICIES)))
+        self.callback = callback
+        self.policy = policy
+        self.coalesce = coalesce
+        self.pending = []
+
+    def flush(self):
+        """ Deliver pending events, if any """
+        if len(self.pending) == 0:
+            return
+        events = self.pending
+        self.pending = []
+        if self.coalesce:
+            events = coalesce(events)
+        self.callback(events)
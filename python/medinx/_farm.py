@@ -0,0 +1,155 @@
+"""
+Query results materialised as a folder of symbolic links (a "farm"), that
+can be browsed or cd'ed into with any tool.
+
+A farm holds one link per matching file, named after the file. Its query
+and the names of its links are saved in the folder (FARM_SPEC_NAME), so that
+it can be updated later from a fresh index. Updates compare matching files
+with the links already present and only create or remove the differing
+links: keeping a large farm current costs one query, and no filesystem
+operation when nothing changed. Other entries of the folder, including
+symbolic links made by hand, are never touched. A farm cannot be created in
+a non-empty folder that does not hold one already.
+
+Names clashing with an existing entry get a numbered suffix, eg
+"report~2.pdf". A link keeps its name as long as its target matches.
+"""
+import os
+import os.path as op
+import json
+
+from ._files import atomic_write
+
+FARM_SPEC_NAME = '.medinx_farm.json'
+
+def _numbered_name(name, number):
+    base, ext = op.splitext(name)
+    return '%s~%d%s' % (base, number, ext)
+
+class SymlinkFarm:
+    """
+    Folder of symbolic links to the files matching a query.
+
+    Args:
+        - folder (str): farm folder, created on first update if needed
+        - criteria (str): query, see MetadataIndex.filter
+        - scope (str or list of str): see MetadataIndex.filter
+        - root (str): indexed folder the query applies to, saved with it
+    """
+    def __init__(self, folder, criteria='', scope=None, root=None):
+        self.folder = folder
+        self.criteria = criteria
+        self.scope = scope
+        self.root = root
+        # Maps targets to link names, None until the folder is read
+        self._links = None
+
+    @staticmethod
+    def _load_spec(folder):
+        try:
+            with open(op.join(folder, FARM_SPEC_NAME)) as fin:
+                spec = json.load(fin)
+            if not isinstance(spec['criteria'], str) or \
+               not all(isinstance(name, str) for name in spec.get('links', [])):
+                raise TypeError('Unexpected value types')
+            return spec
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            raise InvalidFarm('No valid farm in %s: %s' % (folder, error)) from error
+
+    @staticmethod
+    def open(folder):
+        """ Return the farm saved in given folder. Raise InvalidFarm if none """
+        spec = SymlinkFarm._load_spec(folder)
+        return SymlinkFarm(folder, spec['criteria'], spec.get('scope', None),
+                           spec.get('root', None))
+
+    def _spec(self):
+        return {'criteria' : self.criteria, 'scope' : self.scope,
+                'root' : self.root,
+                'links' : sorted(self._links.values()) if self._links else []}
+
+    def save(self):
+        """ Write the query of the farm and the names of its links in its folder """
+        os.makedirs(self.folder, exist_ok=True)
+        with atomic_write(op.join(self.folder, FARM_SPEC_NAME), 'w',
+                          prefix='.medinx_farm_') as fout:
+            json.dump(self._spec(), fout)
+
+    def _read_links(self):
+        """
+        Return the mapping of targets to link names of the farm, the links
+        recorded in its folder that still exist. Save the farm in its folder
+        if it holds none yet, or a different one.
+        Raise InvalidFarm if the folder is not empty and holds no farm.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        if not op.exists(op.join(self.folder, FARM_SPEC_NAME)):
+            if len(os.listdir(self.folder)) > 0:
+                raise InvalidFarm('Folder is not empty and holds no farm: %s' % \
+                                  self.folder)
+            spec = None
+            names = []
+        else:
+            spec = self._load_spec(self.folder)
+            # Farms saved without their link names own all links
+            names = spec.get('links', None)
+            if names is None:
+                names = [entry.name for entry in os.scandir(self.folder)
+                         if entry.is_symlink()]
+        links = {}
+        for name in names:
+            link_fn = op.join(self.folder, name)
+            if op.basename(name) != name or not op.islink(link_fn):
+                continue
+            target = os.readlink(link_fn)
+            if target in links: # duplicate, eg written by hand
+                os.remove(link_fn)
+            else:
+                links[target] = name
+        self._links = links
+        if spec != self._spec():
+            self.save()
+        return links
+
+    def get_links(self):
+        """ Return a dict mapping link names to their targets """
+        if self._links is None:
+            self._links = self._read_links()
+        return {name : target for target, name in self._links.items()}
+
+    def update(self, index):
+        """
+        Make links of the farm match the files of given index matching its
+        query. Return tuple(nb added links, nb removed links).
+        """
+        targets = set(op.abspath(fn) for fn in
+                      index.filter(self.criteria, self.scope).get_files())
+        if self._links is None:
+            self._read_links()
+
+        removed = [target for target in self._links if target not in targets]
+        for target in removed:
+            name = self._links.pop(target)
+            try:
+                os.remove(op.join(self.folder, name))
+            except FileNotFoundError:
+                pass
+
+        added = sorted(targets.difference(self._links))
+        if len(added) > 0:
+            used_names = set(os.listdir(self.folder))
+            for target in added:
+                name = op.basename(target)
+                number = 1
+                while name in used_names:
+                    number += 1
+                    name = _numbered_name(op.basename(target), number)
+                os.symlink(target, op.join(self.folder, name))
+                used_names.add(name)
+                self._links[target] = name
+        if len(added) > 0 or len(removed) > 0:
+            self.save()
+        return len(added), len(removed)
+
+class InvalidFarm(Exception):
+    pass
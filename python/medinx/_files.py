@@ -0,0 +1,54 @@
+"""
+Atomic replacement of files written by medinx (manifests, snapshots, lint
+results).
+
+Content is written to a temporary file of the same folder, then renamed over
+the target, so that readers never see a partial file. Temporary files are
+created with mode 0600: they are given the mode of the replaced file, or the
+default mode of new files (0666 without the umask bits), before the rename.
+"""
+import os
+import os.path as op
+import stat
+import tempfile
+from contextlib import contextmanager
+
+def _read_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+# The umask can only be read by changing it, which is not thread-safe: it is
+# read once, at import time. Later changes of the umask are not accounted.
+_UMASK = _read_umask()
+
+def replaced_mode(fn):
+    """
+    Return the permission bits a file replacing *fn* should have: the ones
+    of *fn* if it exists, otherwise the ones open() would give
+    """
+    try:
+        return stat.S_IMODE(os.stat(fn).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+@contextmanager
+def atomic_write(fn, mode='w', prefix='.medinx_tmp_', **open_options):
+    """
+    Yield a file object whose content replaces *fn* at the end of the block.
+    If the block raises, *fn* is left untouched.
+
+    Args:
+        - mode (str): 'w' or 'wb', see open()
+        - prefix (str): name prefix of the temporary file
+        - open_options: other options of open(), eg encoding
+    """
+    fd, tmp_fn = tempfile.mkstemp(dir=op.dirname(op.abspath(fn)), prefix=prefix)
+    try:
+        with os.fdopen(fd, mode, **open_options) as fout:
+            yield fout
+        os.chmod(tmp_fn, replaced_mode(fn))
+        os.replace(tmp_fn, fn)
+    except BaseException:
+        os.remove(tmp_fn)
+        raise
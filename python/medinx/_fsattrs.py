@@ -0,0 +1,74 @@
+"""
+Filesystem attributes of indexed files, queryable like MDF attributes:
+    - file_type (str): 'file' or 'folder'
+    - file_size (float): size in bytes
+    - file_modification_date (datetime): mtime, in UTC
+    - file_change_date (datetime): ctime (status change), in UTC
+
+They are not stored in sidecar files nor in metadata dicts. The type of
+associated files is known from the directory listings read during
+traversal, and stat results made by the traversal (see
+_walk.iter_sidecars) are kept. Other files are stat'ed on the first query
+on size or dates, then results are cached until the index is refreshed.
+"""
+import os
+from stat import S_ISDIR
+from datetime import datetime, timezone
+
+FS_ATTRIBUTE_TYPES = {
+    'file_type' : str,
+    'file_size' : float,
+    'file_modification_date' : datetime,
+    'file_change_date' : datetime,
+}
+
+def _ns_to_date(ns):
+    return datetime.fromtimestamp(ns // 10**9, timezone.utc).replace(
+        microsecond=(ns // 1000) % 10**6)
+
+class FsStats:
+    """
+    Cached filesystem state of indexed files.
+
+    Attributes:
+        - types (dict): maps paths to 'file' or 'folder'
+        - stats (dict): maps paths to os.stat_result, None if the file
+                        cannot be stat'ed
+    """
+    def __init__(self):
+        self.types = {}
+        self.stats = {}
+
+    def _stat(self, fn):
+        if fn not in self.stats:
+            try:
+                self.stats[fn] = os.stat(fn)
+            except OSError:
+                self.stats[fn] = None
+        return self.stats[fn]
+
+    def get_values(self, fn, attribute):
+        """
+        Return values of given filesystem attribute for given file,
+        an empty list if the file does not exist.
+        """
+        if attribute == 'file_type' and fn in self.types:
+            return [self.types[fn]]
+        stat = self._stat(fn)
+        if stat is None:
+            return []
+        if attribute == 'file_type':
+            self.types[fn] = 'folder' if S_ISDIR(stat.st_mode) else 'file'
+            return [self.types[fn]]
+        elif attribute == 'file_size':
+            return [float(stat.st_size)]
+        elif attribute == 'file_modification_date':
+            return [_ns_to_date(stat.st_mtime_ns)]
+        elif attribute == 'file_change_date':
+            return [_ns_to_date(stat.st_ctime_ns)]
+        raise KeyError(attribute)
+
+    def get_metadata(self, fn):
+        """ Return all filesystem attributes of given file """
+        return {attribute : self.get_values(fn, attribute)
+                for attribute in FS_ATTRIBUTE_TYPES}
@@ -0,0 +1,181 @@
+"""
+Parallel validation of all sidecar files and manifests of a folder.
+
+Sidecar files and manifests are parsed and validated in worker processes. Value types
+are then checked across files in the main process, the same way as
+MetadataIndex does. Results of previous runs can be stored by sidecar
+fingerprint (mtime_ns, size), so that unchanged files are not parsed again.
+"""
+import os
+import os.path as op
+import json
+
+from . import _walk
+from ._walk import DEFAULT_EXCLUDES, MANIFEST_NAME
+from ._dump import TYPE_NAMES
+from ._files import atomic_write
+from ._medinx import _load_metadata, _load_manifest, LOAD_ERRORS
+
+# Number of sidecar files sent to a worker process at a time
+CHUNK_SIZE = 64
+
+def check_sidecar(md_fn):
+    """
+    Load and validate given sidecar file or manifest (see
+    MANIFEST_JSON_SCHEMA). The value types of all entries of a manifest
+    must be consistent.
+
+    Output: tuple(error, attribute types) where:
+        - error is None or tuple(exception name, message)
+        - attribute types maps attributes to type names ('str', 'float',
+          'bool' or 'date'), None for attributes without value
+    """
+    try:
+        if op.basename(md_fn) == MANIFEST_NAME:
+            entries = list(_load_manifest(md_fn).items())
+        else:
+            entries = [(None, _load_metadata(md_fn, check_exists=False)[1])]
+    except LOAD_ERRORS as error:
+        return (type(error).__name__, str(error)), {}
+    types = {}
+    first_names = {}
+    for name, md in entries:
+        for attr, values in md.items():
+            type_name = TYPE_NAMES.get(type(values[0]), None) if len(values) > 0 \
+                        else None
+            if types.get(attr, None) is None:
+                types[attr] = type_name
+                first_names[attr] = name
+            elif type_name is not None and type_name != types[attr]:
+                return ('InconsistentValue',
+                        'Inconsistent value type for %s. Should be %s (as in '
+                        'entry %s) instead of %s in entry %s' % \
+                        (attr, types[attr], first_names[attr], type_name, name)), {}
+    return None, types
+
+def lint_folder(path, fingerprints=None, max_workers=None, include=None,
+                exclude=DEFAULT_EXCLUDES, max_depth=None, follow_symlinks=False,
+                dedupe=None):
+    """
+    Validate all sidecar files and manifests found in given folder and
+    yield one record (dict) per problem, with keys:
+        - path (str): sidecar file, manifest, or folder
+        - problem (str): one of
+            - 'invalid': the sidecar file cannot be read or is not valid
+                         MDF content, or the manifest is not valid manifest
+                         content. Key 'error' holds the exception name.
+            - 'orphan': the associated file does not exist
+            - 'inconsistent_type': value type of attribute differs from the
+                                   one of the first file defining it. Keys
+                                   'attribute', 'type' and 'expected' hold
+                                   details.
+            - 'unreadable_folder': the folder cannot be listed
+        - message (str): human-readable description
+
+    Args:
+        - fingerprints (dict): results of previous runs by sidecar file,
+                               updated in place with this run. Files whose
+                               mtime and size are unchanged are not parsed
+                               again. See load_fingerprints.
+        - max_workers (int): number of worker processes. Defaults to the
+                             number of cores. If 1, files are checked in
+                             the current process.
+    Other options select traversed paths, see MetadataIndex.from_folder.
+    """
+    if not op.exists(path):
+        raise FileNotFoundError(path)
+    if fingerprints is None:
+        fingerprints = {}
+
+    folder_errors = []
+    sidecars = []
+    to_check = []
+    def add_sidecar(md_fn, associated_type):
+        try:
+            stat = os.stat(md_fn)
+            fingerprint = [stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            fingerprint = None
+        previous = fingerprints.get(md_fn, None)
+        if fingerprint is None or previous is None or previous[:2] != fingerprint:
+            to_check.append(md_fn)
+            previous = None
+        sidecars.append((md_fn, associated_type, fingerprint, previous))
+
+    def add_manifest(manifest_fn):
+        # Checked as a whole, associated to its folder. No name is returned,
+        # so that entries without sidecar file are not yielded one by one.
+        add_sidecar(manifest_fn, 'folder')
+        return ()
+
+    for md_fn, associated_fn, associated_type in \
+        _walk.iter_sidecars(path, include, exclude, max_depth,
+                            follow_symlinks=follow_symlinks, dedupe=dedupe,
+                            onerror=folder_errors.append,
+                            manifest_loader=add_manifest):
+        add_sidecar(md_fn, associated_type)
+
+    for error in folder_errors:
+        yield {'path' : error.filename, 'problem' : 'unreadable_folder',
+               'message' : str(error)}
+
+    if max_workers == 1 or len(to_check) <= CHUNK_SIZE:
+        checked = map(check_sidecar, to_check)
+        executor = None
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers)
+        checked = executor.map(check_sidecar, to_check, chunksize=CHUNK_SIZE)
+
+    try:
+        attribute_types = {}
+        seen = set()
+        for md_fn, associated_type, fingerprint, previous in sidecars:
+            seen.add(md_fn)
+            if previous is not None:
+                error, types = previous[2], previous[3]
+            else:
+                error, types = next(checked)
+                if fingerprint is not None:
+                    fingerprints[md_fn] = fingerprint + [error, types]
+
+            if associated_type is None:
+                yield {'path' : md_fn, 'problem' : 'orphan',
+                       'message' : 'Associated file not found: %s' % \
+                       op.splitext(md_fn)[0]}
+            if error is not None:
+                yield {'path' : md_fn, 'problem' : 'invalid',
+                       'error' : error[0], 'message' : error[1]}
+                continue
+
+            for attr, type_name in types.items():
+                expected = attribute_types.get(attr, None)
+                if type_name is None:
+                    continue
+                if expected is None:
+                    attribute_types[attr] = (type_name, md_fn)
+                elif expected[0] != type_name:
+                    yield {'path' : md_fn, 'problem' : 'inconsistent_type',
+                           'attribute' : attr, 'type' : type_name,
+                           'expected' : expected[0],
+                           'message' : 'Inconsistent value type for %s. '
+                                       'Should be %s (as in %s) instead of %s' % \
+                                       (attr, expected[0], expected[1], type_name)}
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    for md_fn in set(fingerprints).difference(seen):
+        del fingerprints[md_fn]
+
+def load_fingerprints(fn):
+    """ Load results of previous lint runs, empty if file does not exist """
+    if not op.exists(fn):
+        return {}
+    with open(fn, 'r') as fin:
+        return json.load(fin)
+
+def save_fingerprints(fingerprints, fn):
+    """ Atomically write results of lint runs, see load_fingerprints """
+    with atomic_write(fn, 'w', prefix='.medinx_lint_') as fout:
+        json.dump(fingerprints, fout)
@@ -3,18 +3,34 @@ import os.path as op
 import re
 
 import json
-import jsonschema
-import iso8601
 from datetime import datetime
-from iso8601 import parse_date
 
-import warnings
 import logging
 logger = logging.getLogger('medinx')
 
-import inspect
+from functools import partial
+from contextlib import contextmanager
+
+from . import _async
+from ._dates import parse_date
+from ._files import atomic_write
+from . import _columnar
+from ._compact import CompactEntry, SymbolTable
+from . import _dump
+from . import _walk
+from ._walk import MDF_EXTENSION, BINARY_EXTENSION, MANIFEST_NAME
+from ._walk import DEFAULT_EXCLUDES, ScanCache
+from . import _binary
+from . import _xattr
+from ._fsattrs import FsStats, FS_ATTRIBUTE_TYPES
+from ._paths import PathIndex, normalize_scope
+from ._tree import DirTree
+from ._views import SavedView
+from ._events import ChangeEvent, Subscription
+from ._events import ENTRY_ADDED, ENTRY_REMOVED, ATTRIBUTE_SET, TYPE_INTRODUCED
+from ._binary import InvalidBinarySidecar
+from ._dump import InvalidSnapshot
 
-MDF_EXTENSION = '.mdf'
 ATTRIBUTE_FORMAT = r'[^\d\W]\w*' 
 ATTRIBUTE_RE = re.compile(r'^%s$' % ATTRIBUTE_FORMAT, re.UNICODE)
 VALUE_FORMAT = r'#?[a-zA-Z0-9_\-+:.@]+'
@@ -32,6 +48,16 @@ MDF_JSON_SCHEMA = {
     }
 }
 
+# Maps file names of a folder to their MDF content. Names are file names,
+# not paths, and cannot designate the folder itself nor its parent.
+MANIFEST_JSON_SCHEMA = {
+    'type' : 'object',
+    'patternProperties' : {
+        r'^(?!\.\.?$)[^/]+$' : MDF_JSON_SCHEMA
+    },
+    'additionalProperties' : False
+}
+
 PRED_ATTR_VAL_FMT = r'(?P<attr>{attr})(?P<op_bin>=|(?:!=)|(?:>=)|(?:<=)|<|>)' \
                      '(?P<aval>{val})'.format(attr=ATTRIBUTE_FORMAT,
                                               val=VALUE_FORMAT)
@@ -44,48 +70,626 @@ PREDICATE_RE = re.compile(r'^%s$' % PREDICATE_FORMAT, re.UNICODE)
 
 PREDICATES_RE = re.compile(r'^(?:%s)*$' % PREDICATE_FORMAT, re.UNICODE)
 
-def parse_folder(path):
+# Maximum number of trees of matching entries kept up to date by an index,
+# see MetadataIndex.get_tree
+TREE_CACHE_SIZE = 8
+
+def parse_folder(path, **options):
     """ 
     Helper function to recursevely parse folder.
     See MetadataIndex.from_folder
     """
-    return MetadataIndex.from_folder(path)
+    return MetadataIndex.from_folder(path, **options)
+
+async def aparse_folder(path, compact=False, include=None, exclude=DEFAULT_EXCLUDES,
+                        max_depth=None, follow_symlinks=False, dedupe=None,
+                        tolerant=False, executor=None,
+                        max_concurrency=_async.MAX_CONCURRENCY, progress=None,
+                        backend='sidecar'):
+    """
+    Asynchronous version of parse_folder, see MetadataIndex.from_folder for
+    options. Traversal, parsing and type checking run in *executor* (default
+    executor of the loop if None), sidecar files being parsed in batches
+    with at most *max_concurrency* batches submitted at a time.
+    Once sidecar files are listed, *progress* is called in the loop thread
+    with (nb_parsed, nb_sidecars) after each batch.
+    With the 'xattr' backend, the folder is scanned by a single job and
+    *progress* is not called.
+    """
+    if not op.exists(path):
+        raise FileNotFoundError(path)
+    _check_backend(backend)
 
-def _load_metadata(md_fn):
+    scan_options = {'include' : include, 'exclude' : exclude,
+                    'max_depth' : max_depth,
+                    'follow_symlinks' : follow_symlinks, 'dedupe' : dedupe}
+    errors = [] if tolerant else None
+    fs_stats = FsStats()
+    if backend == 'xattr':
+        file_table = await _async.run(_scan_xattrs, path, scan_options, None,
+                                      errors, fs_stats, executor=executor)
+    else:
+        manifests = _Manifests(errors=errors)
+        sidecars = await _async.run(list, _iter_sidecars(path, errors=errors,
+                                                         manifests=manifests,
+                                                         fs_stats=fs_stats,
+                                                         **scan_options),
+                                    executor=executor)
+        loader = _load_entry_tolerant if tolerant else _load_entry
+        file_table = await _async.map_batches(partial(loader, manifests=manifests),
+                                              sidecars, executor, max_concurrency,
+                                              progress=progress)
+        if tolerant:
+            file_table = await _async.run(_loaded_entries, file_table, errors,
+                                          executor=executor)
+    index = await _async.run(MetadataIndex, file_table, executor=executor)
+    if compact:
+        await _async.run(index.compact, executor=executor)
+    index._root = op.normpath(path)
+    index._scan_options = scan_options
+    index._backend = backend
+    index._fs_stats = fs_stats
+    index.load_errors = errors
+    return index
+
+def _load_entry(sidecar, manifests=None):
     """
-    Load metadata from JSON file and ensure that the associated file or folder
-    exists. Also add filesystem metada (TODO): 
-        - file_type (either 'file' or 'folder')
-        - file_modification_date (datetime object)
+    Load metadata of the entry found at *sidecar*, tuple(sidecar file,
+    associated file) yielded by _iter_sidecars, merged with the one of the
+    manifest of its folder (see _Manifests).
+
+    Output: tuple(associated file, metadata dict)
+    """
+    md_fn, associated_fn = sidecar
+    if manifests is not None and op.basename(md_fn) == MANIFEST_NAME:
+        return associated_fn, manifests.get_metadata(associated_fn)
+    md = _load_metadata(md_fn, check_exists=False)[1]
+    if manifests is not None:
+        md = manifests.merge(associated_fn, md)
+    return associated_fn, md
+
+def _load_entry_tolerant(sidecar, manifests=None):
+    """ Return LoadError instead of raising it """
+    try:
+        return _load_entry(sidecar, manifests)
+    except LOAD_ERRORS as error:
+        return LoadError(sidecar[0], error)
+
+def _loaded_entries(results, errors):
+    """
+    Return entries of given results of _load_entry_tolerant that were
+    loaded and whose value types are consistent. Append LoadError of the
+    other ones to *errors*.
+    """
+    errors.extend(e for e in results if isinstance(e, LoadError))
+    return _consistent_entries([e for e in results if not isinstance(e, LoadError)],
+                               errors)
+
+def _group_by_folder(file_table):
+    """ Return entries of given file table grouped by folder """
+    groups = {}
+    for fn, md in file_table:
+        groups.setdefault(op.dirname(fn), []).append((fn, md))
+    return list(groups.values())
+
+def iter_folder(path, **options):
+    """
+    Recursively walk path and yield tuple(associated file, metadata dict) for
+    each entry, parsed as it is found. Entries are not kept, so that
+    huge trees can be streamed with bounded memory. Contrary to from_folder,
+    attribute types are not checked across entries (see
+    MetadataIndex.add_entry to build an index incrementally).
+    See MetadataIndex.from_folder for traversal options.
+    """
+    if not op.exists(path):
+        raise FileNotFoundError(path)
+    manifests = _Manifests(keep_all=False)
+    for sidecar in _iter_sidecars(path, manifests=manifests, **options):
+        yield _load_entry(sidecar, manifests)
+
+def _iter_sidecars(path, include=None, exclude=DEFAULT_EXCLUDES, max_depth=None,
+                   cache=None, follow_symlinks=False, dedupe=None, errors=None,
+                   manifests=None, fs_stats=None):
+    """ 
+    Yield tuple(sidecar file, associated file) for all sidecar files found
+    recursively in given folder.
+    Raise IOError if the associated file of a sidecar does not exist, or
+    if a folder cannot be read. If *errors* (list) is given, append
+    LoadError to it instead, and skip the sidecar or the folder.
+    If *manifests* (_Manifests) is given, entries of folder manifests are
+    also yielded, with the manifest as sidecar file.
+    If *fs_stats* (FsStats) is given, types of associated files and stat
+    results made by the traversal are recorded in it.
+    See _walk.iter_sidecars for other options.
+    """
+    onerror = None
+    if errors is not None:
+        onerror = lambda error: errors.append(LoadError(error.filename, error))
+    manifest_loader = None if manifests is None else manifests.load
+    stats = None if fs_stats is None else fs_stats.stats
+    for md_fn, associated_fn, associated_type in \
+        _walk.iter_sidecars(path, include, exclude, max_depth, cache,
+                            follow_symlinks, dedupe, onerror, manifest_loader,
+                            stats):
+        if associated_type is None:
+            error = IOError('Associated file not found: %s' % associated_fn)
+            if errors is None:
+                raise error
+            errors.append(LoadError(md_fn, error))
+            continue
+        if fs_stats is not None:
+            fs_stats.types[associated_fn] = associated_type
+        yield md_fn, associated_fn
+
+def _consistent_entries(file_table, errors):
+    """
+    Return entries of given file table whose value types are consistent
+    with those of previous entries. Append InconsistentValue errors of
+    the other ones to *errors*.
+    """
+    attribute_types = {}
+    kept = []
+    for fn, md in file_table:
+        entry_types = dict(attribute_types)
+        try:
+            MetadataIndex._update_attribute_types(entry_types, fn, md)
+        except InconsistentValue as error:
+            errors.append(LoadError(_walk.find_sidecar(fn) or fn, error))
+            continue
+        attribute_types = entry_types
+        kept.append((fn, md))
+    return kept
+
+def _split_criteria(criteria):
+    """
+    Return the list of predicates of given criteria, as strings.
+    Each whitespace-separated predicate must be valid on its own, so that
+    glued predicates (eg author=merating>2) are rejected.
+    If criteria are invalid, raises InvalidPredicateFormat
+    """
+    criteria_list = criteria.split()
+    if not all(PREDICATE_RE.match(c) for c in criteria_list):
+        raise InvalidPredicateFormat('Invalid filter criteria: %s' % \
+                                     criteria)
+    return criteria_list
+
+def _scan_folder(path, scan_options, cache, symbols=None, errors=None,
+                 fs_stats=None):
+    """
+    Load metadata of all sidecar files and manifests found in given folder.
+    Directory listings and parsed metadata are reused from *cache* when
+    unchanged on disk, and the cache is updated with this scan.
+    If *symbols* (SymbolTable) is given, entries are stored in compact form.
+    A sidecar file hardlinked at several places is parsed once, each of its
+    paths getting its own metadata dict.
+    If *errors* (list) is given, sidecar files that cannot be loaded, or
+    whose value types are inconsistent with previous ones, are skipped and
+    LoadError are appended to it. Failed files are not cached.
+    If *fs_stats* (FsStats) is given, filesystem state gathered by the
+    traversal is recorded in it.
+
+    Output: list of tuple(associated file, metadata)
+    """
+    file_table = []
+    linked = {}
+    manifests = _Manifests(cache, errors, symbols, keep_all=False)
+    cache.begin_scan()
+    for md_fn, associated_fn in _iter_sidecars(path, cache=cache, errors=errors,
+                                               manifests=manifests,
+                                               fs_stats=fs_stats,
+                                               **scan_options):
+        if op.basename(md_fn) == MANIFEST_NAME:
+            file_table.append((associated_fn,
+                               manifests.get_metadata(associated_fn)))
+            continue
+        try:
+            stat = os.stat(md_fn)
+            fingerprint = (stat.st_mtime_ns, stat.st_size)
+            md = cache.get_metadata(md_fn, fingerprint)
+            if md is None or (symbols is not None and \
+                              not isinstance(md, CompactEntry)):
+                if md is None:
+                    file_id = (stat.st_dev, stat.st_ino) + fingerprint
+                    if stat.st_nlink > 1 and file_id in linked:
+                        # Each path is edited independently, only value
+                        # lists are shared:
+                        md = dict(linked[file_id])
+                    else:
+                        md = _load_metadata(md_fn, check_exists=False)[1]
+                        if stat.st_nlink > 1:
+                            linked[file_id] = md
+                if symbols is not None:
+                    md = CompactEntry(md, symbols)
+                cache.set_metadata(md_fn, fingerprint, md)
+        except LOAD_ERRORS as error:
+            if errors is None:
+                raise
+            errors.append(LoadError(md_fn, error))
+            continue
+        file_table.append((associated_fn, manifests.merge(associated_fn, md)))
+    cache.end_scan()
+    if errors is not None:
+        file_table = _consistent_entries(file_table, errors)
+    return file_table
+
+def _load_metadata(md_fn, check_exists=True):
+    """
+    Load metadata from sidecar file, JSON or binary depending on its
+    extension, and ensure that the associated file or folder exists
+    (unless *check_exists* is False, when the caller already knows).
+    Filesystem attributes are not added, see _fsattrs.
 
     Output: tuple(associated file, metadata dict)
     """
     associated_fn = op.splitext(md_fn)[0]
-    if not op.exists(associated_fn):
+    if check_exists and not op.exists(associated_fn):
         raise IOError('Associated file not found: %s' % associated_fn)
         
-    with open(md_fn, 'r') as fin:
-        md = load_json(fin.read())
+    if md_fn.endswith(BINARY_EXTENSION):
+        md = _binary.read_sidecar(md_fn)
+    else:
+        with open(md_fn, 'r') as fin:
+            md = load_json(fin.read())
     
     return (associated_fn, md)
-            
-def _save_metadata(md_fn, md):
+
+def _load_manifest(manifest_fn):
+    """
+    Load metadata of all entries of given manifest file.
+
+    Output: dict mapping file names to metadata dicts
+    """
+    with open(manifest_fn, 'r') as fin:
+        return load_json(fin.read(), manifest=True)
+
+class _Manifests:
+    """
+    Manifests of folders read while traversing them (see _walk.iter_sidecars).
+
+    Merge rule: an entry defined both in a manifest and in an individual
+    sidecar file gets the attributes of the manifest, overridden attribute
+    by attribute by the ones of the sidecar file.
+
+    Args:
+        - cache (ScanCache): parsed manifests are reused if unchanged
+        - errors (list): if given, a manifest that cannot be loaded is
+                         considered empty and a LoadError is appended
+        - symbols (SymbolTable): if given, entries are stored in compact form
+        - keep_all (bool): if False, only keep the last loaded manifest,
+                           for folders traversed one after the other
+    """
+    def __init__(self, cache=None, errors=None, symbols=None, keep_all=True):
+        self.cache = cache
+        self.errors = errors
+        self.symbols = symbols
+        self.keep_all = keep_all
+        self.entries = {}
+
+    def load(self, manifest_fn):
+        """ Load given manifest file and return names of its entries """
+        if not self.keep_all:
+            self.entries.clear()
+        try:
+            entries = None
+            if self.cache is not None:
+                stat = os.stat(manifest_fn)
+                fingerprint = (stat.st_mtime_ns, stat.st_size)
+                entries = self.cache.get_metadata(manifest_fn, fingerprint)
+            if entries is None or (self.symbols is not None and \
+                                   not all(isinstance(md, CompactEntry)
+                                           for md in entries.values())):
+                if entries is None:
+                    entries = _load_manifest(manifest_fn)
+                if self.symbols is not None:
+                    entries = {name : CompactEntry(md, self.symbols)
+                               for name, md in entries.items()}
+                if self.cache is not None:
+                    self.cache.set_metadata(manifest_fn, fingerprint, entries,
+                                            manifest=True)
+        except LOAD_ERRORS as error:
+            if self.errors is None:
+                raise
+            self.errors.append(LoadError(manifest_fn, error))
+            entries = {}
+        self.entries[op.dirname(manifest_fn)] = entries
+        return entries.keys()
+
+    def get_metadata(self, fn):
+        """ Return metadata of given file in the manifest of its folder """
+        return self.entries.get(op.dirname(fn), {}).get(op.basename(fn), None)
+
+    def merge(self, fn, md):
+        """ Merge metadata of given file loaded from its sidecar file """
+        manifest_md = self.get_metadata(fn)
+        if manifest_md is None:
+            return md
+        merged = dict(manifest_md)
+        merged.update(md)
+        if self.symbols is not None:
+            merged = CompactEntry(merged, self.symbols)
+        return merged
+
+class _ManifestStats:
+    """
+    Fingerprints (mtime_ns, size) of the manifests of traversed folders, by
+    folder, to be given as *manifests* to _iter_sidecars. Manifests are not
+    parsed: entries they define without sidecar file are not yielded.
+    """
+    def __init__(self):
+        self.fingerprints = {}
+
+    def load(self, manifest_fn):
+        stat = os.stat(manifest_fn)
+        self.fingerprints[op.dirname(manifest_fn)] = (stat.st_mtime_ns,
+                                                      stat.st_size)
+        return ()
+
+def _entry_fingerprint(fn):
+    """
+    Return (mtime_ns, size) of the files defining the entry of given file:
+    its sidecar file and the manifest of its folder, combined as the
+    latest mtime and the total size. (-1, -1) if there is none.
+    """
+    fingerprint = (-1, -1)
+    for md_fn in [_walk.find_sidecar(fn), op.join(op.dirname(fn), MANIFEST_NAME)]:
+        if md_fn is not None and op.exists(md_fn):
+            stat = os.stat(md_fn)
+            fingerprint = (max(fingerprint[0], stat.st_mtime_ns),
+                           max(fingerprint[1], 0) + stat.st_size)
+    return fingerprint
+
+# Extension of sidecar files by format
+SIDECAR_FORMATS = {'json' : MDF_EXTENSION, 'binary' : BINARY_EXTENSION}
+
+def _save_sidecar(fn, md, sidecar_format='keep'):
+    """
+    Save metadata of given file in its sidecar file, and return its path.
+
+    Args:
+        - sidecar_format (str): 'json', 'binary', or 'keep' to write in the
+                                format of the existing sidecar file (JSON if
+                                there is none).
+    A sidecar file of the file in another format is removed, so that it
+    does not shadow the saved one.
+    """
+    if sidecar_format == 'keep':
+        sidecar_format = 'json'
+        if not op.exists(fn + MDF_EXTENSION) and op.exists(fn + BINARY_EXTENSION):
+            sidecar_format = 'binary'
+    if sidecar_format not in SIDECAR_FORMATS:
+        raise ValueError('Unknown sidecar format: %s' % sidecar_format)
+
+    md_fn = fn + SIDECAR_FORMATS[sidecar_format]
+    _save_metadata(md_fn, md)
+    for extension in SIDECAR_FORMATS.values():
+        if fn + extension != md_fn and op.exists(fn + extension):
+            os.remove(fn + extension)
+    return md_fn
+
+def _save_entries(file_table, sidecar_format='keep'):
+    """
+    Save metadata of given entries, see MetadataIndex.save for the format
+    policy. Manifests are updated with one atomic write per folder.
+    """
+    if sidecar_format not in ('keep', 'manifest', 'xattr') and \
+       sidecar_format not in SIDECAR_FORMATS:
+        raise ValueError('Unknown sidecar format: %s' % sidecar_format)
+
+    manifest_updates = {}
+    for fn, md in file_table:
+        if len(md) == 0:
+            continue
+        folder, name = op.split(fn)
+        updates = manifest_updates.setdefault(folder, ({}, set()))
+        target = sidecar_format
+        if target == 'keep' and _walk.find_sidecar(fn) is None and \
+           op.exists(op.join(folder, MANIFEST_NAME)):
+            target = 'manifest'
+        if target == 'manifest':
+            updates[0][name] = md
+        elif target == 'xattr':
+            _save_xattr(fn, md)
+            for extension in SIDECAR_FORMATS.values():
+                if op.exists(fn + extension):
+                    os.remove(fn + extension)
+            updates[1].add(name)
+        else:
+            _save_sidecar(fn, md, target)
+            updates[1].add(name)
+
+    for folder, (updated, removed) in manifest_updates.items():
+        _update_manifest(folder, updated, removed)
+
+def _update_manifest(folder, updated, removed=()):
+    """
+    Set entries of given folder manifest from *updated* (dict mapping file
+    names to metadata) and remove entries of file names in *removed*.
+    The manifest is replaced atomically, then individual sidecar files of
+    updated entries are removed. An empty manifest is deleted.
+    """
+    manifest_fn = op.join(folder, MANIFEST_NAME)
+    if not op.exists(manifest_fn):
+        if len(updated) == 0:
+            return
+        entries = {}
+    else:
+        with open(manifest_fn, 'r') as fin:
+            entries = json.load(fin)
+    if len(updated) == 0 and all(name not in entries for name in removed):
+        return
+
+    for name in removed:
+        entries.pop(name, None)
+    for name, md in updated.items():
+        entries[name] = _format_metadata(md)
+
+    if len(entries) == 0:
+        os.remove(manifest_fn)
+    else:
+        with atomic_write(manifest_fn, 'w', prefix='.medinx_manifest_',
+                          encoding='utf-8') as fout:
+            json.dump(entries, fout, ensure_ascii=False, indent=4)
+
+    for name in updated:
+        for extension in SIDECAR_FORMATS.values():
+            if op.exists(op.join(folder, name + extension)):
+                os.remove(op.join(folder, name + extension))
+
+def convert_sidecars(path, sidecar_format, **options):
+    """
+    Rewrite metadata of all entries found in given folder in given format:
+    'json' or 'binary' individual sidecar files, 'manifest' for one
+    manifest per folder, or 'xattr' for extended attributes of files (see
+    import_xattrs). Entries defined both in a manifest and in a sidecar
+    file are merged (see _Manifests).
+    See MetadataIndex.from_folder for traversal options.
+
+    Output: number of converted entries
+    """
+    if sidecar_format not in ('manifest', 'xattr') and \
+       sidecar_format not in SIDECAR_FORMATS:
+        raise ValueError('Unknown sidecar format: %s' % sidecar_format)
+    extension = SIDECAR_FORMATS.get(sidecar_format, None)
+
+    manifests = _Manifests()
+    to_convert = []
+    for md_fn, associated_fn in _iter_sidecars(path, manifests=manifests,
+                                               **options):
+        in_manifest = manifests.get_metadata(associated_fn) is not None
+        if (extension is not None and md_fn.endswith(extension) \
+            and not in_manifest) or \
+           (sidecar_format == 'manifest' and op.basename(md_fn) == MANIFEST_NAME):
+            continue
+        to_convert.append(_load_entry((md_fn, associated_fn), manifests))
+
+    _save_entries(to_convert, sidecar_format)
+    return len(to_convert)
+
+def import_xattrs(path, **options):
+    """
+    Move metadata of all entries found in sidecar files and manifests of
+    given folder to extended attributes of the files.
+    See MetadataIndex.from_folder for traversal options.
+
+    Output: number of imported entries
+    """
+    return convert_sidecars(path, 'xattr', **options)
+
+def export_xattrs(path, sidecar_format='keep', **options):
+    """
+    Move metadata held in extended attributes of files found in given folder
+    to sidecar files or manifests, see MetadataIndex.save for
+    *sidecar_format*. See MetadataIndex.from_folder for traversal options.
+
+    Output: number of exported entries
+    """
+    if sidecar_format == 'xattr':
+        raise ValueError('Cannot export extended attributes to themselves')
+    if not op.exists(path):
+        raise FileNotFoundError(path)
+    file_table = [(fn, _load_xattr(fn, content)) for fn, content
+                  in _xattr.iter_tagged(path, **options)]
+    _save_entries(file_table, sidecar_format)
+    for fn, md in file_table:
+        _xattr.remove_xattr(fn)
+    return len(file_table)
+
+def _check_backend(backend):
+    if backend not in ('sidecar', 'xattr'):
+        raise ValueError('Unknown storage backend: %s' % backend)
+    if backend == 'xattr' and not _xattr.is_supported():
+        raise OSError('Extended attributes are not supported on this platform')
+
+def _load_xattr(fn, content=None):
+    """
+    Load metadata held in extended attribute of given file. *content* is the
+    raw attribute if already read.
+    """
+    if content is None:
+        content = _xattr.read_xattr(fn)
+    try:
+        return load_json(content.decode('utf-8'))
+    except UnicodeDecodeError as error:
+        raise ValueError('Invalid metadata attribute of %s: %s' % (fn, error))
+
+def _save_xattr(fn, md):
+    content = json.dumps(_format_metadata(md), ensure_ascii=False,
+                         separators=(',', ':'))
+    _xattr.write_xattr(fn, content.encode('utf-8'))
+
+def _scan_xattrs(path, scan_options, symbols=None, errors=None, fs_stats=None):
+    """
+    Load metadata of all files of given folder holding an extended attribute,
+    see _scan_folder.
+
+    Output: list of tuple(file, metadata)
+    """
+    onerror = None
+    if errors is not None:
+        onerror = lambda error: errors.append(LoadError(error.filename, error))
+    file_table = []
+    types = None if fs_stats is None else fs_stats.types
+    for fn, content in _xattr.iter_tagged(path, onerror=onerror, types=types,
+                                          **scan_options):
+        try:
+            md = _load_xattr(fn, content)
+        except LOAD_ERRORS as error:
+            if errors is None:
+                raise
+            errors.append(LoadError(fn, error))
+            continue
+        if symbols is not None:
+            md = CompactEntry(md, symbols)
+        file_table.append((fn, md))
+    if errors is not None:
+        file_table = _consistent_entries(file_table, errors)
+    return file_table
+
+def _format_metadata(md):
+    """ Return metadata dict with values formatted for JSON """
     formatted_md = {}
     for a,vs in md.items():
-        if isinstance(vs[0], datetime):
+        if len(vs) > 0 and isinstance(vs[0], datetime):
             vs = [format_value_date(v) for v in vs]
-        formatted_md[a] = vs
+        formatted_md[a] = list(vs)
+    return formatted_md
+
+def _save_metadata(md_fn, md):
+    if md_fn.endswith(BINARY_EXTENSION):
+        _binary.write_sidecar(md_fn, md)
+        return
 
     with open(md_fn, 'w', encoding='utf-8') as fout:
-        json.dump(formatted_md, fout, ensure_ascii=False, indent=4)
+        json.dump(_format_metadata(md), fout, ensure_ascii=False, indent=4)
+
+# Checked schema validators, by schema id
+_validators = {}
 
-def load_json(json_content):
+def _validate(instance, schema):
+    """
+    Check instance against given JSON schema, raise InvalidJsonSchema if it
+    does not comply. jsonschema is imported on first use, and validators are
+    built once per schema.
+    """
+    import jsonschema
+    validator = _validators.get(id(schema), None)
+    if validator is None:
+        validator_class = jsonschema.validators.validator_for(schema)
+        validator_class.check_schema(schema)
+        validator = _validators[id(schema)] = validator_class(schema)
+    error = jsonschema.exceptions.best_match(validator.iter_errors(instance))
+    if error is not None:
+        raise InvalidJsonSchema(error.message) from error
+
+def load_json(json_content, manifest=False):
     """
     Load and check that json content complies with medinx format.
     Raise InvalidJson<...> exceptions if not.
 
     Args:
         - json_content (str): raw json content, MDF format
+        - manifest (bool): content is a folder manifest, mapping file names
+                           to MDF content (see MANIFEST_JSON_SCHEMA)
     """
     def dict_read(pairs):
         """ Simply check for duplicate attributes """
@@ -121,7 +725,7 @@ def load_json(json_content):
                     if value.startswith('#'):
                         try:
                             value = parse_date(value[1:])
-                        except iso8601.ParseError:
+                        except ValueError: # iso8601.ParseError
                             msg = 'Invalid date value: %s' % value
                             errors.append(InvalidJsonValue(msg))
                     fixed_values.append(value)
@@ -146,7 +750,10 @@ def load_json(json_content):
         return mdata
 
     loaded = json.loads(json_content, object_pairs_hook=dict_read)
-    jsonschema.validate(loaded, MDF_JSON_SCHEMA)
+    if manifest:
+        _validate(loaded, MANIFEST_JSON_SCHEMA)
+        return {fn : fix_type(mdata) for fn, mdata in loaded.items()}
+    _validate(loaded, MDF_JSON_SCHEMA)
 
     return fix_type(loaded)
 
@@ -225,8 +832,10 @@ class MetadataIndex:
 
     Parts of the specification that are not supported:
     - value-based search with negation.
-    - file-system metadata are not extracted
-    - tree-view is not implemented
+
+    Filesystem attributes (see _fsattrs.FS_ATTRIBUTE_TYPES) can be queried
+    like other attributes, unless defined in metadata. They are computed
+    on demand and are not part of entry metadata (see get_fs_metadata).
 
     Slow implementation: all entries are scanned during queries.
     """
@@ -242,42 +851,475 @@ class MetadataIndex:
 #        '!' : lambda v,tv: str(v)!=str(tv), # value-based search (negation)
     }
 
+    # Number of in-place editions, used to invalidate cached columns
+    _edit_count = 0
+
     
-    def __init__(self, path_and_mdata_list):
-        """ IMPORTANT: given path_and_mdata_list is not checked for type consistency etc. """
+    def __init__(self, path_and_mdata_list, attribute_types=None):
+        """
+        IMPORTANT: given path_and_mdata_list is not checked for type consistency etc.
+
+        If *attribute_types* is given, it is trusted and entries are not
+        scanned to build it.
+        """
         self._file_table = path_and_mdata_list
 
+        # Copy-on-write state, see snapshot():
+        #   - _shared_table: the list object is shared with a snapshot
+        #   - _owned: positions of entries whose metadata dict belongs to this
+        #             index only. None if no entry is shared.
+        self._shared_table = False
+        self._owned = None
+
+        # Index a filtered view comes from (see _view), None for a source
+        # index. Entries of a view belong to its source, through which they
+        # are edited, so that views, query trees and subscribers of the
+        # source are updated:
+        self._source = None
+
+        # Indexed folder and traversal options, when loaded with from_folder
+        # or open_snapshot:
+        self._root = None
+        self._scan_options = {}
+        # Storage of metadata: 'sidecar' (files and manifests) or 'xattr'
+        self._backend = 'sidecar'
+
+        # Cached filesystem attributes of entries (FsStats), shared with
+        # views and snapshots. Created on first use if None:
+        self._fs_stats = None
+
+        # Entry positions sorted by path (PathIndex), built by the first
+        # scoped query and reset when entries are added or replaced:
+        self._path_index = None
+
+        # Directory hierarchy of all entries (DirTree), built on first use
+        # and updated as entries are added, see get_tree():
+        self._dir_tree = None
+
+        # State of the last folder scan, see refresh(), and symbol table of
+        # compact entries:
+        self._scan_cache = None
+        self._symbols = None
+
+        # Errors of the last folder scan in tolerant mode (list of
+        # LoadError), None if not tolerant:
+        self.load_errors = None
+
+        # Optional vectorised query engine, see use_columnar():
+        self._columnar = False
+        self._columnar_engine = None
+
+        # Registered saved queries (SavedView) by name, see register_view(),
+        # and queries of trees returned by get_tree(criteria), as
+        # tuple(SavedView, DirTree) by (criteria, scope), least recently
+        # used first. Not passed on to filtered views nor snapshots:
+        self._saved_views = {}
+        self._tree_views = {}
+
+        # Listeners of changes (list of _events.Subscription), see
+        # subscribe(), and nesting depth of batch_changes():
+        self._subscriptions = []
+        self._batch_depth = 0
+
+        if attribute_types is not None:
+            self.attribute_types = attribute_types
+        else:
+            self._scan_attribute_types()
+
+    def _scan_attribute_types(self):
         self.attribute_types = {}
         for fn, md in self._file_table:
-            for attr, values in md.items():
-                if len(values) > 0:
-                    if attr in self.attribute_types and \
-                       self.attribute_types[attr] != type(values[0]):
-                            msg = 'Inconsistent Value type for %s of file %s. ' \
-                                  'Should be %s instead of %s' % \
-                                  (attr, fn, self.attribute_types[attr], type(values[0]))
-                            raise InconsistentValue(msg)
-                    elif self.attribute_types.get(attr, None) is None:
-                        self.attribute_types[attr] = type(values[0])
-                else:
-                    self.attribute_types[attr] = None
+            self._update_attribute_types(self.attribute_types, fn, md)
 
-        if any([atype is None for atype in self.attribute_types.values()]):
-            logger.warn('No value associated with attribute %s for any file.' % atype)
+        for attr, atype in self.attribute_types.items():
+            if atype is None:
+                logger.warning('No value associated with attribute %s for any file.',
+                               attr)
             
     @staticmethod
-    def from_folder(path):
+    def _update_attribute_types(attribute_types, fn, md):
+        """
+        Add types of values of given entry to *attribute_types*.
+        Raise InconsistentValue if they differ from already known types.
+        """
+        for attr, values in md.items():
+            if len(values) > 0:
+                if attr in attribute_types and \
+                   attribute_types[attr] not in (None, type(values[0])):
+                        msg = 'Inconsistent Value type for %s of file %s. ' \
+                              'Should be %s instead of %s' % \
+                              (attr, fn, attribute_types[attr], type(values[0]))
+                        raise InconsistentValue(msg)
+                elif attribute_types.get(attr, None) is None:
+                    attribute_types[attr] = type(values[0])
+            elif attr not in attribute_types:
+                attribute_types[attr] = None
+
+    def add_entry(self, fn, md):
+        """
+        Append the entry of given file, eg yielded by iter_folder.
+        Raise InconsistentValue if value types differ from indexed ones,
+        in which case the index is unchanged.
+        IMPORTANT: fn is not checked for being already indexed.
+        """
+        if self._source is not None:
+            self._source.add_entry(fn, md)
+        previous_types = self.attribute_types
+        attribute_types = dict(self.attribute_types)
+        self._update_attribute_types(attribute_types, fn, md)
+        self.attribute_types = attribute_types
 
+        MetadataIndex._edit_count += 1
+        self._columnar_engine = None
+        self._path_index = None
+        if self._shared_table:
+            self._file_table = list(self._file_table)
+            self._shared_table = False
+        # Given dict is not owned, it is copied on first edition:
+        if self._owned is None:
+            self._owned = set(range(len(self._file_table)))
+        self._file_table.append((fn, md))
+        if self._dir_tree is not None:
+            self._dir_tree.add(fn)
+        self._update_views([(fn, md)])
+        if len(self._subscriptions) > 0:
+            self._notify(self._introduced_types(previous_types) +
+                         [ChangeEvent(ENTRY_ADDED, fn)])
+
+    @staticmethod
+    def from_folder(path, compact=False, include=None, exclude=DEFAULT_EXCLUDES,
+                    max_depth=None, follow_symlinks=False, dedupe=None, tolerant=False,
+                    cache=None, backend='sidecar'):
+        """
+        Recursively walk path and index metadata from each .mdf file found.
+
+        Args:
+            - compact (bool): store entries in compact form as they are
+                              loaded (see MetadataIndex.compact)
+            - include, exclude (list of str): gitignore-style patterns
+                                              selecting traversed paths
+                                              (see _walk.PathFilter).
+                                              VCS folders and node_modules
+                                              are excluded by default.
+            - max_depth (int): maximum depth of traversed sub-folders
+            - follow_symlinks (bool): traverse symlinked directories, each
+                                      physical directory once
+            - dedupe (bool): index a file reachable through several paths
+                             (symlinks, hardlinks) only once, under the
+                             first path found. Defaults to follow_symlinks.
+            - tolerant (bool): skip sidecar files that cannot be loaded
+                               instead of raising, and record errors in
+                               index.load_errors (list of LoadError).
+                               An entry whose value types are inconsistent
+                               with previously loaded ones is skipped too.
+            - cache (ScanCache): state of a previous scan of the same folder,
+                                 to skip unchanged directories and sidecar
+                                 files. A new one is created if None.
+                                 The index keeps it for refresh().
+            - backend (str): 'sidecar' to read sidecar files and manifests,
+                             or 'xattr' to read extended attributes of files
+                             (see _xattr). The index keeps it for refresh()
+                             and save(). Attributes are not cached.
+        """
         if not op.exists(path):
             raise FileNotFoundError(path)
+        _check_backend(backend)
+
+        scan_options = {'include' : include, 'exclude' : exclude,
+                        'max_depth' : max_depth,
+                        'follow_symlinks' : follow_symlinks, 'dedupe' : dedupe}
+        if cache is None:
+            cache = ScanCache()
+        symbols = SymbolTable() if compact else None
+        errors = [] if tolerant else None
+        fs_stats = FsStats()
+        if backend == 'xattr':
+            index = MetadataIndex(_scan_xattrs(path, scan_options, symbols, errors,
+                                               fs_stats))
+        else:
+            index = MetadataIndex(_scan_folder(path, scan_options, cache, symbols,
+                                               errors, fs_stats))
+        index._fs_stats = fs_stats
+        index.load_errors = errors
+        index._root = op.normpath(path)
+        index._scan_options = scan_options
+        index._backend = backend
+        index._scan_cache = cache
+        index._symbols = symbols
+        # Entries are shared with the cache, which releases them on first
+        # edition (see _writable_metadata), so that filtered views keep
+        # sharing metadata dicts with the index:
+        index._owned = None
+        return index
+
+    def refresh(self):
+        """
+        Scan the indexed folder again to account for changes on disk.
+        Directories whose mtime has not changed are not listed again and
+        sidecar files with the same mtime and size are not parsed again
+        (see _walk.ScanCache), so that rescanning a mostly unchanged tree
+        costs about one stat per directory and sidecar file.
+        In tolerant mode, files that failed to load are tried again and
+        load_errors is replaced.
+        Unsaved editions are discarded and cached filesystem attributes
+        are forgotten. The tree of all entries (see get_tree) is kept if the
+        indexed files did not change, which is only checked when views are
+        registered or listeners subscribed.
+        """
+        if self._root is None:
+            raise ValueError('Unknown indexed folder, cannot refresh')
+        if self._scan_cache is None:
+            self._scan_cache = ScanCache()
+        errors = [] if self.load_errors is not None else None
+        # Metadata of unchanged sidecar files is reused by the scan, so that
+        # saved views and listeners only look at entries whose metadata
+        # object changed:
+        if self._tracks_changes():
+            previous = {fn : md for fn, md in self._file_table}
+            previous_types = dict(self.attribute_types)
+            dir_tree = self._dir_tree
+        # Views and snapshots keep the previous filesystem state:
+        self._fs_stats = FsStats()
+        if self._backend == 'xattr':
+            self._file_table = _scan_xattrs(self._root, self._scan_options,
+                                            self._symbols, errors, self._fs_stats)
+        else:
+            self._file_table = _scan_folder(self._root, self._scan_options,
+                                            self._scan_cache, self._symbols,
+                                            errors, self._fs_stats)
+        self.load_errors = errors
+        self._shared_table = False
+        self._owned = None
+        self._columnar_engine = None
+        self._path_index = None
+        self._dir_tree = None
+        self._scan_attribute_types()
+        if self._tracks_changes():
+            if not self._report_refresh(previous, previous_types):
+                self._dir_tree = dir_tree
+
+    def _report_refresh(self, previous, previous_types):
+        """
+        Update saved views and notify listeners of the changes found by
+        refresh, given entries and attribute types before it.
+        Return whether files were added or removed.
+        """
+        changed = []
+        events = []
+        files_changed = len(previous) != len(self._file_table)
+        for fn, md in self._file_table:
+            previous_md = previous.pop(fn, None)
+            if previous_md is md:
+                continue
+            changed.append((fn, md))
+            files_changed = files_changed or previous_md is None
+            if len(self._subscriptions) == 0:
+                continue
+            if previous_md is None:
+                events.append(ChangeEvent(ENTRY_ADDED, fn))
+            else:
+                for attr in sorted(set(previous_md).union(md)):
+                    values = list(md.get(attr, []))
+                    if list(previous_md.get(attr, [])) != values:
+                        events.append(ChangeEvent(ATTRIBUTE_SET, fn, attr, values))
+        events.extend(ChangeEvent(ENTRY_REMOVED, fn) for fn in previous)
+        self._update_views(changed, list(previous), refreshed=True)
+        if len(self._subscriptions) > 0:
+            self._notify(self._introduced_types(previous_types) + events)
+        return files_changed or len(previous) > 0
+
+    ## Change notifications ##
+
+    def subscribe(self, callback, policy='immediate', coalesce=True):
+        """
+        Call callback(events) with batches of changes of the index, events
+        being a list of ChangeEvent (see _events for event kinds).
+
+        Args:
+            - policy (str): 'immediate' to deliver changes at the end of each
+                            mutation or of batch_changes, 'manual' to
+                            deliver them on flush_changes
+            - coalesce (bool): reduce repeated changes of a batch, eg keep
+                               only the last values set to an attribute
+
+        Return the subscription (_events.Subscription), to unsubscribe
+        """
+        subscription = Subscription(callback, policy, coalesce)
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """ Stop notifying given subscription, pending changes are dropped """
+        self._subscriptions.remove(subscription)
+
+    def flush_changes(self):
+        """ Deliver pending changes to all listeners """
+        for subscription in list(self._subscriptions):
+            subscription.flush()
+
+    @contextmanager
+    def batch_changes(self):
+        """
+        Context manager grouping the changes made in its block into one
+        batch for 'immediate' listeners, delivered when the outermost block
+        exits
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._deliver_immediate()
+
+    def _notify(self, events):
+        for subscription in self._subscriptions:
+            subscription.pending.extend(events)
+        if self._batch_depth == 0:
+            self._deliver_immediate()
+
+    def _deliver_immediate(self):
+        for subscription in list(self._subscriptions):
+            if subscription.policy == 'immediate':
+                subscription.flush()
+
+    def _introduced_types(self, previous_types):
+        """ Return TYPE_INTRODUCED events of types unknown in given ones """
+        return [ChangeEvent(TYPE_INTRODUCED, attribute=attr, value=atype)
+                for attr, atype in sorted(self.attribute_types.items())
+                if atype is not None and previous_types.get(attr, None) is None]
+
+    ## Saved views ##
+
+    def register_view(self, name, criteria, scope=None):
+        """
+        Register a saved query under given name, replacing any view of the
+        same name, and return it (SavedView). Its matching files are kept
+        up to date as the index is edited, extended or refreshed, by
+        evaluating only changed entries. See filter for arguments.
+        """
+        view = SavedView(self, name, criteria, scope)
+        self._saved_views[name] = view
+        return view
+
+    def get_view(self, name):
+        """ Return the view registered under given name. Raise KeyError if none """
+        return self._saved_views[name]
 
-        # Recursively walk path and extract metadata from each .mdf file found
-        file_table = []
-        for root, dirs, bfns in os.walk(path):
-            for bfn in bfns:
-                if bfn.endswith(MDF_EXTENSION):
-                    file_table.append(_load_metadata(op.join(root, bfn)))
-        return MetadataIndex(file_table)
+    def get_views(self):
+        return sorted(self._saved_views.values(), key=lambda view: view.name)
+
+    def unregister_view(self, name):
+        del self._saved_views[name]
+
+    def _tracks_changes(self):
+        """ Tell whether views or listeners need changes found by refresh """
+        return len(self._saved_views) > 0 or len(self._tree_views) > 0 or \
+            len(self._subscriptions) > 0
+
+    def _update_views(self, entries, removed_files=(), refreshed=False):
+        """
+        Update saved views, and the ones of trees, with given changed entries
+        and removed files. After a refresh, views on filesystem attributes
+        evaluate all entries.
+        """
+        views = list(self._saved_views.values())
+        views.extend(view for view, tree in self._tree_views.values())
+        for view in views:
+            if refreshed and view.has_fs_predicates:
+                view.update(self, self._file_table, removed_files)
+            else:
+                view.update(self, entries, removed_files)
+
+    ## Binary snapshot ##
+
+    def dump(self, fn):
+        """
+        Write the whole index in a binary snapshot file, to be opened
+        with MetadataIndex.open_snapshot. Fingerprints of sidecar files are
+        recorded so that staleness can be checked (see is_stale).
+        """
+        fingerprints = [_entry_fingerprint(path) for path, md in self._file_table]
+        _dump.write_snapshot(fn, self._file_table, self.attribute_types,
+                             self._root, fingerprints, self._scan_options)
+
+    @staticmethod
+    def open_snapshot(fn, check_stale=False):
+        """
+        Open an index snapshot written by MetadataIndex.dump.
+        The file is mapped in memory: pages are loaded lazily and entries
+        decoded on access, so opening is independent of the index size.
+        Path lookups and "attribute=value" queries on str attributes use the
+        sorted path table and posting lists of the snapshot. The first
+        edition loads all entries in memory (copy-on-write).
+
+        If *check_stale* is True, raise StaleSnapshot if indexed sidecar files
+        have changed since the snapshot was written (see is_stale).
+        """
+        table = _dump.MappedTable(fn)
+        index = MetadataIndex(table, attribute_types=table.attribute_types)
+        index._root = table.root
+        index._scan_options = table.scan_options
+        index._shared_table = True
+        index._owned = set()
+        if check_stale and index.is_stale():
+            raise StaleSnapshot('Snapshot %s is outdated, indexed folder %s '
+                                'has changed' % (fn, table.root))
+        return index
+
+    def is_stale(self):
+        """
+        Check whether sidecar files or manifests of the indexed folder were
+        added, removed or modified since this index was opened from a
+        snapshot. Lists the folder and stats sidecar files and manifests,
+        without parsing them.
+        """
+        fingerprints = getattr(self._file_table, 'fingerprints', None)
+        if fingerprints is None:
+            raise ValueError('Index was not opened from a snapshot')
+        if self._root is None:
+            raise ValueError('Unknown indexed folder, cannot check staleness')
+
+        recorded = {}
+        recorded_folders = set()
+        for ientry, (path, md) in enumerate(self._file_table):
+            recorded[path] = (fingerprints[2*ientry], fingerprints[2*ientry+1])
+            recorded_folders.add(op.dirname(path))
+        manifests = _ManifestStats()
+        for md_fn, associated_fn in _iter_sidecars(self._root,
+                                                   manifests=manifests,
+                                                   **self._scan_options):
+            fingerprint = recorded.pop(associated_fn, None)
+            if fingerprint is None or \
+               fingerprint != _entry_fingerprint(associated_fn):
+                return True
+
+        # Remaining entries must be defined by a manifest only, and then have
+        # its fingerprint: the names it defines are unchanged if it is.
+        for path, fingerprint in recorded.items():
+            if manifests.fingerprints.get(op.dirname(path), None) != fingerprint or \
+               not op.exists(path):
+                return True
+        # Manifests of folders with recorded entries are covered by their
+        # fingerprints. Others were added since the snapshot:
+        return any(folder not in recorded_folders
+                   for folder in manifests.fingerprints)
+
+    def compact(self):
+        """
+        Switch to compact storage of entries: attribute names and string
+        values are interned in a symbol table shared by all entries, value
+        lists are held in tuples and UTC dates as integer timestamps.
+        This saves memory on large collections, at the cost of converting
+        values when they are accessed. The API is unchanged.
+        """
+        symbols = SymbolTable()
+        self._file_table = [(fn, CompactEntry(md, symbols))
+                            for fn, md in self._file_table]
+        self._symbols = symbols
+        self._shared_table = False
+        self._owned = None
+        self._columnar_engine = None
 
     def get_attributes(self):
         return sorted(self.attribute_types.keys())
@@ -290,10 +1332,32 @@ class MetadataIndex:
         return [fn for fn, md in self._file_table]
 
     def get_metadata(self, fn):
-        for _fn, md in self._file_table:
+        ientry = self._position(fn)
+        if ientry is None:
+            return {}
+        return self._file_table[ientry][1]
+
+    def get_fs_metadata(self, fn):
+        """
+        Return filesystem attributes of given file (see _fsattrs), cached
+        until refresh()
+        """
+        return self._get_fs_stats().get_metadata(fn)
+
+    def _get_fs_stats(self):
+        if self._fs_stats is None:
+            self._fs_stats = FsStats()
+        return self._fs_stats
+
+    def _position(self, fn):
+        """ Return position of the entry of given file, None if not indexed """
+        find = getattr(self._file_table, 'find', None)
+        if find is not None: # mapped snapshot
+            return find(fn)
+        for ientry, (_fn, md) in enumerate(self._file_table):
             if _fn == fn:
-                return md
-        return {}
+                return ientry
+        return None
 
     def set_metadata_attr(self, fn, attr, values):
 
@@ -301,64 +1365,345 @@ class MetadataIndex:
         if any(type(v) != type(values[0]) for v in values):
             raise InconsistentValue('Non-homogeneous type in given values.')
 
-        for _fn, md in self._file_table:
-            if _fn == fn:
-                if len(values) > 0:
-                    # If new or undefined attribute:
-                    if self.attribute_types.get(attr, None) is None:
-                        self.attribute_types[attr] = type(values[0])
-
-                    # Check type consistency:
-                    if self.attribute_types[attr] != type(values[0]):
-                        msg = 'Inconsistent value type: %s. Should be %s' % \
-                              (str(type(values[0])), str(self.attribute_types[attr]))
-                        raise InconsistentValue(msg)
-                    
-                md[attr] = values
-                return
-        raise FileNotFoundError(fn)
+        ientry = self._position(fn)
+        if ientry is None:
+            raise FileNotFoundError(fn)
+
+        if self._source is not None:
+            self._source.set_metadata_attr(fn, attr, values)
+
+        events = []
+        if len(values) > 0:
+            # If new or undefined attribute:
+            if self.attribute_types.get(attr, None) is None:
+                self.attribute_types[attr] = type(values[0])
+                events.append(ChangeEvent(TYPE_INTRODUCED, attribute=attr,
+                                          value=type(values[0])))
+
+            # Check type consistency:
+            if self.attribute_types[attr] != type(values[0]):
+                msg = 'Inconsistent value type: %s. Should be %s' % \
+                      (str(type(values[0])), str(self.attribute_types[attr]))
+                raise InconsistentValue(msg)
 
-    def save(self):
+        self._writable_metadata(ientry)[attr] = values
+        self._update_views([self._file_table[ientry]])
+        if len(self._subscriptions) > 0:
+            events.append(ChangeEvent(ATTRIBUTE_SET, fn, attr, list(values)))
+            self._notify(events)
+
+    def _writable_metadata(self, ientry):
         """
-        Save metadata in .mdf files.
+        Return the metadata dict of the entry at position *ientry*, ready
+        to be modified in place.
+        If the table or the entry are shared with a snapshot, copy them first
+        (only references are copied, values are never modified in place).
+        An entry shared with the scan cache is modified in place, so that
+        edits reach filtered views and the index they come from, and the
+        cache keeps a copy of the parsed values.
+        A filtered view returns the dict of its source index, made writable
+        there, so that edits reach the source and its save(), and never a
+        snapshot of it.
+        """
+        # Metadata dicts may be shared with filtered views, so invalidate
+        # columns of all indexes:
+        MetadataIndex._edit_count += 1
+        self._columnar_engine = None
+        if self._shared_table:
+            self._file_table = list(self._file_table)
+            self._shared_table = False
+
+        fn, md = self._file_table[ientry]
+        if self._source is not None:
+            isource = self._source._position(fn)
+            if isource is None:
+                raise FileNotFoundError(fn)
+            md = self._source._writable_metadata(isource)
+            self._file_table[ientry] = (fn, md)
+        elif self._owned is not None and ientry not in self._owned:
+            md = md.copy()
+            self._file_table[ientry] = (fn, md)
+            self._owned.add(ientry)
+        elif self._scan_cache is not None:
+            self._scan_cache.release(md)
+        return md
+
+    def snapshot(self):
+        """
+        Return an immutable point-in-time view of the index (IndexSnapshot).
+
+        Creation is O(1): the snapshot shares the entry table and all
+        metadata dicts with the index, which switches to copy-on-write.
+        The first later edit copies the table references and each edited
+        entry then gets its own metadata dict. Unchanged entries stay shared.
+        Filtered views write their edits in the index they come from (see
+        _writable_metadata), which copies entries shared with a snapshot:
+        edits made through views reach the index, never its snapshots.
+        Views keep the entries they hold: after an entry is copied by an
+        edit, views created before it that did not make the edit still see
+        its previous values.
+        """
+        snap = IndexSnapshot(self._file_table,
+                             attribute_types=dict(self.attribute_types))
+        snap._columnar = self._columnar
+        snap._root = self._root
+        snap._scan_options = self._scan_options
+        snap._backend = self._backend
+        snap._fs_stats = self._fs_stats
+        snap._path_index = self._path_index
+        snap._columnar_engine = self._columnar_engine
+        self._shared_table = True
+        self._owned = set()
+        source = self._source
+        while source is not None:
+            # Entries of a view are written through its source
+            source._owned = set()
+            source = source._source
+        return snap
+
+    def save(self, sidecar_format='keep'):
+        """
+        Save metadata in sidecar files.
+
+        Args:
+            - sidecar_format (str): 'json' (.mdf), 'binary' (.mdfb),
+                                    'manifest' (one manifest per folder, see
+                                    _walk.MANIFEST_NAME), or 'keep' to write
+                                    each entry in the format of its existing
+                                    sidecar file, else in the manifest of its
+                                    folder if there is one, else in JSON.
+                                    Other definitions of an entry (sidecar in
+                                    another format, manifest) are removed.
+                                    'xattr' writes extended attributes of
+                                    files, and is the format kept by an index
+                                    loaded from them.
         """
         
-        for fn, md in self._file_table:
-            if len(md) > 0:
-                mdf_fn = fn + MDF_EXTENSION
-                _save_metadata(mdf_fn, md)
+        _save_entries(self._file_table, self._save_format(sidecar_format))
+
+    def _save_format(self, sidecar_format):
+        if sidecar_format == 'keep' and self._backend == 'xattr':
+            return 'xattr'
+        return sidecar_format
+
+    async def asave(self, sidecar_format='keep', executor=None,
+                    max_concurrency=_async.MAX_CONCURRENCY, progress=None):
+        """
+        Asynchronous version of save. Entries are saved as they are when
+        called (see snapshot): later editions are not saved.
+        Files are written in batches in *executor*, see aparse_folder for
+        options. Entries of a folder are saved by the same job, so that its
+        manifest is written once: *progress* is called with
+        (nb_saved_folders, nb_folders).
+        """
+        entries = self.snapshot()._file_table
+        groups = await _async.run(_group_by_folder, entries, executor=executor)
+        await _async.map_batches(partial(_save_entries,
+                                         sidecar_format=self._save_format(sidecar_format)),
+                                 groups, executor, max_concurrency,
+                                 progress=progress)
                 
     ## Query ##
+
+    def use_columnar(self, enabled=True):
+        """
+        Enable or disable the columnar query engine (requires numpy).
+        Float, bool and date attributes are then stored as NumPy arrays,
+        built lazily on first query, and comparison predicates on them are
+        evaluated as vectorised masks. Results are the same as with the
+        default scan. Columns are rebuilt after any edition.
+        """
+        if enabled and not _columnar.is_available():
+            raise ImportError('numpy is required by the columnar engine')
+        self._columnar = enabled
+        self._columnar_engine = None
     
-    def filter(self, criteria):
+    def filter(self, criteria, scope=None):
         """ Return a filtered view of the index.
         If criteria are invalid, raises InvalidSelectionPredicates
+
+        Args:
+            - scope (str or list of str): if given, only entries of these
+                                          folders and of their content are
+                                          considered, looked up in paths
+                                          sorted once per index, before
+                                          predicates are evaluated
         """
-        if not PREDICATE_RE.match(criteria):
-            raise InvalidPredicateFormat('Invalid filter criteria: %s' % \
-                                         criteria)
+        predicates, fs_predicates = self._parse_criteria(criteria)
+        candidates = self._posting_candidates(predicates)
+        if scope is not None:
+            in_scope = self._scope_positions(scope)
+            candidates = in_scope if candidates is None else \
+                         sorted(set(candidates).intersection(in_scope))
+        if self._columnar:
+            if self._columnar_engine is None or \
+               self._columnar_engine.edit_count != MetadataIndex._edit_count:
+                self._columnar_engine = _columnar.ColumnarEngine(self._file_table,
+                                                                 self.attribute_types)
+                self._columnar_engine.edit_count = MetadataIndex._edit_count
+            selected = self._columnar_engine.select(predicates,
+                                                    self._entry_matches,
+                                                    candidates)
+        else:
+            if candidates is None:
+                candidates = range(len(self._file_table))
+            selected = []
+            for ientry in candidates:
+                fn, md = self._file_table[ientry]
+                logger.debug('Scanning entry: %s', fn)
+                if all(self._entry_matches(md, p) for p in predicates):
+                    selected.append(ientry)
+        if len(fs_predicates) > 0:
+            fs_stats = self._get_fs_stats()
+            kept = []
+            for ientry in selected:
+                fn = self._file_table[ientry][0]
+                if all(self._fs_matches(fs_stats, fn, p) for p in fs_predicates):
+                    kept.append(ientry)
+            selected = kept
+        return self._view(selected)
 
-        predicates = [self.unformat_predicate(c) for c in criteria.split(' ')]
-        filtered_table = []
-        for fn, md in self._file_table:
-            predicate_valid = []
-            logger.debug('Scanning entry: %s', fn) 
-            for predicate in predicates:
-                predicate_valid.append(False)
-                logger.debug('  Trying predicate: %s', predicate) 
-                for attr, values in md.items():
-                    logger.debug('    on  %s(%s): %s', attr, str(type(values[0])), values)
-                    if any(predicate(attr, value) for value in values):
-                        logger.debug('    -> OK') 
-                        predicate_valid[-1] = True
-                        break
-                    else:
-                        logger.debug('    -> NO MATCH') 
-                if not predicate_valid[-1]:
-                    break
-            if all(predicate_valid):
-                filtered_table.append((fn, md))
-        return MetadataIndex(filtered_table)
+    def _parse_criteria(self, criteria):
+        """
+        Return tuple(predicates on metadata, predicates on filesystem
+        attributes) of given criteria.
+        If criteria are invalid, raises InvalidPredicateFormat
+        """
+        predicates = [self.unformat_predicate(c)
+                      for c in _split_criteria(criteria)]
+        # Filesystem predicates are evaluated last, so that only remaining
+        # entries are stat'ed:
+        fs_predicates = [p for p in predicates
+                         if p.queried_attribute in FS_ATTRIBUTE_TYPES and
+                         p.queried_attribute not in self.attribute_types]
+        return [p for p in predicates if p not in fs_predicates], fs_predicates
+
+    @staticmethod
+    def _fs_matches(fs_stats, fn, predicate):
+        """ Return True if given filesystem attribute of file verifies predicate """
+        attr = predicate.queried_attribute
+        return any(predicate(attr, value)
+                   for value in fs_stats.get_values(fn, attr))
+
+    async def afilter(self, criteria, executor=None, scope=None):
+        """
+        Asynchronous version of filter, to be used with "async for".
+        The query runs in *executor*, then tuple(file, metadata) of matching
+        entries are yielded, giving control back to the loop regularly.
+        The index must not be edited while the query is running.
+        """
+        import asyncio
+        view = await _async.run(self.filter, criteria, scope, executor=executor)
+        for ientry, entry in enumerate(view._file_table):
+            if ientry % _async.BATCH_SIZE == 0:
+                await asyncio.sleep(0)
+            yield entry
+
+    def get_tree(self, criteria=None, scope=None):
+        """
+        Return the directory hierarchy (DirTree) of entries matching given
+        criteria, with per-folder counts (see filter for arguments).
+        The tree is kept by the index and updated as entries are added,
+        edited or refreshed. It must not be modified.
+        Trees of the TREE_CACHE_SIZE last queries are kept: each is backed by
+        a view of its query (see register_view), through which changed
+        entries are added to or removed from the tree, so that their counts
+        are updated along the ancestors of these entries only.
+        """
+        if criteria is None and scope is None:
+            if self._dir_tree is None:
+                self._dir_tree = DirTree(self.get_files())
+            return self._dir_tree
+        key = (criteria or '', scope if scope is None or isinstance(scope, str)
+               else tuple(scope))
+        tree_view = self._tree_views.pop(key, None)
+        if tree_view is None:
+            view = SavedView(self, None, criteria or '', scope)
+            tree = DirTree(view.files)
+            view.subscribe(lambda view, added, removed:
+                           tree.update(added, removed))
+            tree_view = (view, tree)
+            if len(self._tree_views) >= TREE_CACHE_SIZE:
+                del self._tree_views[next(iter(self._tree_views))]
+        self._tree_views[key] = tree_view
+        return tree_view[1]
+
+    def complete(self, text, limit=None):
+        """
+        Return completions of a partial criterion: attribute names starting
+        with given text, or "attribute<op>value" for str values starting
+        with the text after the operator. At most *limit* completions are
+        returned, sorted.
+        """
+        for operator in ('!=', '>=', '<=', '=', '<', '>'):
+            if operator in text:
+                attribute, prefix = text.split(operator, 1)
+                if self.attribute_types.get(attribute, None) is not str:
+                    return []
+                values = set()
+                for fn, md in self._file_table:
+                    values.update(v for v in md.get(attribute, [])
+                                  if v.startswith(prefix))
+                return [attribute + operator + v for v in sorted(values)[:limit]]
+        return [a for a in self.get_attributes() if a.startswith(text)][:limit]
+
+    def _scope_positions(self, scope):
+        """ Return sorted positions of entries under given folders """
+        if isinstance(scope, str):
+            scope = [scope]
+        subtree = getattr(self._file_table, 'subtree', None)
+        if subtree is None: # in-memory table
+            if self._path_index is None:
+                self._path_index = PathIndex(self.get_files())
+            subtree = self._path_index.subtree
+        positions = set()
+        for folder in scope:
+            positions.update(subtree(normalize_scope(folder)))
+        return sorted(positions)
+
+    def _posting_candidates(self, predicates):
+        """
+        On a mapped snapshot, use posting lists to restrict the entries to
+        scan for "attribute=value" predicates on str attributes.
+        Return sorted positions, or None if all entries have to be scanned.
+        """
+        postings = getattr(self._file_table, 'postings', None)
+        if postings is None:
+            return None
+        candidates = None
+        for predicate in predicates:
+            if predicate.operator == '=' and \
+               self.attribute_types.get(predicate.queried_attribute, None) is str:
+                positions = set(postings(predicate.queried_attribute,
+                                         predicate.queried_value))
+                candidates = positions if candidates is None \
+                             else candidates & positions
+        return None if candidates is None else sorted(candidates)
+
+    @staticmethod
+    def _entry_matches(md, predicate):
+        """ Return True if any value of given metadata verifies predicate """
+        logger.debug('  Trying predicate: %s', predicate)
+        for attr, values in md.items():
+            logger.debug('    on  %s: %s', attr, values)
+            if any(predicate(attr, value) for value in values):
+                logger.debug('    -> OK')
+                return True
+            else:
+                logger.debug('    -> NO MATCH')
+        return False
+
+    def _view(self, positions):
+        """
+        Return an index of the same class holding entries at given positions.
+        Its edits are written in the source index, see _writable_metadata.
+        """
+        view = type(self)([self._file_table[i] for i in positions])
+        view._columnar = self._columnar
+        view._fs_stats = self._fs_stats
+        view._scan_cache = self._scan_cache
+        view._source = self
+        return view
 
     def unformat_predicate(self, criterion):
         """ 
@@ -381,35 +1726,84 @@ class MetadataIndex:
         logger.debug('Unformatting criterion: %s', criterion)
         if match.group('op_bin') is not None:
             # Attribute and value have to match
-            value_matches = MetadataIndex.STR_TO_COMPARATOR[match.group('op_bin')]
+            operator = match.group('op_bin')
+            value_matches = MetadataIndex.STR_TO_COMPARATOR[operator]
             attribute_matches = lambda a, ta: a==ta
             queried_attribute = match.group('attr')
             queried_value = match.group('aval')            
         elif match.group('op_una') is not None:
             # Only value has to match:
-            value_matches = MetadataIndex.STR_TO_COMPARATOR[match.group('op_una')]
+            operator = match.group('op_una')
+            value_matches = MetadataIndex.STR_TO_COMPARATOR[operator]
             attribute_matches = lambda a, ta: True # attribute is ignored
             queried_attribute = None
             queried_value = match.group('val')
     
-        logger.debug('  amatch: %s', inspect.getsource(attribute_matches))
-        logger.debug('    queried_attr: %s', queried_attribute)
-        logger.debug('  vmatch: %s', inspect.getsource(value_matches))
-        logger.debug('    queried_value: %s', queried_value)
+        if logger.isEnabledFor(logging.DEBUG):
+            # Reading sources is slow, and inspect is only needed here
+            import inspect
+            logger.debug('  amatch: %s', inspect.getsource(attribute_matches))
+            logger.debug('    queried_attr: %s', queried_attribute)
+            logger.debug('  vmatch: %s', inspect.getsource(value_matches))
+            logger.debug('    queried_value: %s', queried_value)
         
-        return Predicate(queried_attribute, queried_value, attribute_matches, value_matches)
+        return Predicate(queried_attribute, queried_value, attribute_matches, value_matches,
+                         operator)
     
+class IndexSnapshot(MetadataIndex):
+    """
+    Immutable point-in-time view of a MetadataIndex, see
+    MetadataIndex.snapshot. Entries are shared with the index it was taken
+    from, which copies them on write.
+    Queries are supported and return snapshots too. Edition raises
+    ReadOnlyIndex.
+    """
+
+    def set_metadata_attr(self, fn, attr, values):
+        raise ReadOnlyIndex('Cannot edit an index snapshot')
+
+    def add_entry(self, fn, md):
+        raise ReadOnlyIndex('Cannot edit an index snapshot')
+
+    def refresh(self):
+        raise ReadOnlyIndex('Cannot refresh an index snapshot')
+
+    def snapshot(self):
+        return self
+
+class LoadError:
+    """
+    Error that occurred while loading a sidecar file or reading a folder in
+    tolerant mode (see MetadataIndex.from_folder).
+
+    Attributes:
+        - path (str): path of the sidecar file or folder, or of the file
+                      whose extended attribute is invalid
+        - error (Exception): raised exception
+    """
+    def __init__(self, path, error):
+        self.path = path
+        self.error = error
+
+    def __repr__(self):
+        return 'LoadError(%r, %s: %s)' % (self.path, type(self.error).__name__,
+                                          self.error)
+
 class Predicate:
-    def __init__(self, queried_attribute, queried_value, attribute_matches, value_matches):
+    def __init__(self, queried_attribute, queried_value, attribute_matches, value_matches,
+                 operator=None):
         """
         Args:
             - queried_attribute (str): extracted from query cretirion.
                                        If None, then str values will be considered.
                                        (value-based search)
             - queried_value (str): unformatted value, extracted from query cretirion
+            - operator (str): operator extracted from query criterion
+                              (key of MetadataIndex.STR_TO_COMPARATOR)
         """
         self.queried_attribute = queried_attribute
         self.queried_value = queried_value
+        self.operator = operator
         self.attribute_matches = attribute_matches
         self.value_matches = value_matches
 
@@ -439,6 +1833,12 @@ class Predicate:
     
 class InvalidPredicateFormat(Exception):
     pass
+
+class ReadOnlyIndex(Exception):
+    pass
+
+class StaleSnapshot(Exception):
+    pass
     
 class InvalidJsonAttributeFormat(Exception):
     pass
@@ -451,3 +1851,15 @@ class InvalidJsonValue(Exception):
 
 class InconsistentValue(Exception):
     pass
+
+class InvalidJsonSchema(Exception):
+    pass
+
+class InvalidJsonContent(Exception):
+    pass
+
+# Errors recorded per file when loading in tolerant mode
+LOAD_ERRORS = (OSError, ValueError, InvalidJsonSchema,
+               InvalidJsonAttributeFormat, InvalidJsonAttributeDuplicate,
+               InvalidJsonValue, InvalidJsonContent, InconsistentValue,
+               InvalidBinarySidecar)
@@ -0,0 +1,68 @@
+"""
+Lookup of index entries by location, to restrict queries to sub-trees.
+
+Paths are sorted, so that all paths under a folder form one contiguous
+range: the ones starting with "folder/" lie between "folder/" and "folder0"
+("0" follows "/" in code point order). A sub-tree is then found by two
+bisections, and its cost only depends on its size.
+
+Indexed paths are normalized (see os.path.normpath) as folders are
+traversed: the root is normalized once, then file names are joined to it,
+without leading "./" for a relative root. Scopes are normalized the same
+way, so that "./data/sub", "data/sub/" and "data//sub" all designate the
+entries under "data/sub".
+"""
+import os
+import os.path as op
+from bisect import bisect_left
+
+def normalize_scope(folder):
+    """ Return given folder path normalized as indexed paths are """
+    return op.normpath(folder)
+
+def join_path(folder, name):
+    """
+    Return the normalized path of given name in given normalized folder,
+    without leading "./" for the current folder
+    """
+    return name if folder == os.curdir else op.join(folder, name)
+
+def subtree_bounds(folder):
+    """
+    Return tuple(low, high) such that paths strictly under given folder are
+    the ones in [low, high)
+    """
+    if folder == os.curdir:
+        # Paths indexed from the current folder have no common prefix
+        return '', chr(0x10ffff)
+    prefix = folder if folder.endswith(os.sep) else folder + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+def subtree_range(sorted_paths, folder):
+    """
+    Return tuple(start, end) of the range of sorted paths lying strictly
+    under given folder
+    """
+    low, high = subtree_bounds(folder)
+    start = bisect_left(sorted_paths, low)
+    return start, bisect_left(sorted_paths, high, start)
+
+class PathIndex:
+    """
+    Entry positions sorted by path, for an in-memory entry table.
+    Built in O(n log n), then sub-tree lookups cost O(log n + size of
+    the sub-tree).
+    """
+    def __init__(self, paths):
+        self.order = sorted(range(len(paths)), key=paths.__getitem__)
+        self.sorted_paths = [paths[i] for i in self.order]
+
+    def subtree(self, folder):
+        """ Return positions of the entries of given folder and its content """
+        positions = []
+        i = bisect_left(self.sorted_paths, folder)
+        if i < len(self.sorted_paths) and self.sorted_paths[i] == folder:
+            positions.append(self.order[i])
+        start, end = subtree_range(self.sorted_paths, folder)
+        positions.extend(self.order[start:end])
+        return positions
@@ -0,0 +1,313 @@
+"""
+Interactive shell exploring a loaded MetadataIndex.
+
+The index is loaded once, then each command works on the current selection:
+the entries matching a stack of criteria, narrowed by "refine" and widened
+back by "back". Selections are computed from the previous one, so that
+refining only filters matching entries.
+
+A background thread refreshes the index (see MetadataIndex.refresh: only
+changed folders and sidecar files are read again) under the lock held by
+commands. The shell listens to changes of the index: when a refresh finds
+some, the tree of all entries and the symlink farms created by the "farm"
+command are updated, and selections are evaluated again on the next
+command. Criteria on filesystem attributes (eg file_size) are evaluated
+again after each refresh, since files may change without their metadata.
+"""
+import cmd
+import os.path as op
+import json
+import time
+import threading
+import logging
+
+from ._medinx import _format_metadata
+from ._cli import display_path
+from ._farm import SymlinkFarm
+
+logger = logging.getLogger('medinx')
+
+# Default delay between two background refreshes, in seconds
+REFRESH_INTERVAL = 5.0
+
+class MedinxShell(cmd.Cmd):
+    """
+    Command interpreter over given MetadataIndex.
+
+    Args:
+        - index (MetadataIndex): explored index
+        - refresh_interval (float): delay in seconds between two background
+                                    refreshes. None to disable them, as
+                                    for indexes whose folder is unknown.
+        - timing (bool): print the duration of each command
+        - stdin, stdout: see cmd.Cmd
+    """
+    intro = 'Type help or ? to list commands. Lines that are not commands ' \
+            'refine the selection, eg: author=me "rating>3"'
+
+    def __init__(self, index, refresh_interval=REFRESH_INTERVAL, timing=True,
+                 stdin=None, stdout=None):
+        super().__init__(stdin=stdin, stdout=stdout)
+        self.index = index
+        self.timing = timing
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._criteria = []
+        self._views = []
+        self._generation = 0
+        self._views_generation = 0
+        self._start_time = None
+        self._stop_refresh = threading.Event()
+        self._refresh_thread = None
+        self._farms = []
+        self._changed = False
+        self.index.subscribe(self._on_changes)
+        self._update_prompt()
+
+    ## Selection ##
+
+    def selection(self):
+        """ Return the index of entries matching all refinements """
+        with self._lock:
+            if self._views_generation != self._generation:
+                views = []
+                for criteria in self._criteria:
+                    views.append((views[-1] if views else self.index).filter(criteria))
+                self._views = views
+                self._views_generation = self._generation
+            return self._views[-1] if self._views else self.index
+
+    def refine(self, criteria):
+        """ Restrict the selection to entries matching given criteria """
+        with self._lock:
+            view = self.selection().filter(criteria)
+            self._criteria.append(criteria)
+            self._views.append(view)
+
+    def back(self):
+        """ Cancel the last refinement. Return False if there was none """
+        with self._lock:
+            if len(self._criteria) == 0:
+                return False
+            self.selection()
+            self._criteria.pop()
+            self._views.pop()
+            return True
+
+    def _on_changes(self, events):
+        self._changed = True
+
+    def _uses_fs_attributes(self):
+        """ Tell whether selections or farms query filesystem attributes """
+        return any(len(self.index._parse_criteria(criteria)[1]) > 0
+                   for criteria in self._criteria + [f.criteria for f in self._farms])
+
+    def refresh(self):
+        """
+        Refresh the index. If it changed, update its tree and farms, then
+        invalidate selections. Return whether it changed.
+        """
+        with self._lock:
+            self._changed = False
+            self.index.refresh()
+            if not self._changed and not self._uses_fs_attributes():
+                return False
+            self.index.get_tree()
+            for farm in self._farms:
+                farm.update(self.index)
+            self._generation += 1
+            return self._changed
+
+    ## Background refresh ##
+
+    def start_refresh(self):
+        """ Start refreshing the index in a background thread """
+        if self.refresh_interval is None or self._refresh_thread is not None:
+            return
+        self._stop_refresh.clear()
+        self._refresh_thread = threading.Thread(target=self._refresh_loop,
+                                                daemon=True)
+        self._refresh_thread.start()
+
+    def stop_refresh(self):
+        if self._refresh_thread is not None:
+            self._stop_refresh.set()
+            self._refresh_thread.join()
+            self._refresh_thread = None
+
+    def _refresh_loop(self):
+        while not self._stop_refresh.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as error:
+                logger.warning('Background refresh failed: %s', error)
+
+    def preloop(self):
+        try:
+            import readline
+        except ImportError:
+            pass
+        else:
+            # Criteria hold operators, which readline splits words on
+            readline.set_completer_delims(' \t\n"\'')
+        self.start_refresh()
+
+    def postloop(self):
+        self.stop_refresh()
+
+    ## Command hooks ##
+
+    def _print(self, line=''):
+        self.stdout.write(line + '\n')
+
+    def _update_prompt(self):
+        self.prompt = 'medinx%s (%d)> ' % \
+                      ('' if len(self._criteria) == 0 else ' [%s]' % \
+                       ' > '.join(self._criteria), len(self.selection()._file_table))
+
+    def precmd(self, line):
+        self._start_time = time.perf_counter()
+        return line
+
+    def postcmd(self, stop, line):
+        if self.timing and not stop and self._start_time is not None and \
+           line.strip():
+            self._print('(%.1f ms)' % ((time.perf_counter() - self._start_time) * 1e3))
+        self._start_time = None
+        if not stop:
+            self._update_prompt()
+        return stop
+
+    def onecmd(self, line):
+        with self._lock:
+            try:
+                return super().onecmd(line)
+            except Exception as error:
+                self._print('%s: %s' % (type(error).__name__, error))
+                return False
+
+    def emptyline(self):
+        pass
+
+    def default(self, line):
+        self.refine(line)
+
+    ## Completion ##
+
+    def completenames(self, text, *ignored):
+        return super().completenames(text, *ignored) + self.selection().complete(text)
+
+    def completedefault(self, text, line, begidx, endidx):
+        return self.selection().complete(text)
+
+    complete_refine = completedefault
+
+    def complete_values(self, text, line, begidx, endidx):
+        return self.selection().complete(text) if begidx == len('values ') else []
+
+    ## Commands ##
+
+    def do_refine(self, criteria):
+        """ refine CRITERIA: keep selected entries matching criteria """
+        self.refine(criteria)
+
+    def do_back(self, arg):
+        """ back: cancel the last refinement """
+        if not self.back():
+            self._print('No refinement to cancel')
+
+    def do_reset(self, arg):
+        """ reset: cancel all refinements """
+        with self._lock:
+            self._criteria = []
+            self._views = []
+
+    def do_count(self, arg):
+        """ count: print the number of selected entries """
+        self._print(str(len(self.selection()._file_table)))
+
+    def do_ls(self, arg):
+        """ ls [LIMIT]: list selected files, at most LIMIT of them """
+        files = sorted(self.selection().get_files())
+        limit = int(arg) if arg.strip() else None
+        for fn in files[:limit]:
+            self._print(display_path(fn))
+        if limit is not None and len(files) > limit:
+            self._print('... %d more' % (len(files) - limit))
+
+    def do_show(self, fn):
+        """ show FILE: print the metadata of a file """
+        md = self.index.get_metadata(fn) or self.index.get_metadata(op.abspath(fn))
+        self._print(json.dumps(_format_metadata(md), indent=2, ensure_ascii=False,
+                               sort_keys=True))
+
+    def do_tree(self, arg):
+        """
+        tree [MAX_DEPTH]: show folders of selected entries, with their
+        number of selected / indexed entries
+        """
+        max_depth = int(arg) if arg.strip() else None
+        totals = self.index.get_tree()
+        selection = self.selection()
+        tree = totals if selection is self.index else selection.get_tree()
+        for line in tree.format(max_depth=max_depth, totals=totals):
+            self._print(line)
+
+    def do_attrs(self, arg):
+        """ attrs: list attributes of selected entries, with their type """
+        selection = self.selection()
+        attributes = set()
+        for fn, md in selection._file_table:
+            attributes.update(md)
+        types = selection.get_attribute_types()
+        for attribute in sorted(attributes):
+            value_type = types.get(attribute, None)
+            self._print('%s: %s' % (attribute, 'undefined' if value_type is None \
+                                    else value_type.__name__))
+
+    def do_values(self, attribute):
+        """
+        values ATTRIBUTE: list values of attribute among selected entries,
+        by decreasing number of entries
+        """
+        counts = {}
+        for fn, md in self.selection()._file_table:
+            for value in set(md.get(attribute.strip(), [])):
+                counts[value] = counts.get(value, 0) + 1
+        for value, count in sorted(counts.items(),
+                                   key=lambda vc: (-vc[1], str(vc[0]))):
+            self._print('%6d  %s' % (count, value))
+
+    def do_farm(self, folder):
+        """
+        farm FOLDER: link selected files in folder, kept up to date on
+        refresh (see medinx-farm to update it later)
+        """
+        if not folder.strip():
+            self._print('Expected a folder')
+            return
+        farm = SymlinkFarm(op.abspath(folder.strip()), ' '.join(self._criteria),
+                           root=self.index._root)
+        nb_added, nb_removed = farm.update(self.index)
+        self._farms.append(farm)
+        self._print('%d link(s) added, %d removed' % (nb_added, nb_removed))
+
+    def do_refresh(self, arg):
+        """ refresh: scan the indexed folder again now """
+        self.refresh()
+
+    def do_timing(self, arg):
+        """ timing [on|off]: show or hide the duration of commands """
+        if arg.strip() not in ('', 'on', 'off'):
+            self._print('Expected on or off')
+            return
+        self.timing = arg.strip() != 'off'
+
+    def do_quit(self, arg):
+        """ quit: exit the shell (or Ctrl-D) """
+        return True
+
+    def do_EOF(self, arg):
+        """ Exit """
+        self._print()
+        return True
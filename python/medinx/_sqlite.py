@@ -0,0 +1,372 @@
+"""
+SQLite storage and query backend.
+
+Entries and attribute values are kept in a local SQLite database instead of
+Python dicts, so that memory use does not depend on the collection size.
+Values are stored in one table indexed by (attribute, text) and
+(attribute, number), and filter criteria are translated to SQL so that
+queries use these B-tree indexes.
+"""
+import os
+import sqlite3
+from datetime import datetime
+
+from ._medinx import MetadataIndex, PREDICATE_RE
+from ._medinx import InconsistentValue
+from ._medinx import _iter_sidecars, _load_entry, _save_entries, _split_criteria
+from ._medinx import _Manifests, _entry_fingerprint
+from ._walk import DEFAULT_EXCLUDES
+from ._paths import normalize_scope, subtree_bounds
+from ._dates import parse_date, date_to_epoch
+from ._dump import TYPE_NAMES, NAMED_TYPES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER,
+    size INTEGER
+);
+CREATE TABLE IF NOT EXISTS attributes (
+    name TEXT PRIMARY KEY,
+    type TEXT
+);
+CREATE TABLE IF NOT EXISTS entry_attributes (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    attribute TEXT NOT NULL,
+    PRIMARY KEY (file_id, attribute)
+);
+CREATE TABLE IF NOT EXISTS attribute_values (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    attribute TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT,
+    number REAL,
+    PRIMARY KEY (file_id, attribute, position)
+);
+CREATE INDEX IF NOT EXISTS values_by_text ON attribute_values (attribute, text);
+CREATE INDEX IF NOT EXISTS values_by_number ON attribute_values (attribute, number);
+CREATE INDEX IF NOT EXISTS values_by_text_only ON attribute_values (text);
+"""
+
+# Number of files read at a time when going through all entries
+BATCH_SIZE = 1000
+
+SQL_OPERATORS = {'=' : '=', '!=' : '!=', '<' : '<', '>' : '>',
+                 '<=' : '<=', '>=' : '>='}
+
+def _to_row(value):
+    """
+    Return (text, number) columns of given value.
+    text is str(value), as compared by value-based search.
+    number is used for comparisons of float, bool and date values.
+    """
+    if isinstance(value, str):
+        return value, None
+    elif isinstance(value, bool):
+        return str(value), int(value)
+    elif isinstance(value, float):
+        return str(value), value
+    elif isinstance(value, datetime):
+        return str(value), date_to_epoch(value)
+    raise TypeError('Unsupported type %s' % str(type(value)))
+
+def _from_row(text, value_type):
+    if value_type is float:
+        return float(text)
+    elif value_type is bool:
+        return text == 'True'
+    elif value_type is datetime:
+        # Written by str(), with a space separator
+        return parse_date(text.replace(' ', 'T', 1))
+    return text
+
+class SQLiteIndex:
+    """
+    Metadata index stored in a SQLite database, with the same query and
+    edition interface as MetadataIndex.
+
+    Attribute types are enforced as in MetadataIndex: all values of an
+    attribute must have the same type across the whole index.
+    """
+
+    def __init__(self, db_fn=':memory:'):
+        self._db = sqlite3.connect(db_fn)
+        self._db.execute('PRAGMA foreign_keys = ON')
+        self._db.executescript(SCHEMA)
+
+    @staticmethod
+    def from_folder(path, db_fn=':memory:', **scan_options):
+        """
+        Open given database and synchronize it with given folder.
+        See sync for options.
+        """
+        index = SQLiteIndex(db_fn)
+        index.sync(path, **scan_options)
+        return index
+
+    def close(self):
+        self._db.close()
+
+    ## Synchronization with .mdf files ##
+
+    def sync(self, path, include=None, exclude=DEFAULT_EXCLUDES, max_depth=None,
+             follow_symlinks=False, dedupe=None):
+        """
+        Incrementally update the index from .mdf files and manifests found in
+        given folder: only new or modified sidecar files are parsed, entries
+        whose sidecar was removed are dropped.
+        Traversal options are the same as for MetadataIndex.from_folder.
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        path = os.path.abspath(path)
+
+        with self._db:
+            known = {fn : (file_id, mtime_ns, size) for file_id, fn, mtime_ns, size
+                     in self._db.execute('SELECT id, path, mtime_ns, size FROM files '
+                                         "WHERE path LIKE ? ESCAPE '\\'",
+                                         (_like_prefix(path),))}
+            replaced = False
+            manifests = _Manifests(keep_all=False)
+            for sidecar in _iter_sidecars(path, include, exclude, max_depth,
+                                          follow_symlinks=follow_symlinks,
+                                          dedupe=dedupe, manifests=manifests):
+                fn = sidecar[1]
+                fingerprint = _entry_fingerprint(fn)
+                previous = known.pop(fn, None)
+                if previous is not None and previous[1:] == fingerprint:
+                    continue
+                fn, md = _load_entry(sidecar, manifests)
+                self._write_entry(fn, md, fingerprint)
+                replaced |= previous is not None
+
+            for fn, (file_id, mtime_ns, size) in known.items():
+                self._db.execute('DELETE FROM files WHERE id=?', (file_id,))
+            if replaced or len(known) > 0:
+                self._forget_unused_attributes()
+
+    def _write_entry(self, fn, md, fingerprint=(None, None)):
+        """ Insert or replace entry, checking attribute types """
+        attribute_types = self.get_attribute_types()
+        for attr, values in md.items():
+            if len(values) == 0:
+                continue
+            if any(type(v) != type(values[0]) for v in values):
+                raise InconsistentValue('Non-homogeneous type for %s of file %s' % \
+                                        (attr, fn))
+            if attribute_types.get(attr, None) not in (None, type(values[0])) \
+               and not self._only_defined_by(attr, fn):
+                msg = 'Inconsistent Value type for %s of file %s. ' \
+                      'Should be %s instead of %s' % \
+                      (attr, fn, attribute_types[attr], type(values[0]))
+                raise InconsistentValue(msg)
+
+        row = self._db.execute('SELECT id FROM files WHERE path=?', (fn,)).fetchone()
+        if row is None:
+            file_id = self._db.execute('INSERT INTO files (path, mtime_ns, size) '
+                                       'VALUES (?, ?, ?)',
+                                       (fn,) + tuple(fingerprint)).lastrowid
+        else:
+            file_id = row[0]
+            self._db.execute('UPDATE files SET mtime_ns=?, size=? WHERE id=?',
+                             tuple(fingerprint) + (file_id,))
+            self._db.execute('DELETE FROM entry_attributes WHERE file_id=?',
+                             (file_id,))
+            self._db.execute('DELETE FROM attribute_values WHERE file_id=?',
+                             (file_id,))
+
+        for attr, values in md.items():
+            self._write_values(file_id, attr, values)
+
+    def _only_defined_by(self, attr, fn):
+        """ Check if values of given attribute only come from given file """
+        row = self._db.execute('SELECT COUNT(*) FROM attribute_values v '
+                               'JOIN files f ON f.id = v.file_id '
+                               'WHERE v.attribute=? AND f.path!=?',
+                               (attr, fn)).fetchone()
+        return row[0] == 0
+
+    def _write_values(self, file_id, attr, values):
+        self._db.execute('INSERT OR IGNORE INTO attributes (name, type) '
+                         'VALUES (?, NULL)', (attr,))
+        if len(values) > 0:
+            self._db.execute('UPDATE attributes SET type=? WHERE name=?',
+                             (TYPE_NAMES[type(values[0])], attr))
+        self._db.execute('INSERT OR IGNORE INTO entry_attributes '
+                         '(file_id, attribute) VALUES (?, ?)', (file_id, attr))
+        self._db.executemany('INSERT INTO attribute_values '
+                             '(file_id, attribute, position, text, number) '
+                             'VALUES (?, ?, ?, ?, ?)',
+                             [(file_id, attr, i) + _to_row(v)
+                              for i, v in enumerate(values)])
+
+    def _forget_unused_attributes(self):
+        self._db.execute('DELETE FROM attributes WHERE name NOT IN '
+                         '(SELECT DISTINCT attribute FROM entry_attributes)')
+        self._db.execute('UPDATE attributes SET type=NULL WHERE name NOT IN '
+                         '(SELECT DISTINCT attribute FROM attribute_values)')
+
+    ## Same interface as MetadataIndex ##
+
+    @property
+    def attribute_types(self):
+        return {name : NAMED_TYPES.get(atype, None) for name, atype in
+                self._db.execute('SELECT name, type FROM attributes')}
+
+    def get_attributes(self):
+        return sorted(self.attribute_types.keys())
+
+    def get_attribute_types(self):
+        return self.attribute_types
+
+    def get_files(self):
+        """ Return all indexed files names """
+        return [fn for fn, in self._db.execute('SELECT path FROM files ORDER BY id')]
+
+    def get_metadata(self, fn):
+        row = self._db.execute('SELECT id FROM files WHERE path=?', (fn,)).fetchone()
+        if row is None:
+            return {}
+        return self._read_entry(row[0], self.attribute_types)
+
+    def _read_entry(self, file_id, attribute_types):
+        """ Return metadata of given file, given types of all attributes """
+        md = {attr : [] for attr, in
+              self._db.execute('SELECT attribute FROM entry_attributes '
+                               'WHERE file_id=?', (file_id,))}
+        for attr, text in self._db.execute('SELECT attribute, text '
+                                           'FROM attribute_values WHERE file_id=? '
+                                           'ORDER BY attribute, position',
+                                           (file_id,)):
+            md[attr].append(_from_row(text, attribute_types[attr]))
+        return md
+
+    def set_metadata_attr(self, fn, attr, values):
+
+        # Check that all given value have same type:
+        if any(type(v) != type(values[0]) for v in values):
+            raise InconsistentValue('Non-homogeneous type in given values.')
+
+        row = self._db.execute('SELECT id FROM files WHERE path=?', (fn,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(fn)
+
+        atype = self.attribute_types.get(attr, None)
+        if len(values) > 0 and atype is not None and atype != type(values[0]):
+            msg = 'Inconsistent value type: %s. Should be %s' % \
+                  (str(type(values[0])), str(atype))
+            raise InconsistentValue(msg)
+
+        with self._db:
+            self._db.execute('DELETE FROM attribute_values '
+                             'WHERE file_id=? AND attribute=?', (row[0], attr))
+            self._write_values(row[0], attr, values)
+
+    def save(self, sidecar_format='keep'):
+        """
+        Save metadata in sidecar files, see MetadataIndex.save.
+        """
+        with self._db:
+            attribute_types = self.attribute_types
+            _save_entries(((fn, self._read_entry(file_id, attribute_types))
+                           for files in self._file_batches()
+                           for file_id, fn in files),
+                          sidecar_format)
+            # Fingerprints are read once all files are written, since entries
+            # of a folder may share its manifest
+            for files in self._file_batches():
+                self._db.executemany('UPDATE files SET mtime_ns=?, size=? '
+                                     'WHERE id=?',
+                                     (_entry_fingerprint(fn) + (file_id,)
+                                      for file_id, fn in files))
+
+    def _file_batches(self):
+        """ Yield lists of (id, path) of all files, by increasing id """
+        last_id = -1
+        while True:
+            files = self._db.execute('SELECT id, path FROM files WHERE id>? '
+                                     'ORDER BY id LIMIT ?',
+                                     (last_id, BATCH_SIZE)).fetchall()
+            if len(files) > 0:
+                yield files
+            if len(files) < BATCH_SIZE:
+                return
+            last_id = files[-1][0]
+
+    ## Query ##
+
+    def filter(self, criteria, scope=None):
+        """
+        Return a MetadataIndex holding entries matching given criteria
+        (same syntax and semantics as MetadataIndex.filter, including
+        *scope*). Scopes are looked up as ranges of the path index.
+        """
+        attribute_types = self.attribute_types
+        conditions = []
+        parameters = []
+        for criterion in _split_criteria(criteria):
+            condition, condition_parameters = \
+                self._predicate_to_sql(criterion, attribute_types)
+            conditions.append(condition)
+            parameters.extend(condition_parameters)
+        if scope is not None:
+            condition, condition_parameters = _scope_to_sql(scope)
+            conditions.append(condition)
+            parameters.extend(condition_parameters)
+
+        query = 'SELECT id, path FROM files'
+        if len(conditions) > 0:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY id'
+        return MetadataIndex([(fn, self._read_entry(file_id, attribute_types))
+                              for file_id, fn
+                              in self._db.execute(query, parameters).fetchall()])
+
+    def _predicate_to_sql(self, criterion, attribute_types):
+        """ Return SQL condition on files.id and its parameters """
+        match = PREDICATE_RE.search(criterion)
+        if match.group('op_bin') is not None:
+            attr = match.group('attr')
+            queried_value = match.group('aval')
+            operator = SQL_OPERATORS[match.group('op_bin')]
+            atype = attribute_types.get(attr, None)
+            if atype is None:
+                return '0', []
+            elif atype is str:
+                column = 'text'
+            else:
+                column = 'number'
+                if atype is datetime:
+                    queried_value = date_to_epoch(parse_date(queried_value.strip('#')))
+                elif atype is bool:
+                    queried_value = int(queried_value.lower() == 'true')
+                else:
+                    queried_value = float(queried_value)
+            return ('id IN (SELECT file_id FROM attribute_values '
+                    'WHERE attribute=? AND %s %s ?)' % (column, operator),
+                    [attr, queried_value])
+        else: # Value-based search
+            return ('id IN (SELECT file_id FROM attribute_values WHERE text=?)',
+                    [match.group('val')])
+
+def _scope_to_sql(scope):
+    """
+    Return SQL condition on files.path selecting given folders.
+    Indexed paths are absolute (see SQLiteIndex.sync), so are scopes.
+    """
+    if isinstance(scope, str):
+        scope = [scope]
+    conditions = []
+    parameters = []
+    for folder in scope:
+        folder = normalize_scope(os.path.abspath(folder))
+        conditions.append('path=? OR (path>=? AND path<?)')
+        parameters.append(folder)
+        parameters.extend(subtree_bounds(folder))
+    return '(%s)' % ' OR '.join(conditions), parameters
+
+def _like_prefix(path):
+    """ LIKE pattern matching all paths under given folder """
+    escaped = path.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped.rstrip(os.sep) + os.sep + '%'
@@ -0,0 +1,164 @@
+"""
+Directory hierarchy of indexed paths, with per-directory counts.
+
+Each node of a DirTree holds the number of entries it contains, directly
+and in its whole sub-tree. Counts are updated along the ancestors of a path
+when it is added or removed, so that expanding a folder only lists its
+children, whatever the size of the hierarchy below.
+"""
+import os
+import os.path as op
+
+class _Node:
+    __slots__ = ('children', 'nb_entries', 'total')
+
+    def __init__(self):
+        self.children = {}
+        # Number of entries at this exact path (0 or 1, more if a path
+        # was added several times)
+        self.nb_entries = 0
+        # Number of entries in the sub-tree, this node included
+        self.total = 0
+
+def _split(path):
+    """
+    Return components of given path, '' standing for the root of an
+    absolute path
+    """
+    path = op.normpath(path)
+    if path == os.curdir:
+        return []
+    elif path == os.sep:
+        return ['']
+    return path.split(os.sep)
+
+def _join(parts):
+    if len(parts) == 0:
+        return os.curdir
+    elif parts == ['']:
+        return os.sep
+    return os.sep.join(parts)
+
+class DirTree:
+    """
+    Directory hierarchy of a set of paths, with aggregated entry counts.
+
+    Args:
+        - paths (iterable of str): initial paths
+    """
+    def __init__(self, paths=()):
+        self._root = _Node()
+        for path in paths:
+            self.add(path)
+
+    def add(self, path):
+        node = self._root
+        node.total += 1
+        for part in _split(path):
+            node = node.children.setdefault(part, _Node())
+            node.total += 1
+        node.nb_entries += 1
+
+    def remove(self, path):
+        """ Remove one occurrence of given path. Raise KeyError if absent """
+        parts = _split(path)
+        nodes = [self._root]
+        for part in parts:
+            nodes.append(nodes[-1].children[part])
+        if nodes[-1].nb_entries == 0:
+            raise KeyError(path)
+        nodes[-1].nb_entries -= 1
+        for node in nodes:
+            node.total -= 1
+        for parent, part, node in zip(nodes[-2::-1], parts[::-1], nodes[:0:-1]):
+            if node.total == 0:
+                del parent.children[part]
+
+    def update(self, added=(), removed=()):
+        """ Remove then add given paths """
+        for path in removed:
+            self.remove(path)
+        for path in added:
+            self.add(path)
+
+    def _find(self, folder):
+        node = self._root
+        for part in _split(folder):
+            node = node.children.get(part, None)
+            if node is None:
+                return None
+        return node
+
+    def __len__(self):
+        return self._root.total
+
+    def count(self, folder):
+        """ Return the number of entries of given folder and its content """
+        node = self._find(folder)
+        return 0 if node is None else node.total
+
+    def is_entry(self, path):
+        node = self._find(path)
+        return node is not None and node.nb_entries > 0
+
+    def children(self, folder):
+        """
+        Return tuple(child path, count) for the children of given folder,
+        sorted by name, count being the number of entries in the child and
+        its content
+        """
+        node = self._find(folder)
+        if node is None:
+            return []
+        return [(op.join(folder, name), child.total)
+                for name, child in sorted(node.children.items())]
+
+    def top(self):
+        """
+        Return the deepest folder holding all entries, None if the tree is
+        empty
+        """
+        if self._root.total == 0:
+            return None
+        parts = []
+        node = self._root
+        while len(node.children) == 1 and node.nb_entries == 0:
+            name, child = next(iter(node.children.items()))
+            if child.nb_entries > 0 and len(child.children) == 0:
+                break # single entry: show its folder
+            parts.append(name)
+            node = child
+        return _join(parts)
+
+    def format(self, folder=None, max_depth=None, totals=None):
+        """
+        Return lines of a text rendering of the hierarchy under given folder
+        (default: top()), as the tree command. Folders are followed by their
+        count, and by their count in *totals* (DirTree), if given.
+        """
+        if folder is None:
+            folder = self.top()
+            if folder is None:
+                return []
+        lines = [self._label(folder, folder, totals)]
+        self._format_children(folder, '', 1, max_depth, totals, lines)
+        return lines
+
+    def _label(self, path, name, totals):
+        node = self._find(path)
+        if node is None or len(node.children) == 0:
+            return name
+        if totals is None:
+            return '%s (%d)' % (name, node.total)
+        return '%s (%d/%d)' % (name, node.total, totals.count(path))
+
+    def _format_children(self, folder, prefix, depth, max_depth, totals, lines):
+        if max_depth is not None and depth > max_depth:
+            return
+        children = self.children(folder)
+        for ichild, (path, count) in enumerate(children):
+            last = ichild == len(children) - 1
+            lines.append(prefix + ('└── ' if last else '├── ') +
+                         self._label(path, op.basename(path), totals))
+            self._format_children(path, prefix + ('    ' if last else '│   '),
+                                  depth + 1, max_depth, totals, lines)
@@ -0,0 +1,109 @@
+"""
+Saved queries registered on a MetadataIndex, whose results are kept up to
+date as the index changes (see MetadataIndex.register_view).
+
+A view evaluates its query once when registered, then only evaluates the
+entries that changed: the edited entry on set_metadata_attr, the new one on
+add_entry, and on refresh the entries whose metadata was parsed again, as
+unchanged sidecar files keep the same metadata object (see _walk.ScanCache).
+Views querying filesystem attributes evaluate all entries on refresh, since
+files may change without their metadata.
+
+Results are held in a set of paths, so that reading a view does not run any
+query. Subscribers are notified with the files added to and removed from
+the view after each change.
+"""
+from ._paths import normalize_scope, subtree_bounds
+
+class SavedView:
+    """
+    Files of an index matching a query, updated with the index.
+    Created by MetadataIndex.register_view.
+
+    Attributes:
+        - name (str)
+        - criteria (str), scope (str or list of str): see MetadataIndex.filter
+    """
+    def __init__(self, index, name, criteria, scope=None):
+        self.name = name
+        self.criteria = criteria
+        self.scope = scope
+        self._predicates, self._fs_predicates = index._parse_criteria(criteria)
+        if scope is None:
+            self._scope_prefixes = None
+        else:
+            folders = [scope] if isinstance(scope, str) else scope
+            self._scope_prefixes = [(normalize_scope(f), subtree_bounds(normalize_scope(f))[0])
+                                    for f in folders]
+        self._files = set(index.filter(criteria, scope).get_files())
+        self._subscribers = []
+
+    @property
+    def files(self):
+        """ Set of matching files, updated in place: must not be modified """
+        return self._files
+
+    def get_files(self):
+        """ Return sorted matching files """
+        return sorted(self._files)
+
+    def __len__(self):
+        return len(self._files)
+
+    def __contains__(self, fn):
+        return fn in self._files
+
+    def __repr__(self):
+        return 'SavedView(%r, %r, %d files)' % (self.name, self.criteria,
+                                                 len(self._files))
+
+    def subscribe(self, callback):
+        """
+        Call callback(view, added, removed) after each change of the view,
+        *added* and *removed* being sorted lists of files.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    @property
+    def has_fs_predicates(self):
+        return len(self._fs_predicates) > 0
+
+    def _in_scope(self, fn):
+        return self._scope_prefixes is None or \
+            any(fn == folder or fn.startswith(prefix)
+                for folder, prefix in self._scope_prefixes)
+
+    def _matches(self, index, fn, md):
+        if not self._in_scope(fn) or \
+           not all(index._entry_matches(md, p) for p in self._predicates):
+            return False
+        if self.has_fs_predicates:
+            fs_stats = index._get_fs_stats()
+            return all(index._fs_matches(fs_stats, fn, p)
+                       for p in self._fs_predicates)
+        return True
+
+    def update(self, index, entries, removed_files=()):
+        """
+        Evaluate given entries (tuple(file, metadata)) of the index and
+        forget removed files, then notify subscribers of changes
+        """
+        added = []
+        removed = [fn for fn in removed_files if fn in self._files]
+        self._files.difference_update(removed)
+        for fn, md in entries:
+            if self._matches(index, fn, md):
+                if fn not in self._files:
+                    self._files.add(fn)
+                    added.append(fn)
+            elif fn in self._files:
+                self._files.remove(fn)
+                removed.append(fn)
+        if len(added) > 0 or len(removed) > 0:
+            added.sort()
+            removed.sort()
+            for callback in list(self._subscribers):
+                callback(self, added, removed)
@@ -0,0 +1,412 @@
+"""
+Folder traversal to find sidecar files, built on os.scandir.
+
+Compared to os.walk followed by one os.path.exists per sidecar, the file
+associated with a sidecar is looked up in the directory listing that was
+already read, so no extra stat call is made. Directories can be pruned with
+gitignore-style patterns and a maximum depth.
+
+A folder may also hold a manifest (MANIFEST_NAME), defining the metadata of
+several of its files in one JSON document, instead of one sidecar per file.
+"""
+import os
+import os.path as op
+import re
+import time
+
+from ._paths import join_path
+
+MDF_EXTENSION = '.mdf'
+BINARY_EXTENSION = '.mdfb'
+
+# Sidecar files, by order of precedence when a file has several
+SIDECAR_EXTENSIONS = (MDF_EXTENSION, BINARY_EXTENSION)
+
+# Consolidated metadata of the files of a folder
+MANIFEST_NAME = '.medinx_manifest.json'
+
+# Folders that are never tagged
+DEFAULT_EXCLUDES = ['.git/', '.hg/', '.svn/', 'node_modules/']
+
+def _glob_to_regexp(pattern):
+    """
+    Translate a glob pattern to a regexp matching relative paths:
+        - "*" matches anything but "/", "?" any single character but "/"
+        - "**" matches any number of directories
+        - [...] character classes are kept as is
+    """
+    regexp = ''
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            regexp += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == len(pattern):
+            regexp += '(?:/.*)?'
+            i += 3
+        elif pattern.startswith('**', i):
+            regexp += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            regexp += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            regexp += '[^/]'
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i+1:]:
+            end = pattern.index(']', i + 1)
+            regexp += pattern[i:end+1]
+            i = end + 1
+        else:
+            regexp += re.escape(pattern[i])
+            i += 1
+    return re.compile(r'^%s$' % regexp)
+
+class PathFilter:
+    """
+    Gitignore-style selection of paths relative to the traversed root.
+
+    Pattern syntax:
+        - a pattern without "/" matches the base name at any depth
+          (eg "*.bak", "node_modules/")
+        - a pattern with a "/" (other than a trailing one) matches the path
+          relative to the root (eg "archives/20*", "**/tmp")
+        - a trailing "/" restricts the pattern to directories
+        - a leading "!" re-includes paths matched by a previous pattern.
+          The last matching pattern wins.
+
+    Args:
+        - include (list of str): if given, only paths matching one of these
+                                 patterns, or lying in a matching directory,
+                                 are selected
+        - exclude (list of str): paths matching these patterns are rejected.
+                                 Excluded directories are not traversed.
+    """
+    def __init__(self, include=None, exclude=None):
+        self.include = None if include is None else \
+                       [self._compile(p) for p in include]
+        self.exclude = [self._compile(p) for p in (exclude or [])]
+
+    @staticmethod
+    def _compile(pattern):
+        negate = pattern.startswith('!')
+        if negate:
+            pattern = pattern[1:]
+        dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        anchored = '/' in pattern
+        return (_glob_to_regexp(pattern.lstrip('/')), negate, dir_only, anchored)
+
+    @staticmethod
+    def _matches(rule, rel_path, is_dir):
+        regexp, negate, dir_only, anchored = rule
+        if dir_only and not is_dir:
+            return False
+        return regexp.match(rel_path if anchored else op.basename(rel_path)) \
+            is not None
+
+    def is_excluded(self, rel_path, is_dir):
+        excluded = False
+        for rule in self.exclude:
+            if self._matches(rule, rel_path, is_dir):
+                excluded = not rule[1]
+        return excluded
+
+    def is_included(self, rel_path, is_dir):
+        """ Check include patterns on given path and its parent folders """
+        if self.include is None:
+            return True
+        parts = rel_path.split('/')
+        for depth in range(len(parts), 0, -1):
+            sub_path = '/'.join(parts[:depth])
+            sub_is_dir = is_dir or depth < len(parts)
+            for rule in self.include:
+                if not rule[1] and self._matches(rule, sub_path, sub_is_dir):
+                    return True
+        return False
+
+class ScanCache:
+    """
+    State of previous traversals of a folder, to skip unchanged parts when
+    it is scanned again:
+        - for each directory, its mtime and the sidecar files and
+          sub-directories it contained. If the mtime of a directory has not
+          changed, it is not listed again. Sub-directories are still visited
+          since changes deep in a tree do not modify the mtime of parents.
+        - for each sidecar file, its fingerprint (mtime_ns, size) and the
+          metadata parsed from it, reused if the fingerprint is unchanged.
+
+    Fingerprints too close to the scan time are not trusted, since a
+    modification in the same clock tick would go unnoticed.
+
+    Cached metadata objects are handed out to indexes, which edit them in
+    place once they called release() on them.
+    """
+    RACY_DELAY_NS = 2 * 10**9
+
+    def __init__(self):
+        self.folders = {}
+        self.sidecars = {}
+        self._seen_folders = None
+        self._seen_sidecars = None
+        # Maps id() of cached metadata dicts to the list of tuple(sidecar
+        # path, name in manifest or None) referencing them, and paths of
+        # cached manifests:
+        self._holders = {}
+        self._manifests = set()
+
+    def begin_scan(self):
+        """ Start recording visited folders and sidecar files """
+        self._seen_folders = set()
+        self._seen_sidecars = set()
+
+    def end_scan(self):
+        """ Forget folders and sidecar files not visited since begin_scan """
+        for folder in set(self.folders).difference(self._seen_folders):
+            del self.folders[folder]
+        for md_fn in set(self.sidecars).difference(self._seen_sidecars):
+            self._forget(md_fn)
+        self._seen_folders = None
+        self._seen_sidecars = None
+
+    def _is_racy(self, mtime_ns):
+        return time.time() * 1e9 - mtime_ns < ScanCache.RACY_DELAY_NS
+
+    def get_listing(self, folder, mtime_ns):
+        if self._seen_folders is not None:
+            self._seen_folders.add(folder)
+        cached = self.folders.get(folder, None)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+        return None
+
+    def set_listing(self, folder, mtime_ns, listing):
+        if not self._is_racy(mtime_ns):
+            self.folders[folder] = (mtime_ns, listing)
+        else:
+            self.folders.pop(folder, None)
+
+    def get_metadata(self, md_fn, fingerprint):
+        if self._seen_sidecars is not None:
+            self._seen_sidecars.add(md_fn)
+        cached = self.sidecars.get(md_fn, None)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        return None
+
+    def set_metadata(self, md_fn, fingerprint, md, manifest=False):
+        """
+        Cache metadata parsed from given sidecar file, or entries (dict
+        mapping names to metadata) of given manifest if *manifest* is True
+        """
+        self._forget(md_fn)
+        if not self._is_racy(fingerprint[0]):
+            self.sidecars[md_fn] = (fingerprint, md)
+            if manifest:
+                self._manifests.add(md_fn)
+                for name, entry_md in md.items():
+                    self._holders.setdefault(id(entry_md), []).append((md_fn, name))
+            else:
+                self._holders.setdefault(id(md), []).append((md_fn, None))
+
+    def _forget(self, md_fn):
+        cached = self.sidecars.pop(md_fn, None)
+        if cached is None:
+            return
+        if md_fn in self._manifests:
+            self._manifests.remove(md_fn)
+            mds = list(cached[1].items())
+        else:
+            mds = [(None, cached[1])]
+        for name, md in mds:
+            holders = self._holders[id(md)]
+            holders.remove((md_fn, name))
+            if len(holders) == 0:
+                del self._holders[id(md)]
+
+    def release(self, md):
+        """
+        Replace cached references to given metadata object by a copy, so
+        that the caller can modify it in place. Cached values stay the ones
+        parsed from files.
+        """
+        holders = self._holders.pop(id(md), None)
+        if holders is None:
+            return
+        copy = md.copy()
+        self._holders[id(copy)] = holders
+        for md_fn, name in holders:
+            fingerprint, cached = self.sidecars[md_fn]
+            if name is None:
+                self.sidecars[md_fn] = (fingerprint, copy)
+            else:
+                cached[name] = copy
+
+def find_sidecar(path):
+    """ Return the sidecar file of given path, None if it has none """
+    for extension in SIDECAR_EXTENSIONS:
+        if op.exists(path + extension):
+            return path + extension
+    return None
+
+def _list_folder(folder):
+    """
+    Return tuple(sidecars, sub_folders, others) where:
+        - sidecars is a list of (sidecar name, associated type), associated
+          type being 'file', 'folder', or None if the associated file does not
+          exist. If a file has sidecars in several formats, only the first
+          one in SIDECAR_EXTENSIONS is listed.
+        - sub_folders is a list of (name, is_symlink)
+        - others is None if the folder has no manifest. Otherwise, it maps
+          the names of other entries to their type ('file' or 'folder'),
+          to resolve the entries of the manifest.
+    """
+    with os.scandir(folder) as it:
+        entries = {entry.name : entry for entry in it}
+
+    sidecars = []
+    sub_folders = []
+    others = {} if MANIFEST_NAME in entries else None
+    for name, entry in entries.items():
+        if entry.is_dir():
+            sub_folders.append((name, entry.is_symlink()))
+            if others is not None:
+                others[name] = 'folder'
+            continue
+        associated_name, extension = op.splitext(name)
+        if extension not in SIDECAR_EXTENSIONS:
+            if others is not None and name != MANIFEST_NAME:
+                others[name] = 'file'
+            continue
+        if extension != MDF_EXTENSION and \
+           any(associated_name + e in entries
+               for e in SIDECAR_EXTENSIONS[:SIDECAR_EXTENSIONS.index(extension)]):
+            continue
+        associated_entry = entries.get(associated_name, None)
+        if associated_entry is None:
+            associated_type = None
+        elif associated_entry.is_dir():
+            associated_type = 'folder'
+        else:
+            associated_type = 'file'
+        sidecars.append((name, associated_type))
+    return sidecars, sub_folders, others
+
+def iter_sidecars(path, include=None, exclude=DEFAULT_EXCLUDES, max_depth=None,
+                  cache=None, follow_symlinks=False, dedupe=None, onerror=None,
+                  manifest_loader=None, stats=None):
+    """
+    Recursively find sidecar files in given folder, top-down.
+
+    Args:
+        - path (str): folder to traverse
+        - include, exclude (list of str): gitignore-style patterns, see
+                                          PathFilter
+        - max_depth (int): maximum depth of traversed sub-folders. 0 means
+                           that only sidecars directly in *path* are found.
+        - cache (ScanCache): listings of previous scans, to skip listing
+                             unchanged directories. Updated with this scan.
+        - follow_symlinks (bool): traverse symlinked directories. Each
+                                  directory, identified by (st_dev, st_ino),
+                                  is traversed once, so that symlink loops
+                                  are not followed.
+        - dedupe (bool): yield only one sidecar per physical associated file,
+                         identified by (st_dev, st_ino), when it is reachable
+                         through several paths (symlinks, hardlinks).
+                         Costs one stat per sidecar. Defaults to
+                         *follow_symlinks*.
+        - onerror (callable): called with the OSError raised when a folder,
+                              or an associated file to dedupe, cannot be
+                              read, which is then skipped.
+                              If None, the error is raised.
+        - manifest_loader (callable): called with the path of the manifest
+                                      of a folder, before any sidecar of the
+                                      folder is yielded. Returns the file
+                                      names it defines. If None, manifests
+                                      are ignored.
+        - stats (dict): if given, stat results of associated files made for
+                        *dedupe* are stored in it, by associated path
+
+    Yield tuple(sidecar path, associated path, associated type), where type
+    is 'file', 'folder', or None if the associated file does not exist
+    (including dangling symbolic links when deduping).
+    Files defined in a manifest but without sidecar file are yielded with
+    the manifest as sidecar path. Paths are normalized (see _paths).
+    """
+    path = op.normpath(path)
+    if dedupe is None:
+        dedupe = follow_symlinks
+    path_filter = PathFilter(include, exclude)
+    visited_folders = set()
+    found_files = set()
+    folders = [(path, '', 0)]
+    while len(folders) > 0:
+        folder, rel_folder, depth = folders.pop()
+        try:
+            listing = None
+            if cache is not None or follow_symlinks:
+                stat = os.stat(folder)
+                if follow_symlinks:
+                    folder_id = (stat.st_dev, stat.st_ino)
+                    if folder_id in visited_folders:
+                        continue
+                    visited_folders.add(folder_id)
+                if cache is not None:
+                    listing = cache.get_listing(folder, stat.st_mtime_ns)
+            if listing is None:
+                listing = _list_folder(folder)
+                if cache is not None:
+                    cache.set_listing(folder, stat.st_mtime_ns, listing)
+        except OSError as error:
+            if onerror is None:
+                raise
+            onerror(error)
+            continue
+        sidecars, sub_folders, others = listing
+
+        entries = [(name, op.splitext(name)[0], associated_type)
+                   for name, associated_type in sidecars]
+        if others is not None and manifest_loader is not None and \
+           not path_filter.is_excluded(rel_folder + MANIFEST_NAME, False):
+            manifest_names = manifest_loader(join_path(folder, MANIFEST_NAME))
+            with_sidecar = set(associated_name for _, associated_name, _ in entries)
+            entries.extend((MANIFEST_NAME, name, others.get(name, None))
+                           for name in manifest_names if name not in with_sidecar)
+
+        for name, associated_name, associated_type in entries:
+            rel_path = rel_folder + name
+            rel_associated = rel_folder + associated_name
+            associated_is_dir = associated_type == 'folder'
+            if path_filter.is_excluded(rel_path, False) or \
+               path_filter.is_excluded(rel_associated, associated_is_dir) or \
+               not path_filter.is_included(rel_associated, associated_is_dir):
+                continue
+            associated_fn = join_path(folder, associated_name)
+            if dedupe and associated_type is not None:
+                try:
+                    stat = os.stat(associated_fn)
+                except FileNotFoundError:
+                    # Dangling symbolic link
+                    stat = None
+                    associated_type = None
+                except OSError as error:
+                    if onerror is None:
+                        raise
+                    onerror(error)
+                    continue
+                if stat is not None:
+                    if stats is not None:
+                        stats[associated_fn] = stat
+                    file_id = (stat.st_dev, stat.st_ino)
+                    if file_id in found_files:
+                        continue
+                    found_files.add(file_id)
+            yield (join_path(folder, name), associated_fn, associated_type)
+
+        if max_depth is not None and depth >= max_depth:
+            continue
+        for name, is_symlink in reversed(sub_folders):
+            rel_path = rel_folder + name
+            if (follow_symlinks or not is_symlink) and \
+               not path_filter.is_excluded(rel_path, True):
+                folders.append((join_path(folder, name), rel_path + '/', depth + 1))
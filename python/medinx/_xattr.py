@@ -0,0 +1,109 @@
+"""
+Storage of MDF metadata in extended attributes of files (Linux), an
+alternative to sidecar files.
+
+The metadata of a file is held in one attribute, XATTR_NAME, with the same
+JSON content as a .mdf file. Attributes follow the file when it is moved or
+renamed, and cost no extra inode. Files are discovered with os.scandir then
+one os.listxattr per entry, and read with one os.getxattr, without opening
+them.
+
+Attribute values are limited in size by the filesystem (one block on ext4,
+typically 4 KB): writing larger metadata raises OSError.
+See MetadataIndex.from_folder to load an index from attributes, and
+import_xattrs / export_xattrs to convert from / to sidecar files.
+"""
+import os
+import os.path as op
+
+from ._walk import PathFilter, DEFAULT_EXCLUDES, SIDECAR_EXTENSIONS, MANIFEST_NAME
+from ._paths import join_path
+
+XATTR_NAME = 'user.medinx'
+
+def is_supported():
+    """ Check whether extended attributes are available on this platform """
+    return hasattr(os, 'listxattr')
+
+def read_xattr(fn):
+    """ Return the raw metadata attribute of given file, None if it has none """
+    if XATTR_NAME not in os.listxattr(fn):
+        return None
+    return os.getxattr(fn, XATTR_NAME)
+
+def write_xattr(fn, content):
+    os.setxattr(fn, XATTR_NAME, content)
+
+def remove_xattr(fn):
+    """ Remove the metadata attribute of given file, if any """
+    if XATTR_NAME in os.listxattr(fn):
+        os.removexattr(fn, XATTR_NAME)
+
+def iter_tagged(path, include=None, exclude=DEFAULT_EXCLUDES, max_depth=None,
+                follow_symlinks=False, dedupe=None, onerror=None, types=None):
+    """
+    Recursively find files and folders holding a metadata attribute in given
+    folder, top-down. Options are the same as for _walk.iter_sidecars, except
+    that *onerror* is also called when the attributes of an entry cannot be
+    read. Sidecar files and manifests are skipped.
+    If *types* (dict) is given, the type ('file' or 'folder') of yielded
+    paths is stored in it, from the directory listing.
+
+    Yield tuple(path, raw attribute content), paths being normalized as
+    by _walk.iter_sidecars
+    """
+    path = op.normpath(path)
+    if dedupe is None:
+        dedupe = follow_symlinks
+    path_filter = PathFilter(include, exclude)
+    visited_folders = set()
+    found_files = set()
+    folders = [(path, '', 0)]
+    while len(folders) > 0:
+        folder, rel_folder, depth = folders.pop()
+        try:
+            if follow_symlinks:
+                stat = os.stat(folder)
+                if (stat.st_dev, stat.st_ino) in visited_folders:
+                    continue
+                visited_folders.add((stat.st_dev, stat.st_ino))
+            with os.scandir(folder) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as error:
+            if onerror is None:
+                raise
+            onerror(error)
+            continue
+
+        sub_folders = []
+        for entry in entries:
+            is_dir = entry.is_dir()
+            entry_path = join_path(folder, entry.name)
+            rel_path = rel_folder + entry.name
+            if path_filter.is_excluded(rel_path, is_dir):
+                continue
+            if is_dir and (follow_symlinks or not entry.is_symlink()):
+                sub_folders.append((entry_path, rel_path + '/', depth + 1))
+            if entry.name == MANIFEST_NAME or \
+               op.splitext(entry.name)[1] in SIDECAR_EXTENSIONS or \
+               not path_filter.is_included(rel_path, is_dir):
+                continue
+            try:
+                content = read_xattr(entry_path)
+                if content is not None and dedupe:
+                    stat = entry.stat()
+                    if (stat.st_dev, stat.st_ino) in found_files:
+                        continue
+                    found_files.add((stat.st_dev, stat.st_ino))
+            except OSError as error:
+                if onerror is None:
+                    raise
+                onerror(error)
+                continue
+            if content is not None:
+                if types is not None:
+                    types[entry_path] = 'folder' if is_dir else 'file'
+                yield entry_path, content
+
+        if max_depth is None or depth < max_depth:
+            folders.extend(reversed(sub_folders))
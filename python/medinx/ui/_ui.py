@@ -2,6 +2,7 @@
 import os.path as op
 import sys
 from medinx import parse_folder, unformat_values, format_values
+from medinx._events import ATTRIBUTE_SET
 
 import logging
 logger = logging.getLogger('medinx')
@@ -56,10 +57,31 @@ class MdataTableModel(QtCore.QAbstractTableModel):
     def __init__(self, mdata_index, parent=None, *args):
         QtCore.QAbstractTableModel.__init__(self, parent, *args)
 
-        self.attributes = mdata_index.get_attributes()
-        self.attribute_types = mdata_index.get_attribute_types()
-        self.file_names = mdata_index.get_files()
         self.mdata_index = mdata_index
+        self._load_index()
+        mdata_index.subscribe(self.on_index_changes)
+
+    def _load_index(self):
+        self.attributes = self.mdata_index.get_attributes()
+        self.attribute_types = self.mdata_index.get_attribute_types()
+        self.file_names = self.mdata_index.get_files()
+        self._rows = {fn : row for row, fn in enumerate(self.file_names)}
+        self._columns = {attr : col for col, attr in enumerate(self.attributes)}
+
+    def on_index_changes(self, events):
+        """
+        Update views of changed cells, or of the whole table if entries or
+        attributes were added or removed
+        """
+        if any(e.kind != ATTRIBUTE_SET or e.attribute not in self._columns
+               for e in events):
+            self.beginResetModel()
+            self._load_index()
+            self.endResetModel()
+            return
+        for event in events:
+            cell = self.index(self._rows[event.path], self._columns[event.attribute])
+            self.dataChanged.emit(cell, cell)
 
     def flags(self, index):
         return QtCore.Qt.ItemIsEditable | QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
@@ -103,9 +125,9 @@ class MdataTableModel(QtCore.QAbstractTableModel):
                 logger.error('Could not unformat %s while setting attr %s',
                              value, attr)
                 return False
+            # Views are updated by on_index_changes:
             self.mdata_index.set_metadata_attr(self.file_names[index.row()],
                                                attr, conv_vals)
-            # self.dataChanged.emit(index, index)
             return True
         return False
 
@@ -0,0 +1,47 @@
+"""
+Time loading a folder of JSON sidecar files against the same folder
+converted to binary sidecar files.
+
+Usage (from package root):
+$ PYTHONPATH=python python sandbox/bench_binary.py [nb_entries]
+"""
+import os
+import os.path as op
+import sys
+import json
+import time
+import shutil
+import tempfile
+
+import medinx
+
+def make_folder(root, nb_entries):
+    for i in range(nb_entries):
+        folder = op.join(root, 'folder_%d' % (i // 100))
+        if not op.exists(folder):
+            os.makedirs(folder)
+        fn = op.join(folder, 'doc_%d.pdf' % i)
+        with open(fn, 'w') as fout:
+            fout.write('dummy_content')
+        with open(fn + '.mdf', 'w') as fout:
+            json.dump({'author' : ['author_%d' % (i % 2000)],
+                       'rating' : [i % 10],
+                       'review_date' : ['#2016-02-%02dT12:00' % (i % 28 + 1)]},
+                      fout)
+
+def main():
+    nb_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    root = tempfile.mkdtemp(prefix='medinx_bench_')
+    try:
+        make_folder(root, nb_entries)
+        for sidecar_format in ['json', 'binary']:
+            medinx.convert_sidecars(root, sidecar_format)
+            t0 = time.perf_counter()
+            medinx.parse_folder(root)
+            print('Load %s sidecars: %8.1f ms' % \
+                  (sidecar_format, (time.perf_counter() - t0) * 1e3))
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Compare filter timings of the default scan and the columnar engine
+on a synthetic index.
+
+Usage (from package root):
+$ PYTHONPATH=python python sandbox/bench_columnar.py [nb_entries]
+"""
+import sys
+import random
+import timeit
+from datetime import datetime, timedelta, timezone
+
+import medinx
+
+def make_index(nb_entries, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    file_table = []
+    for i in range(nb_entries):
+        md = {'rating' : [rng.uniform(0, 10) for _ in range(rng.randint(1, 3))],
+              'reviewed' : [rng.random() < 0.5],
+              'review_date' : [start + timedelta(days=rng.randint(0, 7000))],
+              'author' : ['author_%d' % rng.randint(0, 500)]}
+        file_table.append(('doc_%d.pdf' % i, md))
+    return medinx.MetadataIndex(file_table)
+
+def main():
+    nb_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    index = make_index(nb_entries)
+
+    for criteria in ['rating>9.5', 'reviewed=True rating<1',
+                     'review_date>=2015-06-01', 'author=author_12 rating>5']:
+        index.use_columnar(False)
+        expected = index.filter(criteria).get_files()
+        t_scan = min(timeit.repeat(lambda: index.filter(criteria),
+                                   number=1, repeat=3))
+
+        index.use_columnar(True)
+        index.filter(criteria) # build columns
+        assert index.filter(criteria).get_files() == expected
+        t_col = min(timeit.repeat(lambda: index.filter(criteria),
+                                  number=1, repeat=3))
+        print('%-28s scan: %7.1f ms  columnar: %7.1f ms  (x%.1f, %d matches)' % \
+              (criteria, t_scan*1e3, t_col*1e3, t_scan/t_col, len(expected)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Time a query answered by a running daemon against loading the folder for
+each query, as a short-lived command would without daemon.
+
+Usage (from package root):
+$ PYTHONPATH=python python sandbox/bench_daemon.py [nb_entries]
+"""
+import os
+import os.path as op
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+
+import medinx
+
+def make_folder(root, nb_entries):
+    for i in range(nb_entries):
+        folder = op.join(root, 'folder_%d' % (i // 100))
+        if not op.exists(folder):
+            os.makedirs(folder)
+        fn = op.join(folder, 'doc_%d.pdf' % i)
+        with open(fn, 'w') as fout:
+            fout.write('dummy_content')
+        with open(fn + '.mdf', 'w') as fout:
+            json.dump({'author' : ['author_%d' % (i % 200)]}, fout)
+
+def main():
+    nb_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    tmp_dir = tempfile.mkdtemp(prefix='medinx_bench_')
+    root = op.join(tmp_dir, 'data')
+    try:
+        make_folder(root, nb_entries)
+        t0 = time.perf_counter()
+        medinx.parse_folder(root).filter('author=author_1')
+        print('Load and query:  %8.1f ms' % ((time.perf_counter() - t0) * 1e3))
+
+        daemon = medinx.IndexDaemon(op.join(tmp_dir, 'medinx.sock'), [root])
+        thread = threading.Thread(target=daemon.serve_forever)
+        thread.start()
+        try:
+            t0 = time.perf_counter()
+            with medinx.DaemonClient(op.join(tmp_dir, 'medinx.sock')) as client:
+                client.request('filter', root=root, criteria='author=author_1')
+            print('Daemon query:    %8.1f ms' % ((time.perf_counter() - t0) * 1e3))
+        finally:
+            daemon.shutdown()
+            thread.join()
+    finally:
+        shutil.rmtree(tmp_dir)
+
+if __name__ == '__main__':
+    main()
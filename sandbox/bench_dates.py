@@ -0,0 +1,41 @@
+"""
+Time parsing of MDF date values with iso8601 against medinx._dates, on
+distinct and on repeated date strings.
+
+Usage (from package root):
+$ PYTHONPATH=python python sandbox/bench_dates.py [nb_values]
+"""
+import sys
+import time
+import random
+from datetime import datetime, timedelta, timezone
+
+import iso8601
+from medinx import _dates
+
+def make_values(nb_values, nb_distinct, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    distinct = [(start + timedelta(minutes=rng.randint(0, 10**7))).isoformat('T')
+                for i in range(nb_distinct)]
+    return [rng.choice(distinct) for i in range(nb_values)]
+
+def main():
+    nb_values = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    for label, nb_distinct in [('distinct', nb_values), ('repeated', 1000)]:
+        values = make_values(nb_values, nb_distinct)
+        t0 = time.perf_counter()
+        for value in values:
+            iso8601.parse_date(value)
+        t_iso = time.perf_counter() - t0
+
+        _dates.parse_date.cache_clear()
+        t0 = time.perf_counter()
+        for value in values:
+            _dates.parse_date(value)
+        t_fast = time.perf_counter() - t0
+        print('%s dates: iso8601 %7.1f ms, medinx %7.1f ms' % \
+              (label, t_iso * 1e3, t_fast * 1e3))
+
+if __name__ == '__main__':
+    main()
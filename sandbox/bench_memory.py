@@ -0,0 +1,62 @@
+"""
+Compare memory used by index entries stored as dicts and in compact form.
+
+Usage (from package root):
+$ PYTHONPATH=python python sandbox/bench_memory.py [nb_entries]
+"""
+import sys
+import json
+import random
+import tracemalloc
+
+from iso8601 import parse_date
+
+import medinx
+
+def load(content):
+    """ Same result as medinx load_json, without the (slow) schema check """
+    md = json.loads(content)
+    md['rating'] = [float(v) for v in md['rating']]
+    md['publication_date'] = [parse_date(v[1:]) for v in md['publication_date']]
+    return md
+
+def make_sidecars(nb_entries, seed=0):
+    """ Raw MDF contents, so that each entry gets its own string objects """
+    rng = random.Random(seed)
+    for i in range(nb_entries):
+        md = {'author' : ['author_%d' % rng.randint(0, 2000)
+                          for _ in range(rng.randint(1, 4))],
+              'keyword' : ['keyword_%d' % rng.randint(0, 300)
+                           for _ in range(rng.randint(0, 6))],
+              'doc_type' : [rng.choice(['article', 'report', 'book'])],
+              'rating' : [rng.uniform(0, 10)],
+              'reviewed' : [rng.random() < 0.5],
+              'publication_date' : ['#%d-%02d-%02d' % (rng.randint(1990, 2020),
+                                                       rng.randint(1, 12),
+                                                       rng.randint(1, 28))]}
+        yield ('doc_%d.pdf' % i, json.dumps(md))
+
+def measure(nb_entries, compact):
+    tracemalloc.start()
+    file_table = [(fn, load(content))
+                  for fn, content in make_sidecars(nb_entries)]
+    index = medinx.MetadataIndex(file_table)
+    if compact:
+        index.compact()
+    del file_table
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, index
+
+def main():
+    nb_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    dict_size, _ = measure(nb_entries, compact=False)
+    compact_size, _ = measure(nb_entries, compact=True)
+    per_100k = 1e5 / nb_entries / 2**20
+    print('%d entries' % nb_entries)
+    print('  dict entries:    %7.1f MB per 100k entries' % (dict_size * per_100k))
+    print('  compact entries: %7.1f MB per 100k entries' % (compact_size * per_100k))
+    print('  saved:           %7.1f %%' % (100 * (1 - compact_size / dict_size)))
+
+if __name__ == '__main__':
+    main()
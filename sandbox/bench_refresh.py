@@ -0,0 +1,56 @@
+"""
+Time a full scan of a folder against a refresh where only one sidecar file
+changed.
+
+Usage (from package root):
+$ PYTHONPATH=python python sandbox/bench_refresh.py [nb_entries]
+"""
+import os
+import os.path as op
+import sys
+import json
+import time
+import shutil
+import tempfile
+
+import medinx
+
+def make_folder(root, nb_entries):
+    for i in range(nb_entries):
+        folder = op.join(root, 'folder_%d' % (i // 100))
+        if not op.exists(folder):
+            os.makedirs(folder)
+        fn = op.join(folder, 'doc_%d.pdf' % i)
+        with open(fn, 'w') as fout:
+            fout.write('dummy_content')
+        with open(fn + '.mdf', 'w') as fout:
+            json.dump({'author' : ['author_%d' % (i % 2000)],
+                       'rating' : [i % 10]}, fout)
+
+    # Old mtimes are trusted by the scan cache
+    mtime_ns = int((time.time() - 10) * 1e9)
+    for folder, dirs, files in os.walk(root):
+        for name in dirs + files:
+            os.utime(op.join(folder, name), ns=(mtime_ns, mtime_ns))
+
+def main():
+    nb_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    root = tempfile.mkdtemp(prefix='medinx_bench_')
+    try:
+        make_folder(root, nb_entries)
+
+        t0 = time.perf_counter()
+        index = medinx.parse_folder(root)
+        print('Full scan:     %8.1f ms' % ((time.perf_counter() - t0) * 1e3))
+
+        with open(op.join(root, 'folder_0', 'doc_0.pdf.mdf'), 'w') as fout:
+            json.dump({'author' : ['someone_else']}, fout)
+
+        t0 = time.perf_counter()
+        index.refresh()
+        print('Refresh:       %8.1f ms' % ((time.perf_counter() - t0) * 1e3))
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == '__main__':
+    main()
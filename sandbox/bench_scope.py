@@ -0,0 +1,30 @@
+"""
+Time a query restricted to one project folder: filtering the whole index
+then selecting paths by prefix, against a scoped query.
+
+Usage (from package root):
+$ PYTHONPATH=python python sandbox/bench_scope.py [nb_entries]
+"""
+import sys
+import time
+
+import medinx
+
+def main():
+    nb_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    index = medinx.MetadataIndex([('/data/project_%d/doc_%d.pdf' % (i % 100, i),
+                                   {'author' : ['author_%d' % (i % 50)]})
+                                  for i in range(nb_entries)])
+    index.filter('', scope='/data/project_0') # build path index
+
+    t0 = time.perf_counter()
+    expected = [fn for fn in index.filter('author=author_0').get_files()
+                if fn.startswith('/data/project_0/')]
+    print('Filter then select prefix: %8.1f ms' % ((time.perf_counter() - t0) * 1e3))
+    t0 = time.perf_counter()
+    selected = index.filter('author=author_0', scope='/data/project_0').get_files()
+    print('Scoped query:              %8.1f ms' % ((time.perf_counter() - t0) * 1e3))
+    assert sorted(selected) == sorted(expected)
+
+if __name__ == '__main__':
+    main()
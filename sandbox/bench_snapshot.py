@@ -0,0 +1,57 @@
+"""
+Time opening a binary index snapshot against building the index in memory.
+
+Usage (from package root):
+$ PYTHONPATH=python python sandbox/bench_snapshot.py [nb_entries]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import medinx
+
+def make_file_table(nb_entries, seed=0):
+    rng = random.Random(seed)
+    start = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    return [('/archive/folder_%d/doc_%d.pdf' % (i // 100, i),
+             {'author' : ['author_%d' % rng.randint(0, 2000)],
+              'rating' : [rng.uniform(0, 10)],
+              'review_date' : [start + timedelta(days=rng.randint(0, 7000))]})
+            for i in range(nb_entries)]
+
+def main():
+    nb_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    file_table = make_file_table(nb_entries)
+
+    t0 = time.perf_counter()
+    index = medinx.MetadataIndex(file_table)
+    print('Build index in memory: %8.1f ms' % ((time.perf_counter() - t0) * 1e3))
+
+    snapshot_fn = tempfile.mktemp(suffix='.mdxs')
+    t0 = time.perf_counter()
+    index.dump(snapshot_fn)
+    print('Dump snapshot:         %8.1f ms (%.1f MB)' % \
+          ((time.perf_counter() - t0) * 1e3, os.path.getsize(snapshot_fn) / 2**20))
+
+    try:
+        t0 = time.perf_counter()
+        mapped = medinx.MetadataIndex.open_snapshot(snapshot_fn)
+        print('Open snapshot:         %8.1f ms' % ((time.perf_counter() - t0) * 1e3))
+
+        fn = file_table[nb_entries // 2][0]
+        t0 = time.perf_counter()
+        mapped.get_metadata(fn)
+        print('Path lookup:           %8.3f ms' % ((time.perf_counter() - t0) * 1e3))
+
+        t0 = time.perf_counter()
+        selection = mapped.filter('author=author_12')
+        print('Query author=...:      %8.1f ms (%d matches)' % \
+              ((time.perf_counter() - t0) * 1e3, len(selection.get_files())))
+    finally:
+        os.remove(snapshot_fn)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Time short-lived commands: import of medinx, then lsx queries answered by
+scanning the folder, from the cached snapshot, and by a running daemon.
+Each command runs in a fresh interpreter.
+
+Usage (from package root):
+$ PYTHONPATH=python python sandbox/bench_startup.py [nb_entries]
+"""
+import os
+import os.path as op
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+
+import medinx
+
+LSX = op.join(op.dirname(op.dirname(op.abspath(__file__))), 'scripts', 'lsx')
+
+def make_folder(root, nb_entries):
+    for i in range(nb_entries):
+        folder = op.join(root, 'folder_%d' % (i // 100))
+        if not op.exists(folder):
+            os.makedirs(folder)
+        fn = op.join(folder, 'doc_%d.pdf' % i)
+        with open(fn, 'w') as fout:
+            fout.write('dummy_content')
+        with open(fn + '.mdf', 'w') as fout:
+            json.dump({'author' : ['author_%d' % (i % 200)]}, fout)
+
+def timeit(label, command, env, nb_runs=5):
+    timings = []
+    for irun in range(nb_runs):
+        t0 = time.perf_counter()
+        subprocess.check_call(command, env=env, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - t0)
+    print('%-28s %8.1f ms' % (label, min(timings) * 1e3))
+
+def main():
+    nb_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    tmp_dir = tempfile.mkdtemp(prefix='medinx_bench_')
+    root = op.join(tmp_dir, 'data')
+    # Socket path of the daemon, as found by lsx from XDG_RUNTIME_DIR
+    socket_fn = op.join(tmp_dir, 'medinx-%d.sock' % os.getuid())
+    env = dict(os.environ, XDG_CACHE_HOME=op.join(tmp_dir, 'cache'),
+               XDG_RUNTIME_DIR=tmp_dir)
+    lsx = [sys.executable, LSX, '-r', root, 'author=author_1']
+    try:
+        make_folder(root, nb_entries)
+        timeit('python startup:', [sys.executable, '-c', 'pass'], env)
+        timeit('import medinx:', [sys.executable, '-c', 'import medinx'], env)
+        timeit('lsx, scan:', lsx + ['--no-daemon', '--no-cache'], env)
+        timeit('lsx, cached snapshot:', lsx + ['--no-daemon'], env)
+
+        daemon = medinx.IndexDaemon(socket_fn, [root])
+        thread = threading.Thread(target=daemon.serve_forever)
+        thread.start()
+        try:
+            timeit('lsx, daemon:', lsx, env)
+        finally:
+            daemon.shutdown()
+            thread.join()
+    finally:
+        shutil.rmtree(tmp_dir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Time dashboards polling saved queries: re-running filter() for each query
+after each change, against reading saved views updated with the index.
+
+Usage (from package root):
+$ PYTHONPATH=python python sandbox/bench_views.py [nb_entries]
+"""
+import sys
+import time
+
+import medinx
+
+QUERIES = ['author=author_1', 'rating>7', 'rating<2 author=author_3',
+           'tag=todo', 'rating=5']
+
+def make_index(nb_entries):
+    return medinx.MetadataIndex([('/data/folder_%d/doc_%d.pdf' % (i // 100, i),
+                                  {'author' : ['author_%d' % (i % 200)],
+                                   'rating' : [float(i % 10)],
+                                   'tag' : ['todo' if i % 7 == 0 else 'done']})
+                                 for i in range(nb_entries)])
+
+def main():
+    nb_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    nb_edits = 100
+    index = make_index(nb_entries)
+    files = index.get_files()
+
+    t0 = time.perf_counter()
+    for iedit in range(nb_edits):
+        index.set_metadata_attr(files[iedit], 'rating', [9.0])
+        results = [index.filter(query).get_files() for query in QUERIES]
+    print('Edit, then filter:       %8.2f ms per edit' % \
+          ((time.perf_counter() - t0) * 1e3 / nb_edits))
+
+    index = make_index(nb_entries)
+    t0 = time.perf_counter()
+    views = [index.register_view(query, query) for query in QUERIES]
+    print('Register views:          %8.2f ms' % ((time.perf_counter() - t0) * 1e3))
+    t0 = time.perf_counter()
+    for iedit in range(nb_edits):
+        index.set_metadata_attr(files[iedit], 'rating', [9.0])
+        results = [view.files for view in views]
+    print('Edit, then read views:   %8.2f ms per edit' % \
+          ((time.perf_counter() - t0) * 1e3 / nb_edits))
+
+if __name__ == '__main__':
+    main()
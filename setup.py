@@ -2,8 +2,9 @@
 
 from setuptools import setup
 
-# scripts = ['scripts/lsx', 'scripts/cdx', 'scripts/treex']
-scripts = []
+scripts = ['scripts/lsx', 'scripts/cdx', 'scripts/treex', 'scripts/medinx-lint',
+           'scripts/medinx-xattr', 'scripts/medinxd', 'scripts/medinx-shell',
+           'scripts/medinx-farm']
 setup(name='medinx',
       version='0.1',
       description='metadata file manager',
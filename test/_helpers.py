@@ -0,0 +1,33 @@
+"""
+Helpers shared by test modules
+"""
+import os.path as op
+import os
+import json
+
+def create_mdf_file(folder, fn, metadata, content='dummy_content',
+                    is_folder=False, skip_empty=False):
+    """
+    Write the sidecar file of *fn*, relative to *folder*, holding given
+    metadata. The associated file, and missing parent folders, are created
+    if they do not exist.
+
+    Args:
+        - content (str): content of the created associated file
+        - is_folder (bool): create the associated file as a folder
+        - skip_empty (bool): do not write the sidecar file if *metadata*
+                             is empty
+    """
+    fn = op.join(folder, fn)
+    if not op.exists(op.dirname(fn)):
+        os.makedirs(op.dirname(fn))
+    if not op.exists(fn):
+        if is_folder:
+            os.makedirs(fn)
+        else:
+            with open(fn, 'w') as fout:
+                fout.write(content)
+    if skip_empty and len(metadata) == 0:
+        return
+    with open(fn + '.mdf', 'w') as fout:
+        fout.write(json.dumps(metadata))
@@ -0,0 +1,93 @@
+import unittest
+import tempfile
+import shutil
+import os.path as op
+import os
+import asyncio
+import threading
+
+import medinx
+from medinx import _async, _medinx
+from ._helpers import create_mdf_file
+
+class AsyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='medinx_tmp_')
+        for i in range(50):
+            create_mdf_file(self.tmp_dir, 'folder_%d/doc_%d.doc' % (i % 5, i),
+                                          {'author':['author_%d' % (i % 3)],
+                                           'rating':[float(i)]})
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_parse_folder(self):
+        progress = []
+        index_main = self.loop.run_until_complete(
+            medinx.aparse_folder(self.tmp_dir, max_concurrency=2,
+                                 progress=lambda *p: progress.append(p)))
+        index_ref = medinx.parse_folder(self.tmp_dir)
+        self.assertEqual(index_main.get_files(), index_ref.get_files())
+        for fn in index_ref.get_files():
+            self.assertEqual(index_main.get_metadata(fn),
+                             index_ref.get_metadata(fn))
+        self.assertEqual(progress[-1], (50, 50))
+
+        with open(op.join(self.tmp_dir, 'folder_0/doc_0.doc.mdf'), 'w') as fout:
+            fout.write('{')
+        # Type checking of tolerant loads runs in the executor too
+        threads = []
+        consistent_entries = _medinx._consistent_entries
+        def recording_check(*args):
+            threads.append(threading.current_thread())
+            return consistent_entries(*args)
+        _medinx._consistent_entries = recording_check
+        try:
+            index_main = self.loop.run_until_complete(
+                medinx.aparse_folder(self.tmp_dir, tolerant=True))
+        finally:
+            _medinx._consistent_entries = consistent_entries
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+        self.assertEqual(len(index_main.get_files()), 49)
+        self.assertEqual([e.path for e in index_main.load_errors],
+                         [op.join(self.tmp_dir, 'folder_0/doc_0.doc.mdf')])
+
+    def test_filter_and_save(self):
+        index_main = medinx.parse_folder(self.tmp_dir)
+
+        async def edit_matching():
+            async for fn, md in index_main.afilter('author=author_1 rating<10'):
+                index_main.set_metadata_attr(fn, 'tag', ['edited'])
+            await index_main.asave()
+        self.loop.run_until_complete(edit_matching())
+
+        index_ref = medinx.parse_folder(self.tmp_dir)
+        self.assertEqual(sorted(op.basename(fn) for fn in
+                                index_ref.filter('tag=edited').get_files()),
+                         ['doc_1.doc', 'doc_4.doc', 'doc_7.doc'])
+
+    def test_cancel(self):
+        processed = []
+
+        def record(item):
+            processed.append(item)
+            return item
+
+        async def cancelled():
+            task = asyncio.ensure_future(_async.map_batches(record, list(range(1000)),
+                                                            max_concurrency=1,
+                                                            batch_size=1))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0.01)
+        self.loop.run_until_complete(cancelled())
+        self.assertLess(len(processed), 1000)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import tempfile
+import shutil
+import os.path as op
+import os
+from datetime import datetime
+from iso8601 import parse_date
+
+import medinx
+from medinx import _binary
+from ._helpers import create_mdf_file
+
+class BinarySidecarTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='medinx_tmp_')
+        self.test_data = [
+            ('report.doc', {'author':['me', 'you'], 'rating':[1.0, 3.5],
+                            'reviewed':[True],
+                            'review_date':['#2016-02-01',
+                                           '#2016-02-01T12:00:00.25+02:00'],
+                            'tag':[]}),
+            ('docs/summary.doc', {'author':['them'], 'rating':[4.5],
+                                  'reviewed':[False]}),
+            ('docs', {'keyword':['folder']})]
+        for fn, md in self.test_data:
+            create_mdf_file(self.tmp_dir, fn, md)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _assert_same_index(self, index_main, index_ref):
+        self.assertEqual(sorted(index_main.get_files()),
+                         sorted(index_ref.get_files()))
+        for fn in index_ref.get_files():
+            md = index_main.get_metadata(fn)
+            self.assertEqual(md, index_ref.get_metadata(fn))
+            for attr, values in md.items():
+                self.assertEqual([medinx._medinx.format_value_date(v)
+                                  for v in values if isinstance(v, datetime)],
+                                 [medinx._medinx.format_value_date(v)
+                                  for v in index_ref.get_metadata(fn)[attr]
+                                  if isinstance(v, datetime)])
+
+    def test_round_trip(self):
+        md = {'author':['me', 'you'], 'rating':[1.0, -3.5], 'reviewed':[True, False],
+              'review_date':[parse_date('2016-02-01T12:00:00.25+02:00'),
+                             parse_date('1950-01-01'),
+                             datetime(2016, 2, 1, 12)],
+              'tag':[]}
+        self.assertEqual(_binary.decode(_binary.encode(md)), md)
+
+        data = _binary.encode(md)
+        for bad_data in [data[:-1], data + b'\0', b'MDFX' + data[4:], b'']:
+            self.assertRaises(_binary.InvalidBinarySidecar, _binary.decode,
+                              bad_data)
+
+    def test_convert_and_load(self):
+        index_ref = medinx.parse_folder(self.tmp_dir)
+        self.assertEqual(medinx.convert_sidecars(self.tmp_dir, 'binary'), 3)
+        self.assertTrue(op.exists(op.join(self.tmp_dir, 'report.doc.mdfb')))
+        self.assertFalse(op.exists(op.join(self.tmp_dir, 'report.doc.mdf')))
+        self._assert_same_index(medinx.parse_folder(self.tmp_dir), index_ref)
+
+        self.assertEqual(medinx.convert_sidecars(self.tmp_dir, 'json'), 3)
+        self.assertFalse(op.exists(op.join(self.tmp_dir, 'report.doc.mdfb')))
+        self._assert_same_index(medinx.parse_folder(self.tmp_dir), index_ref)
+
+    def test_save_format(self):
+        fn = op.join(self.tmp_dir, 'docs/summary.doc')
+        index_main = medinx.parse_folder(self.tmp_dir)
+        index_main.save(sidecar_format='binary')
+        self.assertTrue(op.exists(fn + '.mdfb'))
+        self.assertFalse(op.exists(fn + '.mdf'))
+
+        # JSON sidecar takes precedence:
+        create_mdf_file(self.tmp_dir, 'docs/summary.doc', {'author':['json']})
+        index_main = medinx.parse_folder(self.tmp_dir)
+        self.assertEqual(index_main.get_metadata(fn), {'author':['json']})
+
+        index_main.save()
+        self.assertFalse(op.exists(fn + '.mdfb'))
+        self.assertTrue(op.exists(op.join(self.tmp_dir, 'report.doc.mdfb')))
+        self.assertRaises(ValueError, index_main.save, 'xml')
+
+    def test_tolerant_load(self):
+        with open(op.join(self.tmp_dir, 'report.doc.mdfb'), 'wb') as fout:
+            fout.write(b'MDFB\x01')
+        os.remove(op.join(self.tmp_dir, 'report.doc.mdf'))
+        index_main = medinx.parse_folder(self.tmp_dir, tolerant=True)
+        self.assertEqual([type(e.error) for e in index_main.load_errors],
+                         [_binary.InvalidBinarySidecar])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import tempfile
+import shutil
+import argparse
+import subprocess
+import sys
+import os.path as op
+import os
+
+import medinx
+from medinx import _cli
+from ._helpers import create_mdf_file
+
+class CliTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='medinx_tmp_')
+        self.data_dir = op.join(self.tmp_dir, 'data')
+        for i in range(6):
+            create_mdf_file(self.data_dir, 'folder_%d/doc_%d.doc' % (i % 2, i),
+                                           {'author':['author_%d' % (i % 3)]})
+        self.cache_home = os.environ.get('XDG_CACHE_HOME', None)
+        os.environ['XDG_CACHE_HOME'] = op.join(self.tmp_dir, 'cache')
+
+    def tearDown(self):
+        if self.cache_home is None:
+            del os.environ['XDG_CACHE_HOME']
+        else:
+            os.environ['XDG_CACHE_HOME'] = self.cache_home
+        shutil.rmtree(self.tmp_dir)
+
+    def _parse(self, *args):
+        parser = argparse.ArgumentParser()
+        _cli.add_query_arguments(parser)
+        return parser.parse_args(['--no-daemon', '-r', self.data_dir] + list(args))
+
+    def test_cached_snapshot(self):
+        options = self._parse('author=author_0')
+        self.assertEqual(sorted(op.basename(fn) for fn in _cli.query(options)),
+                         ['doc_0.doc', 'doc_3.doc'])
+        cache_fn = _cli.cached_snapshot_path(self.data_dir)
+        self.assertTrue(op.exists(cache_fn))
+
+        index = _cli.load_index(self.data_dir)
+        self.assertTrue(index._shared_table) # opened from snapshot
+
+        create_mdf_file(self.data_dir, 'folder_0/doc_0.doc', {'author':['author_1']})
+        self.assertEqual(sorted(op.basename(fn) for fn in _cli.query(options)),
+                         ['doc_3.doc'])
+
+    def test_explicit_snapshot(self):
+        snapshot_fn = op.join(self.tmp_dir, 'index.mdxs')
+        medinx.MetadataIndex.from_folder(self.data_dir).dump(snapshot_fn)
+        options = self._parse('-s', snapshot_fn, 'author=author_2')
+        self.assertEqual(sorted(op.basename(fn) for fn in _cli.query(options)),
+                         ['doc_2.doc', 'doc_5.doc'])
+        self.assertFalse(op.exists(_cli.cached_snapshot_path(self.data_dir)))
+
+    def test_lazy_imports(self):
+        code = ('import sys, medinx; '
+                'print(" ".join(m for m in ("jsonschema", "iso8601", "numpy", "PyQt5") '
+                'if m in sys.modules))')
+        env = dict(os.environ,
+                   PYTHONPATH=op.dirname(op.dirname(op.abspath(medinx.__file__))))
+        output = subprocess.check_output([sys.executable, '-c', code], env=env)
+        self.assertEqual(output.decode().strip(), '')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from iso8601 import parse_date
+
+import medinx
+from medinx import _columnar
+
+@unittest.skipUnless(_columnar.is_available(), 'numpy is not installed')
+class ColumnarEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.test_data = [
+            ('average_doc.doc', {'rating':[5.0, 4.4], 'reviewed':[True],
+                                 'review_date':[parse_date('2016')],
+                                 'author':['me']}),
+            ('poor_table.csv', {'rating':[2.0], 'reviewed':[False]}),
+            ('great_image.jpg', {'rating':[10.0],
+                                 'review_date':[parse_date('2017-03-31'),
+                                                parse_date('1949-05-23')]}),
+            ('mixed_image.jpg', {'rating':[1.5, 11.5], 'reviewed':[False, True],
+                                 'author':['you', 'me']}),
+            ('empty_rating.jpg', {'rating':[], 'author':['nobody']}),
+            ('unrated_image.jpg', {'author':['me']})]
+
+    def assert_same_selection(self, index_main, criteria):
+        expected = index_main.filter(criteria).get_files()
+        index_main.use_columnar()
+        try:
+            self.assertEqual(index_main.filter(criteria).get_files(), expected,
+                             'Mismatch for %s' % criteria)
+        finally:
+            index_main.use_columnar(False)
+
+    def test_filter_same_as_scan(self):
+        index_main = medinx.MetadataIndex(self.test_data)
+        for op in ['=', '!=', '<', '>', '<=', '>=']:
+            for criteria in ['rating%s5' % op, 'rating%s4.4' % op,
+                             'reviewed%sTrue' % op, 'reviewed%sfalse' % op,
+                             'review_date%s2016-01-01' % op,
+                             'review_date%s#1949-05-23' % op,
+                             'author%sme' % op,
+                             'rating%s3 reviewed%sFalse' % (op, op),
+                             'rating>3 author%sme' % op]:
+                self.assert_same_selection(index_main, criteria)
+        self.assert_same_selection(index_main, 'me')
+        self.assert_same_selection(index_main, 'me rating<5')
+        self.assert_same_selection(index_main, 'unknown_attr=2')
+
+    def test_filter_after_edition(self):
+        index_main = medinx.MetadataIndex(self.test_data)
+        index_main.use_columnar()
+        self.assertEqual(index_main.filter('rating>10').get_files(),
+                         ['mixed_image.jpg'])
+
+        index_main.set_metadata_attr('poor_table.csv', 'rating', [12.0])
+        self.assertEqual(index_main.filter('rating>10').get_files(),
+                         ['poor_table.csv', 'mixed_image.jpg'])
+
+        selection = index_main.filter('rating>10')
+        index_main.set_metadata_attr('mixed_image.jpg', 'rating', [1.0])
+        self.assertEqual(selection.filter('rating>10').get_files(),
+                         ['poor_table.csv'])
+
+    def test_invalid_queried_value(self):
+        index_main = medinx.MetadataIndex(self.test_data)
+        index_main.use_columnar()
+        self.assertRaises(ValueError, index_main.filter, 'rating>abc')
+
+if __name__ == "__main__":
+    unittest.main()
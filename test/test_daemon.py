@@ -0,0 +1,102 @@
+import unittest
+import tempfile
+import shutil
+import threading
+import os.path as op
+import os
+from unittest import mock
+
+import medinx
+from medinx import _daemon
+from medinx import IndexDaemon, DaemonClient, DaemonError
+from ._helpers import create_mdf_file
+
+class DaemonTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='medinx_tmp_')
+        self.data_dir = op.join(self.tmp_dir, 'data')
+        for i in range(10):
+            create_mdf_file(self.data_dir, 'folder_%d/doc_%d.doc' % (i % 2, i),
+                                           {'author':['author_%d' % (i % 3)],
+                                            'rating':[float(i)]})
+        self.socket_fn = op.join(self.tmp_dir, 'medinx.sock')
+        self.daemon = IndexDaemon(self.socket_fn, [self.data_dir],
+                                  refresh_interval=0)
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        self.thread.join()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_queries(self):
+        with DaemonClient(self.socket_fn) as client:
+            self.assertEqual(client.request('ping'), 'pong')
+            self.assertEqual(client.request('roots'), [self.data_dir])
+            files = client.request('filter', root=self.data_dir,
+                                   criteria='author=author_0 rating<5')
+            self.assertEqual(sorted(op.basename(fn) for fn in files),
+                             ['doc_0.doc', 'doc_3.doc'])
+            files = client.request('filter', root=self.data_dir,
+                                   criteria='author=author_0', metadata=True,
+                                   scope=op.join(self.data_dir, 'folder_1'))
+            self.assertEqual([(op.basename(fn), md) for fn, md in files],
+                             [('doc_3.doc', {'author':['author_0'],
+                                             'rating':[3.0]}),
+                              ('doc_9.doc', {'author':['author_0'],
+                                             'rating':[9.0]})])
+            self.assertEqual(client.request('complete', root=self.data_dir,
+                                            text='auth'), ['author'])
+            self.assertEqual(client.request('complete', root=self.data_dir,
+                                            text='author=author_'),
+                             ['author=author_0', 'author=author_1',
+                              'author=author_2'])
+            self.assertEqual(client.request('facets', root=self.data_dir,
+                                            attribute='author'),
+                             [['author_0', 4], ['author_1', 3], ['author_2', 3]])
+            self.assertRaises(DaemonError, client.request, 'filter',
+                              root=self.data_dir, criteria='!!')
+            self.assertRaises(DaemonError, client.request, 'unknown')
+
+    def test_edit_and_sync(self):
+        fn = op.join(self.data_dir, 'folder_0', 'doc_0.doc')
+        with DaemonClient(self.socket_fn) as client:
+            client.request('set', root=self.data_dir, path=fn,
+                           attribute='tag', values=['edited'])
+            self.assertEqual(medinx.parse_folder(self.data_dir)
+                             .filter('tag=edited').get_files(), [fn])
+
+            create_mdf_file(self.data_dir, 'folder_0/new.doc', {'tag':['edited']})
+            self.assertEqual(len(client.request('filter', root=self.data_dir,
+                                                criteria='tag=edited')), 2)
+
+    def test_already_running(self):
+        self.assertRaises(DaemonError, IndexDaemon, self.socket_fn)
+
+    def test_permissions(self):
+        self.assertEqual(os.stat(self.socket_fn).st_mode & 0o777, 0o600)
+        with mock.patch('os.getuid', return_value=os.getuid() + 1):
+            self.assertRaises(PermissionError, DaemonClient, self.socket_fn)
+
+        # Without XDG_RUNTIME_DIR, sockets are in a private folder
+        with mock.patch.dict(os.environ, {'XDG_RUNTIME_DIR' : ''}), \
+             mock.patch('tempfile.tempdir', self.tmp_dir):
+            socket_fn = _daemon.default_socket_path()
+            self.assertEqual(op.dirname(socket_fn),
+                             op.join(self.tmp_dir, 'medinx-%d' % os.getuid()))
+            # The umask is shared by all threads, it must not be changed
+            with mock.patch('os.umask', side_effect=AssertionError):
+                daemon = IndexDaemon(socket_fn)
+            daemon._server.server_close()
+            self.assertEqual(os.stat(op.dirname(socket_fn)).st_mode & 0o777, 0o700)
+            self.assertEqual(os.stat(socket_fn).st_mode & 0o777, 0o600)
+            self.assertEqual(os.listdir(op.dirname(socket_fn)), ['medinx.sock'])
+
+            os.chmod(op.dirname(socket_fn), 0o777)
+            os.remove(socket_fn)
+            self.assertRaises(DaemonError, IndexDaemon, socket_fn)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from datetime import datetime
+import iso8601
+
+from medinx._dates import parse_date, encode_date, decode_date, DATE_VALUE
+from medinx._medinx import format_value_date
+
+class DatesTest(unittest.TestCase):
+
+    def test_same_as_iso8601(self):
+        for datestring in ['2016', '2016-02', '2016-02-01', '2016-02-01T12',
+                           '2016-02-01T12:30', '2016-02-01T12:30:15',
+                           '2016-02-01T12:30:15.5', '2016-02-01T12:30:15,1234567',
+                           '2016-02-01T12:30Z', '2016-02-01T12:30+02:00',
+                           '2016-02-01T12:30-0330', '2016-02-01T12:30:15.25-01',
+                           '2016-02-01T12:30-00:00', '20160201', '2016-2-1']:
+            parsed = parse_date(datestring)
+            expected = iso8601.parse_date(datestring)
+            self.assertEqual(parsed, expected)
+            self.assertEqual(parsed.utcoffset(), expected.utcoffset())
+            self.assertEqual(parsed.tzname(), expected.tzname())
+            self.assertEqual(parse_date(format_value_date(parsed)[1:]), parsed)
+
+    def test_invalid(self):
+        for datestring in ['2016-13', '2016-02-30', '2016-02-01T25', 'today',
+                           '2016-02-01T12:30+2']:
+            self.assertRaises(iso8601.ParseError, parse_date, datestring)
+
+    def test_binary_codec(self):
+        for value in [parse_date('2016-02-01T12:30:15.25-01'), parse_date('2016'),
+                      parse_date('1900-02-01T12:30+05:30'),
+                      datetime(2016, 2, 1, 12, 30)]:
+            decoded = decode_date(*DATE_VALUE.unpack(encode_date(value)))
+            self.assertEqual((decoded, decoded.tzname()), (value, value.tzname()))
+
+    def test_memoised(self):
+        self.assertIs(parse_date('2017-09-01T18:30'), parse_date('2017-09-01T18:30'))
+
+if __name__ == "__main__":
+    unittest.main()
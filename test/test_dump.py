@@ -0,0 +1,111 @@
+import unittest
+import tempfile
+import shutil
+import os.path as op
+import os
+
+import medinx
+from medinx import _columnar, _files
+from ._helpers import create_mdf_file
+
+class IndexDumpTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='medinx_tmp_')
+        self.data_dir = op.join(self.tmp_dir, 'data')
+        self.snapshot_fn = op.join(self.tmp_dir, 'index.mdxs')
+
+        self.test_data = [
+            ('report.doc', {'author':['me', 'you'], 'rating':[1.0, 3.5],
+                            'reviewed':[True],
+                            'review_date':['#2016-02-01',
+                                           '#2016-02-01T12:00+02:00']}),
+            ('docs/summary.doc', {'author':['me'], 'rating':[4.5],
+                                  'reviewed':[False], 'tag':[]}),
+            ('docs/old/draft.doc', {'author':['them'], 'keyword':['draft']}),
+            ('docs/old', {'keyword':['archive']}),
+            ('unrelated.doc', {})]
+        for fn, md in self.test_data:
+            create_mdf_file(self.data_dir, fn, md, skip_empty=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_dump_and_open(self):
+        index_ref = medinx.parse_folder(self.data_dir)
+        index_ref.dump(self.snapshot_fn)
+        index_main = medinx.MetadataIndex.open_snapshot(self.snapshot_fn)
+
+        self.assertEqual(index_main.get_files(), index_ref.get_files())
+        self.assertEqual(index_main.get_attribute_types(),
+                         index_ref.get_attribute_types())
+        for fn in index_ref.get_files():
+            self.assertEqual(index_main.get_metadata(fn),
+                             index_ref.get_metadata(fn))
+        self.assertEqual(index_main.get_metadata(op.join(self.data_dir, 'report.doc'))
+                         ['review_date'][1].isoformat(),
+                         '2016-02-01T12:00:00+02:00')
+        self.assertEqual(index_main.get_metadata('not_indexed.doc'), {})
+
+        for criteria in ['author=me', 'author=me rating>4', 'author=nobody',
+                         'keyword=archive', 'reviewed=False', 'me',
+                         'review_date<2016-02-01T11:00']:
+            self.assertEqual(index_main.filter(criteria).get_files(),
+                             index_ref.filter(criteria).get_files())
+
+    @unittest.skipUnless(_columnar.is_available(), 'numpy is not installed')
+    def test_columnar_on_mapped_columns(self):
+        index_ref = medinx.parse_folder(self.data_dir)
+        index_ref.dump(self.snapshot_fn)
+        index_main = medinx.MetadataIndex.open_snapshot(self.snapshot_fn)
+        index_main.use_columnar()
+        for criteria in ['rating>3', 'rating<=1 reviewed=True',
+                         'review_date<2016-02-01T11:00', 'author=me rating>4']:
+            self.assertEqual(index_main.filter(criteria).get_files(),
+                             index_ref.filter(criteria).get_files())
+
+    def test_edit_opened_snapshot(self):
+        medinx.parse_folder(self.data_dir).dump(self.snapshot_fn)
+        index_main = medinx.MetadataIndex.open_snapshot(self.snapshot_fn)
+        snapshot = index_main.snapshot()
+
+        fn = op.join(self.data_dir, 'docs/summary.doc')
+        index_main.set_metadata_attr(fn, 'author', ['nobody'])
+        self.assertEqual(index_main.get_metadata(fn)['author'], ['nobody'])
+        self.assertEqual(index_main.filter('author=nobody').get_files(), [fn])
+        self.assertEqual(snapshot.get_metadata(fn)['author'], ['me'])
+
+    def test_stale_snapshot(self):
+        medinx.parse_folder(self.data_dir).dump(self.snapshot_fn)
+        # Written like open() would, not with the mode of temporary files
+        umask = _files._UMASK
+        _files._UMASK = 0o022
+        try:
+            medinx.parse_folder(self.data_dir).dump(self.snapshot_fn + '.new')
+        finally:
+            _files._UMASK = umask
+        self.assertEqual(os.stat(self.snapshot_fn + '.new').st_mode & 0o777, 0o644)
+        index_main = medinx.MetadataIndex.open_snapshot(self.snapshot_fn,
+                                                        check_stale=True)
+        self.assertFalse(index_main.is_stale())
+
+        create_mdf_file(self.data_dir, 'new.doc', {'author':['me']})
+        self.assertTrue(index_main.is_stale())
+        self.assertRaises(medinx.StaleSnapshot,
+                          medinx.MetadataIndex.open_snapshot,
+                          self.snapshot_fn, check_stale=True)
+
+        os.remove(op.join(self.data_dir, 'new.doc.mdf'))
+        self.assertFalse(index_main.is_stale())
+
+        create_mdf_file(self.data_dir, 'report.doc', {'author':['somebody_else']})
+        self.assertTrue(index_main.is_stale())
+
+    def test_invalid_snapshot(self):
+        with open(self.snapshot_fn, 'wb') as fout:
+            fout.write(b'not a snapshot' * 10)
+        self.assertRaises(medinx.InvalidSnapshot,
+                          medinx.MetadataIndex.open_snapshot, self.snapshot_fn)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import tempfile
+import shutil
+import os.path as op
+import os
+
+import medinx
+from medinx import ChangeEvent
+from medinx._events import ENTRY_ADDED, ENTRY_REMOVED, ATTRIBUTE_SET, TYPE_INTRODUCED
+from medinx._events import coalesce
+from ._helpers import create_mdf_file
+
+class ChangeEventsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='medinx_tmp_')
+        self.data_dir = op.join(self.tmp_dir, 'data')
+        for i in range(4):
+            create_mdf_file(self.data_dir, 'doc_%d.doc' % i,
+                                           {'author':['author_%d' % (i % 2)]})
+        self.index = medinx.MetadataIndex.from_folder(self.data_dir)
+        self.batches = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _path(self, name):
+        return op.join(self.data_dir, name)
+
+    def test_immediate(self):
+        self.index.subscribe(self.batches.append)
+        fn = self._path('doc_0.doc')
+        self.index.set_metadata_attr(fn, 'author', ['me'])
+        self.index.set_metadata_attr(fn, 'rating', [2.0])
+        self.index.add_entry(self._path('new.doc'), {'tag':['x']})
+        self.assertEqual(self.batches,
+                         [[ChangeEvent(ATTRIBUTE_SET, fn, 'author', ['me'])],
+                          [ChangeEvent(TYPE_INTRODUCED, attribute='rating', value=float),
+                           ChangeEvent(ATTRIBUTE_SET, fn, 'rating', [2.0])],
+                          [ChangeEvent(TYPE_INTRODUCED, attribute='tag', value=str),
+                           ChangeEvent(ENTRY_ADDED, self._path('new.doc'))]])
+
+    def test_batch_and_coalesce(self):
+        self.index.subscribe(self.batches.append)
+        raw_batches = []
+        self.index.subscribe(raw_batches.append, coalesce=False)
+        fn = self._path('doc_1.doc')
+        with self.index.batch_changes():
+            for rating in range(10):
+                self.index.set_metadata_attr(fn, 'rating', [float(rating)])
+            with self.index.batch_changes():
+                self.index.add_entry(self._path('new.doc'), {})
+                self.index.set_metadata_attr(self._path('new.doc'), 'author', ['me'])
+            self.assertEqual(self.batches, [])
+        self.assertEqual(self.batches,
+                         [[ChangeEvent(TYPE_INTRODUCED, attribute='rating', value=float),
+                           ChangeEvent(ATTRIBUTE_SET, fn, 'rating', [9.0]),
+                           ChangeEvent(ENTRY_ADDED, self._path('new.doc'))]])
+        self.assertEqual(len(raw_batches), 1)
+        self.assertEqual(len(raw_batches[0]), 13)
+
+    def test_manual_and_refresh(self):
+        subscription = self.index.subscribe(self.batches.append, policy='manual')
+        create_mdf_file(self.data_dir, 'doc_0.doc', {'author':['author_0', 'other']})
+        create_mdf_file(self.data_dir, 'doc_4.doc', {'author':['author_4'], 'rating':[1.0]})
+        os.remove(self._path('doc_3.doc.mdf'))
+        self.index.refresh()
+        self.assertEqual(self.batches, [])
+        self.index.flush_changes()
+        events = self.batches[0]
+        self.assertEqual(events[0], ChangeEvent(TYPE_INTRODUCED, attribute='rating',
+                                                value=float))
+        self.assertIn(ChangeEvent(ATTRIBUTE_SET, self._path('doc_0.doc'), 'author',
+                                  ['author_0', 'other']), events)
+        self.assertIn(ChangeEvent(ENTRY_ADDED, self._path('doc_4.doc')), events)
+        self.assertIn(ChangeEvent(ENTRY_REMOVED, self._path('doc_3.doc')), events)
+        self.assertEqual(self.index.snapshot()._subscriptions, [])
+
+        self.index.unsubscribe(subscription)
+        self.index.set_metadata_attr(self._path('doc_0.doc'), 'author', ['me'])
+        self.index.flush_changes()
+        self.assertEqual(len(self.batches), 1)
+        self.assertRaises(ValueError, self.index.subscribe, print, policy='later')
+
+    def test_coalesce(self):
+        events = [ChangeEvent(ENTRY_ADDED, 'a'), ChangeEvent(ATTRIBUTE_SET, 'a', 'x', [1]),
+                  ChangeEvent(ATTRIBUTE_SET, 'b', 'x', [1]), ChangeEvent(ENTRY_REMOVED, 'a'),
+                  ChangeEvent(ENTRY_REMOVED, 'c'), ChangeEvent(ENTRY_ADDED, 'c'),
+                  ChangeEvent(ATTRIBUTE_SET, 'b', 'x', [2])]
+        self.assertEqual(coalesce(events),
+                         [ChangeEvent(ENTRY_REMOVED, 'c'), ChangeEvent(ENTRY_ADDED, 'c'),
+                          ChangeEvent(ATTRIBUTE_SET, 'b', 'x', [2])])
+
+if __name__ == "__main__":
+    unittest.main()
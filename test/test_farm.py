@@ -0,0 +1,78 @@
+import unittest
+import tempfile
+import shutil
+import os.path as op
+import os
+import json
+
+import medinx
+from medinx import SymlinkFarm, InvalidFarm
+from ._helpers import create_mdf_file
+
+class SymlinkFarmTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='medinx_tmp_')
+        self.data_dir = op.join(self.tmp_dir, 'data')
+        self.farm_dir = op.join(self.tmp_dir, 'farm')
+        for i in range(6):
+            create_mdf_file(self.data_dir, 'folder_%d/doc_%d.doc' % (i % 2, i),
+                                           {'author':['author_%d' % (i % 3)]})
+        create_mdf_file(self.data_dir, 'folder_1/doc_0.doc', {'author':['author_0']})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_update(self):
+        index = medinx.MetadataIndex.from_folder(self.data_dir)
+        farm = SymlinkFarm(self.farm_dir, 'author=author_0', root=self.data_dir)
+        self.assertEqual(farm.update(index), (3, 0))
+        links = farm.get_links()
+        self.assertEqual(sorted(links), ['doc_0.doc', 'doc_0~2.doc', 'doc_3.doc'])
+        for name, target in links.items():
+            self.assertEqual(os.readlink(op.join(self.farm_dir, name)), target)
+        self.assertEqual(farm.update(index), (0, 0))
+
+        # A file that is not a link of the farm is kept and its name avoided
+        with open(op.join(self.farm_dir, 'doc_4.doc'), 'w') as fout:
+            fout.write('mine')
+        os.symlink(op.join(self.data_dir, 'folder_1', 'doc_3.doc'),
+                   op.join(self.farm_dir, 'my_link.doc'))
+        create_mdf_file(self.data_dir, 'folder_1/doc_3.doc', {'author':['author_10']})
+        create_mdf_file(self.data_dir, 'folder_0/doc_4.doc', {'author':['author_0']})
+        index.refresh()
+        link_0 = op.join(self.farm_dir, 'doc_0.doc')
+        inode_0 = os.lstat(link_0).st_ino
+        self.assertEqual(farm.update(index), (1, 1))
+        self.assertEqual(sorted(os.listdir(self.farm_dir)),
+                         ['.medinx_farm.json', 'doc_0.doc', 'doc_0~2.doc',
+                          'doc_4.doc', 'doc_4~2.doc', 'my_link.doc'])
+        self.assertEqual(os.lstat(link_0).st_ino, inode_0) # untouched
+
+        # Reopened farm reads existing links
+        farm = SymlinkFarm.open(self.farm_dir)
+        self.assertEqual((farm.criteria, farm.root), ('author=author_0', self.data_dir))
+        self.assertEqual(farm.update(index), (0, 0))
+        self.assertRaises(InvalidFarm, SymlinkFarm.open, self.data_dir)
+
+    def test_foreign_folder(self):
+        index = medinx.MetadataIndex.from_folder(self.data_dir)
+        os.makedirs(self.farm_dir)
+        user_link = op.join(self.farm_dir, 'doc_1.doc')
+        os.symlink(op.join(self.data_dir, 'folder_1', 'doc_1.doc'), user_link)
+        farm = SymlinkFarm(self.farm_dir, 'author=author_0', root=self.data_dir)
+        self.assertRaises(InvalidFarm, farm.update, index)
+        self.assertEqual(os.listdir(self.farm_dir), ['doc_1.doc'])
+
+        # Farms saved without the names of their links own all links
+        with open(op.join(self.farm_dir, '.medinx_farm.json'), 'w') as fout:
+            json.dump({'criteria' : 'author=author_0'}, fout)
+        farm = SymlinkFarm.open(self.farm_dir)
+        self.assertEqual(farm.update(index), (3, 1))
+        self.assertFalse(op.lexists(user_link))
+        with open(op.join(self.farm_dir, '.medinx_farm.json')) as fin:
+            self.assertEqual(json.load(fin)['links'],
+                             ['doc_0.doc', 'doc_0~2.doc', 'doc_3.doc'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import tempfile
+import shutil
+import os.path as op
+import os
+from iso8601 import parse_date
+
+import medinx
+from ._helpers import create_mdf_file
+
+class FsAttributesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='medinx_tmp_')
+        create_mdf_file(self.tmp_dir, 'small.txt', {'author':['me']}, 'x' * 10)
+        create_mdf_file(self.tmp_dir, 'big.txt', {'author':['me']}, 'x' * 1000)
+        create_mdf_file(self.tmp_dir, 'docs', {'author':['you']}, is_folder=True)
+        os.utime(op.join(self.tmp_dir, 'big.txt'), (0, 1454328000)) # 2016-02-01T12:00
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_query(self):
+        index = medinx.parse_folder(self.tmp_dir)
+        self.assertEqual(index.filter('file_type=folder').get_files(),
+                         [op.join(self.tmp_dir, 'docs')])
+        self.assertEqual(sorted(index.filter('author=me file_size<100').get_files()),
+                         [op.join(self.tmp_dir, 'small.txt')])
+        self.assertEqual(index.filter('file_modification_date<#2017').get_files(),
+                         [op.join(self.tmp_dir, 'big.txt')])
+        # Not part of metadata:
+        self.assertEqual(index.get_metadata(op.join(self.tmp_dir, 'docs')),
+                         {'author':['you']})
+        md = index.get_fs_metadata(op.join(self.tmp_dir, 'big.txt'))
+        self.assertEqual(md['file_size'], [1000.0])
+        self.assertEqual(md['file_modification_date'],
+                         [parse_date('2016-02-01T12:00:00Z')])
+
+    def test_refresh(self):
+        index = medinx.MetadataIndex.from_folder(self.tmp_dir)
+        self.assertEqual(len(index.filter('file_type=file file_size>100').get_files()), 1)
+        with open(op.join(self.tmp_dir, 'small.txt'), 'w') as fout:
+            fout.write('x' * 200)
+        # Cached until refresh:
+        self.assertEqual(len(index.filter('file_type=file file_size>100').get_files()), 1)
+        index.refresh()
+        self.assertEqual(len(index.filter('file_type=file file_size>100').get_files()), 2)
+
+    def test_metadata_precedence(self):
+        create_mdf_file(self.tmp_dir, 'other.txt', {'file_type':['report']})
+        index = medinx.parse_folder(self.tmp_dir)
+        self.assertEqual(index.filter('file_type=report').get_files(),
+                         [op.join(self.tmp_dir, 'other.txt')])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import tempfile
+import shutil
+import os.path as op
+import os
+import json
+
+import medinx
+from medinx import _lint
+from medinx._walk import MANIFEST_NAME
+from ._helpers import create_mdf_file
+
+class LintTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='medinx_tmp_')
+        for i in range(100):
+            create_mdf_file(self.tmp_dir, 'folder_%d/doc_%d.doc' % (i % 4, i),
+                                          {'author':['author_%d' % (i % 3)],
+                                           'rating':[float(i)]})
+        create_mdf_file(self.tmp_dir, 'folder_1/doc_1.doc', {'rating':['high']})
+        create_mdf_file(self.tmp_dir, 'bad_value.doc', {'author':['not valid']})
+        with open(op.join(self.tmp_dir, 'orphan.doc.mdf'), 'w') as fout:
+            fout.write(json.dumps({'author':['x']}))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _problems(self, **options):
+        return sorted((op.relpath(r['path'], self.tmp_dir), r['problem'])
+                      for r in medinx.lint_folder(self.tmp_dir, **options))
+
+    def test_lint(self):
+        expected = [('bad_value.doc.mdf', 'invalid'),
+                    ('folder_1/doc_1.doc.mdf', 'inconsistent_type'),
+                    ('orphan.doc.mdf', 'orphan')]
+        self.assertEqual(self._problems(max_workers=1), expected)
+        self.assertEqual(self._problems(max_workers=2), expected)
+
+    def test_fingerprints(self):
+        fingerprints_fn = op.join(self.tmp_dir, 'lint.json')
+        fingerprints = _lint.load_fingerprints(fingerprints_fn)
+        expected = self._problems(fingerprints=fingerprints)
+        _lint.save_fingerprints(fingerprints, fingerprints_fn)
+        self.assertEqual(len(fingerprints), 102)
+        # Saving again keeps the permissions of the file
+        os.chmod(fingerprints_fn, 0o640)
+        _lint.save_fingerprints(fingerprints, fingerprints_fn)
+        self.assertEqual(os.stat(fingerprints_fn).st_mode & 0o777, 0o640)
+
+        fingerprints = _lint.load_fingerprints(fingerprints_fn)
+        checked = []
+        check_sidecar = _lint.check_sidecar
+        def recording_check(md_fn):
+            checked.append(md_fn)
+            return check_sidecar(md_fn)
+        _lint.check_sidecar = recording_check
+        try:
+            create_mdf_file(self.tmp_dir, 'bad_value.doc', {'author':['valid']})
+            problems = self._problems(fingerprints=fingerprints, max_workers=1)
+        finally:
+            _lint.check_sidecar = check_sidecar
+        self.assertEqual(checked, [op.join(self.tmp_dir, 'bad_value.doc.mdf')])
+        self.assertEqual(problems, expected[1:])
+
+    def test_manifests(self):
+        manifest_fn = op.join(self.tmp_dir, 'folder_2', MANIFEST_NAME)
+        with open(manifest_fn, 'w') as fout:
+            fout.write(json.dumps({'doc_2.doc' : {'rating':['high']},
+                                   'extra.doc' : {'author':['x']}}))
+        self.assertIn(('folder_2/' + MANIFEST_NAME, 'inconsistent_type'),
+                      self._problems(max_workers=1))
+
+        with open(manifest_fn, 'w') as fout:
+            fout.write(json.dumps({'doc_2.doc' : {'rating':['high']},
+                                   '../doc_0.doc' : {'rating':[1.0]}}))
+        self.assertIn(('folder_2/' + MANIFEST_NAME, 'invalid'),
+                      self._problems(max_workers=1))
+
+        with open(manifest_fn, 'w') as fout:
+            fout.write(json.dumps({'doc_2.doc' : {'rating':[1.0]},
+                                   'extra.doc' : {'rating':['high']}}))
+        error, types = _lint.check_sidecar(manifest_fn)
+        self.assertEqual(error[0], 'InconsistentValue')
+
+if __name__ == "__main__":
+    unittest.main()
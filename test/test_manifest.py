@@ -0,0 +1,146 @@
+import unittest
+import tempfile
+import shutil
+import os.path as op
+import os
+import json
+import asyncio
+
+import medinx
+from medinx import _medinx
+from medinx._walk import MANIFEST_NAME
+from ._helpers import create_mdf_file
+
+class ManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='medinx_tmp_')
+        self._create_manifest('', {'report.doc' : {'author':['me'],
+                                                   'rating':[2]},
+                                   'docs' : {'keyword':['folder']},
+                                   'notes.txt' : {'author':['you']}})
+        self._create_file('report.doc')
+        self._create_file('notes.txt')
+        create_mdf_file(self.tmp_dir, 'notes.txt', {'rating':[4.5]})
+        os.makedirs(op.join(self.tmp_dir, 'docs'))
+        self._create_manifest('docs', {'summary.doc' : {'author':['them']}})
+        self._create_file('docs/summary.doc')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_load(self):
+        index = medinx.parse_folder(self.tmp_dir)
+        self.assertEqual(sorted(index.get_files()),
+                         [op.join(self.tmp_dir, fn) for fn in
+                          ['docs', 'docs/summary.doc', 'notes.txt', 'report.doc']])
+        self.assertEqual(index.get_metadata(op.join(self.tmp_dir, 'report.doc')),
+                         {'author':['me'], 'rating':[2.0]})
+        # Sidecar file overrides the manifest attribute by attribute
+        self.assertEqual(index.get_metadata(op.join(self.tmp_dir, 'notes.txt')),
+                         {'author':['you'], 'rating':[4.5]})
+        self.assertEqual(index.filter('author=them').get_files(),
+                         [op.join(self.tmp_dir, 'docs/summary.doc')])
+
+        self.assertEqual(sorted(fn for fn, md in medinx.iter_folder(self.tmp_dir)),
+                         sorted(index.get_files()))
+        loop = asyncio.new_event_loop()
+        try:
+            index_async = loop.run_until_complete(medinx.aparse_folder(self.tmp_dir))
+        finally:
+            loop.close()
+        self.assertEqual(index_async.get_metadata(op.join(self.tmp_dir, 'notes.txt')),
+                         {'author':['you'], 'rating':[4.5]})
+
+    def test_refresh(self):
+        index = medinx.MetadataIndex.from_folder(self.tmp_dir, compact=True)
+        self._create_manifest('docs', {'summary.doc' : {'author':['us']}})
+        index.refresh()
+        self.assertEqual(index.get_metadata(op.join(self.tmp_dir, 'docs/summary.doc')),
+                         {'author':['us']})
+
+    def test_invalid_manifest(self):
+        self._create_manifest('docs', {'../report.doc' : {'author':['us']}})
+        self.assertRaises(Exception, medinx.parse_folder, self.tmp_dir)
+
+        index = medinx.MetadataIndex.from_folder(self.tmp_dir, tolerant=True)
+        self.assertEqual([e.path for e in index.load_errors],
+                         [op.join(self.tmp_dir, 'docs', MANIFEST_NAME)])
+        self.assertEqual(len(index.get_files()), 3)
+
+    def test_save(self):
+        manifest_fn = op.join(self.tmp_dir, MANIFEST_NAME)
+        os.chmod(manifest_fn, 0o644)
+        index = medinx.parse_folder(self.tmp_dir)
+        index.set_metadata_attr(op.join(self.tmp_dir, 'report.doc'), 'tag',
+                                ['edited'])
+        index.set_metadata_attr(op.join(self.tmp_dir, 'notes.txt'), 'tag',
+                                ['edited'])
+        index.save()
+
+        # Entries without sidecar file stay in the manifest
+        self.assertFalse(op.exists(op.join(self.tmp_dir, 'report.doc.mdf')))
+        with open(manifest_fn) as fin:
+            manifest = json.load(fin)
+        self.assertEqual(sorted(manifest), ['docs', 'report.doc'])
+        # The replaced manifest keeps its permissions
+        self.assertEqual(os.stat(manifest_fn).st_mode & 0o777, 0o644)
+        # Entries with sidecar file are saved in it, merged
+        with open(op.join(self.tmp_dir, 'notes.txt.mdf')) as fin:
+            self.assertEqual(json.load(fin), {'author':['you'], 'rating':[4.5],
+                                              'tag':['edited']})
+        self.assertEqual(len(medinx.parse_folder(self.tmp_dir).filter('tag=edited')
+                             .get_files()), 2)
+
+    def test_convert(self):
+        index_ref = medinx.parse_folder(self.tmp_dir)
+        self.assertEqual(medinx.convert_sidecars(self.tmp_dir, 'json'), 4)
+        self.assertFalse(op.exists(op.join(self.tmp_dir, MANIFEST_NAME)))
+        self.assertTrue(op.exists(op.join(self.tmp_dir, 'report.doc.mdf')))
+        self._assert_same_index(medinx.parse_folder(self.tmp_dir), index_ref)
+
+        self.assertEqual(medinx.convert_sidecars(self.tmp_dir, 'manifest'), 4)
+        self.assertEqual(sorted(fn for fn in os.listdir(self.tmp_dir)
+                                if fn.endswith('.mdf')), [])
+        self._assert_same_index(medinx.parse_folder(self.tmp_dir), index_ref)
+
+    def test_stale_snapshot(self):
+        snapshot_fn = op.join(self.tmp_dir, 'index.mdx')
+        medinx.parse_folder(self.tmp_dir).dump(snapshot_fn)
+        index = medinx.MetadataIndex.open_snapshot(snapshot_fn)
+        self.assertFalse(index.is_stale())
+        # Manifests are only stat'ed
+        load_manifest = _medinx._load_manifest
+        _medinx._load_manifest = None
+        try:
+            os.makedirs(op.join(self.tmp_dir, 'other'))
+            self._create_file('other/new.doc')
+            self._create_manifest('other', {'new.doc' : {'author':['me']}})
+            self.assertTrue(index.is_stale())
+            os.remove(op.join(self.tmp_dir, 'other', MANIFEST_NAME))
+            self.assertFalse(index.is_stale())
+
+            self._create_manifest('docs', {'summary.doc' : {'author':['someone']}})
+            self.assertTrue(index.is_stale())
+            os.remove(op.join(self.tmp_dir, 'docs', MANIFEST_NAME))
+            self.assertTrue(index.is_stale())
+        finally:
+            _medinx._load_manifest = load_manifest
+
+    def _assert_same_index(self, index_main, index_ref):
+        self.assertEqual(sorted(index_main.get_files()),
+                         sorted(index_ref.get_files()))
+        for fn in index_ref.get_files():
+            self.assertEqual(index_main.get_metadata(fn),
+                             index_ref.get_metadata(fn))
+
+    def _create_file(self, fn):
+        with open(op.join(self.tmp_dir, fn), 'w') as fout:
+            fout.write('dummy_content')
+
+    def _create_manifest(self, folder, entries):
+        with open(op.join(self.tmp_dir, folder, MANIFEST_NAME), 'w') as fout:
+            fout.write(json.dumps(entries))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import tempfile
+import shutil
+import os.path as op
+import os
+
+import medinx
+from ._helpers import create_mdf_file
+
+class ScopeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='medinx_tmp_')
+        for fn in ['docs', 'docs/a.doc', 'docs/sub/b.doc', 'docs-old/c.doc',
+                   'docs.doc', 'other/d.doc']:
+            create_mdf_file(self.tmp_dir, fn, {'author':['me']},
+                            is_folder=op.splitext(fn)[1] == '')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _paths(self, *fns):
+        return sorted(op.join(self.tmp_dir, fn) for fn in fns)
+
+    def _check_index(self, index):
+        self.assertEqual(sorted(index.filter('author=me',
+                                             scope=op.join(self.tmp_dir, 'docs'))
+                                .get_files()),
+                         self._paths('docs', 'docs/a.doc', 'docs/sub/b.doc'))
+        self.assertEqual(sorted(index.filter('', scope=[op.join(self.tmp_dir, 'docs/sub/'),
+                                                        op.join(self.tmp_dir, 'other')])
+                                .get_files()),
+                         self._paths('docs/sub/b.doc', 'other/d.doc'))
+        self.assertEqual(index.filter('author=you',
+                                      scope=op.join(self.tmp_dir, 'docs'))
+                         .get_files(), [])
+        self.assertEqual(index.filter('author=me',
+                                      scope=op.join(self.tmp_dir, 'missing'))
+                         .get_files(), [])
+
+    def test_scope(self):
+        index = medinx.parse_folder(self.tmp_dir)
+        self._check_index(index)
+
+        # Path index is updated with entries
+        new_fn = op.join(self.tmp_dir, 'docs/new.doc')
+        index.add_entry(new_fn, {'author':['me']})
+        self.assertIn(new_fn, index.filter('author=me',
+                                           scope=op.join(self.tmp_dir, 'docs'))
+                      .get_files())
+
+    def test_relative_root(self):
+        cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        try:
+            index = medinx.parse_folder('./')
+            self.assertIn('docs/a.doc', index.get_files())
+            for scope in ['./docs', 'docs', 'docs/', './docs/sub/..']:
+                self.assertEqual(sorted(index.filter('author=me', scope=scope)
+                                        .get_files()),
+                                 ['docs', 'docs/a.doc', 'docs/sub/b.doc'])
+            self.assertEqual(len(index.filter('author=me', scope='.').get_files()), 6)
+
+            index = medinx.parse_folder('./docs')
+            self.assertEqual(index.filter('author=me', scope='./docs/sub').get_files(),
+                             ['docs/sub/b.doc'])
+            self.assertEqual(index.filter('author=me', scope='docs/sub').get_files(),
+                             ['docs/sub/b.doc'])
+        finally:
+            os.chdir(cwd)
+
+    def test_snapshot_scope(self):
+        snapshot_fn = op.join(self.tmp_dir, 'index.mdx')
+        medinx.parse_folder(self.tmp_dir).dump(snapshot_fn)
+        self._check_index(medinx.MetadataIndex.open_snapshot(snapshot_fn))
+
+    def test_sqlite_scope(self):
+        index = medinx.SQLiteIndex.from_folder(self.tmp_dir,
+                                               op.join(self.tmp_dir, 'index.db'))
+        try:
+            self.assertEqual(sorted(index.filter('author=me',
+                                                 scope=op.join(self.tmp_dir, 'docs'))
+                                    .get_files()),
+                             self._paths('docs', 'docs/a.doc', 'docs/sub/b.doc'))
+            cwd = os.getcwd()
+            os.chdir(self.tmp_dir)
+            try:
+                for scope in ['./docs', 'docs/', 'other/../docs']:
+                    self.assertEqual(sorted(index.filter('author=me', scope=scope)
+                                            .get_files()),
+                                     self._paths('docs', 'docs/a.doc',
+                                                 'docs/sub/b.doc'))
+            finally:
+                os.chdir(cwd)
+        finally:
+            index.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+import tempfile
+import shutil
+import io
+import os.path as op
+import os
+
+import medinx
+from medinx._shell import MedinxShell
+from ._helpers import create_mdf_file
+
+class ShellTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='medinx_tmp_')
+        self.data_dir = op.join(self.tmp_dir, 'data')
+        for i in range(6):
+            create_mdf_file(self.data_dir, 'folder_%d/doc_%d.doc' % (i % 2, i),
+                                           {'author':['author_%d' % (i % 3)],
+                                            'rating':[float(i)]})
+        self.index = medinx.MetadataIndex.from_folder(self.data_dir)
+        self.output = io.StringIO()
+        self.shell = MedinxShell(self.index, refresh_interval=None,
+                                 timing=False, stdout=self.output)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _run(self, line):
+        self.output.seek(0)
+        self.output.truncate()
+        self.shell.postcmd(self.shell.onecmd(self.shell.precmd(line)), line)
+        return self.output.getvalue().splitlines()
+
+    def test_refine_back(self):
+        self.assertEqual(self._run('count'), ['6'])
+        self._run('rating>1')
+        self.assertEqual(self._run('count'), ['4'])
+        self._run('refine author=author_0')
+        self.assertEqual([op.basename(fn) for fn in self._run('ls')], ['doc_3.doc'])
+        self.assertIn('[rating>1 > author=author_0] (1)', self.shell.prompt)
+        self._run('back')
+        self.assertEqual(self._run('count'), ['4'])
+        self._run('reset')
+        self.assertEqual(self._run('count'), ['6'])
+        self.assertEqual(self._run('back'), ['No refinement to cancel'])
+
+    def test_errors_and_timing(self):
+        self.assertTrue(self._run('unknown_attr>"')[0].startswith('Invalid'))
+        self.assertEqual(self._run('count'), ['6'])
+        self.shell.timing = True
+        output = self._run('count')
+        self.assertEqual(output[0], '6')
+        self.assertRegex(output[1], r'^\(\d+\.\d ms\)$')
+
+    def test_completion(self):
+        self.assertIn('author', self.shell.completenames('au'))
+        self.assertIn('attrs', self.shell.completenames('a'))
+        self.assertEqual(self.shell.completedefault('author=author_1', '', 0, 0),
+                         ['author=author_1'])
+        self._run('author=author_2')
+        self.assertEqual(self.shell.completedefault('author=', '', 0, 0),
+                         ['author=author_2'])
+
+    def test_views(self):
+        self._run('rating<3')
+        self.assertEqual(self._run('values author'),
+                         ['     1  author_0', '     1  author_1', '     1  author_2'])
+        self.assertEqual(self._run('attrs'), ['author: str', 'rating: float'])
+        self.assertEqual(self._run('tree 0'), ['%s (3/6)' % self.data_dir])
+
+    def test_refresh(self):
+        self._run('author=author_0')
+        self.assertEqual(self._run('count'), ['2'])
+        # Nothing is evaluated again while the index does not change
+        tree = self.index.get_tree()
+        selection = self.shell.selection()
+        self.assertFalse(self.shell.refresh())
+        self.assertIs(self.index.get_tree(), tree)
+        self.assertIs(self.shell.selection(), selection)
+
+        create_mdf_file(self.data_dir, 'folder_0/new.doc', {'author':['author_0']})
+        self.assertTrue(self.shell.refresh())
+        self.assertEqual(self._run('count'), ['3'])
+        self.assertEqual(self.index.get_tree().count(self.data_dir), 7)
+
+        # Unless selections depend on filesystem attributes
+        self._run('file_size>13')
+        self.assertEqual(self._run('count'), ['0'])
+        with open(op.join(self.data_dir, 'folder_0', 'new.doc'), 'a') as fout:
+            fout.write('more_content')
+        self.assertFalse(self.shell.refresh())
+        self.assertEqual(self._run('count'), ['1'])
+
+    def test_farm(self):
+        farm_dir = op.join(self.tmp_dir, 'farm')
+        self._run('author=author_1')
+        self.assertEqual(self._run('farm %s' % farm_dir), ['2 link(s) added, 0 removed'])
+        create_mdf_file(self.data_dir, 'folder_1/doc_1.doc', {'author':['author_0']})
+        self.shell.refresh()
+        self.assertEqual(sorted(os.listdir(farm_dir)), ['.medinx_farm.json', 'doc_4.doc'])
+
+if __name__ == "__main__":
+    unittest.main()
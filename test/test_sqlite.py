@@ -0,0 +1,120 @@
+import unittest
+import tempfile
+import shutil
+import os.path as op
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import medinx
+from medinx import _sqlite
+from ._helpers import create_mdf_file
+
+class SQLiteIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='medinx_tmp_')
+        self.data_dir = op.join(self.tmp_dir, 'data')
+        self.db_fn = op.join(self.tmp_dir, 'index.sqlite')
+
+        self.test_data = [
+            ('report.doc', {'author':['me', 'you'], 'rating':[1.0, 3.5],
+                            'reviewed':[True],
+                            'review_date':['#2016-02-01',
+                                           '#2016-02-01T12:00+02:00']}),
+            ('docs/summary.doc', {'author':['me'], 'rating':[4.5],
+                                  'reviewed':[False], 'tag':[]}),
+            ('docs/old/draft.doc', {'author':['them'], 'keyword':['draft', 'me'],
+                                    'rating':[5]}),
+            ('unrelated.doc', {})]
+        for fn, md in self.test_data:
+            create_mdf_file(self.data_dir, fn, md, skip_empty=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_same_as_metadata_index(self):
+        index_ref = medinx.parse_folder(self.data_dir)
+        index_main = medinx.SQLiteIndex.from_folder(self.data_dir, self.db_fn)
+
+        self.assertEqual(sorted(index_main.get_files()),
+                         sorted(index_ref.get_files()))
+        self.assertEqual(index_main.get_attribute_types(),
+                         index_ref.get_attribute_types())
+        for fn in index_ref.get_files():
+            self.assertEqual(index_main.get_metadata(fn),
+                             index_ref.get_metadata(fn))
+
+        for criteria in ['author=me', 'author>me', 'author!=me',
+                         'rating>=3.5', 'rating<2 author=you', 'rating=5',
+                         'reviewed=true', 'reviewed<True',
+                         'review_date<2016-02-01T11:00', 'review_date=#2016-02-01',
+                         'me', 'me rating>4', 'unknown=3', '5.0', '']:
+            self.assertEqual(sorted(index_main.filter(criteria).get_files()),
+                             sorted(index_ref.filter(criteria).get_files()),
+                             'Mismatch for %s' % criteria)
+        for criteria in ['author=', 'author=merating>2']:
+            self.assertRaises(medinx._medinx.InvalidPredicateFormat,
+                              index_main.filter, criteria)
+        index_main.close()
+
+    def test_incremental_sync(self):
+        index_main = medinx.SQLiteIndex.from_folder(self.data_dir, self.db_fn)
+        index_main.close()
+
+        time.sleep(0.01)
+        create_mdf_file(self.data_dir, 'report.doc', {'author':['nobody'],
+                                                      'review_date':['#2020']})
+        create_mdf_file(self.data_dir, 'new.doc', {'keyword':['new']})
+        os.remove(op.join(self.data_dir, 'docs/old/draft.doc.mdf'))
+
+        index_main = medinx.SQLiteIndex(self.db_fn)
+        index_main.sync(self.data_dir)
+        index_ref = medinx.parse_folder(self.data_dir)
+        self.assertEqual(sorted(index_main.get_files()),
+                         sorted(index_ref.get_files()))
+        for fn in index_ref.get_files():
+            self.assertEqual(index_main.get_metadata(fn),
+                             index_ref.get_metadata(fn))
+        self.assertEqual(index_main.get_attribute_types(),
+                         index_ref.get_attribute_types())
+
+        create_mdf_file(self.data_dir, 'bad.doc', {'rating':['high']})
+        self.assertRaises(medinx._medinx.InconsistentValue,
+                          index_main.sync, self.data_dir)
+        self.assertNotIn(op.join(self.data_dir, 'bad.doc'),
+                         index_main.get_files())
+        index_main.close()
+
+    def test_edit_and_save(self):
+        index_main = medinx.SQLiteIndex.from_folder(self.data_dir)
+        fn = op.join(self.data_dir, 'docs/summary.doc')
+
+        index_main.set_metadata_attr(fn, 'rating', [2.0, 1.0])
+        self.assertEqual(index_main.get_metadata(fn)['rating'], [2.0, 1.0])
+        self.assertEqual(index_main.filter('rating<1.5 author=me').get_files(),
+                         [op.join(self.data_dir, 'report.doc'), fn])
+        self.assertRaises(medinx._medinx.InconsistentValue,
+                          index_main.set_metadata_attr, fn, 'rating', ['high'])
+        self.assertRaises(FileNotFoundError, index_main.set_metadata_attr,
+                          'not_indexed.doc', 'rating', [1.0])
+
+        seen = [datetime(2020, 5, 1, 12, 30, 0, 250, timezone(timedelta(hours=-5)))]
+        index_main.set_metadata_attr(fn, 'seen', seen)
+        self.assertEqual(index_main.get_metadata(fn)['seen'], seen)
+
+        # Entries are saved in batches
+        batch_size = _sqlite.BATCH_SIZE
+        _sqlite.BATCH_SIZE = 2
+        try:
+            index_main.save()
+        finally:
+            _sqlite.BATCH_SIZE = batch_size
+        index_ref = medinx.parse_folder(self.data_dir)
+        for fn in index_ref.get_files():
+            self.assertEqual(index_main.get_metadata(fn), index_ref.get_metadata(fn))
+        index_main.sync(self.data_dir) # fingerprints are up to date
+        self.assertEqual(index_main.get_metadata(fn), index_ref.get_metadata(fn))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -347,6 +347,131 @@ class TopLevelAPITest(unittest.TestCase):
 #                                     if isinstance(vals[0], str)])))
         pass
     
+    def test_snapshot(self):
+        test_data = [('report.doc', {'author':['me'], 'rating':[2.0]}),
+                     ('summary.doc', {'author':['you'], 'rating':[4.0]}),
+                     ('unrelated.doc', {'tag': ['misc']})]
+        index_main = medinx.MetadataIndex(test_data)
+
+        snapshot = index_main.snapshot()
+        self.assertEqual(snapshot.get_files(), index_main.get_files())
+
+        index_main.set_metadata_attr('report.doc', 'rating', [5.0])
+        index_main.set_metadata_attr('report.doc', 'reviewed', [True])
+        self.assertEqual(index_main.get_metadata('report.doc')['rating'], [5.0])
+        self.assertEqual(snapshot.get_metadata('report.doc'),
+                         {'author':['me'], 'rating':[2.0]})
+        self.assertNotIn('reviewed', snapshot.get_attributes())
+
+        # Unchanged entries are shared
+        self.assertIs(snapshot.get_metadata('summary.doc'),
+                      index_main.get_metadata('summary.doc'))
+
+        # Edition through a filtered view must not leak into the snapshot
+        selection = index_main.filter('author=you')
+        selection.set_metadata_attr('summary.doc', 'author', ['them'])
+        self.assertEqual(snapshot.get_metadata('summary.doc')['author'],
+                         ['you'])
+
+        self.assertEqual(snapshot.filter('rating>3').get_files(),
+                         ['summary.doc'])
+        self.assertRaises(medinx.ReadOnlyIndex, snapshot.set_metadata_attr,
+                          'report.doc', 'rating', [1.0])
+        self.assertRaises(medinx.ReadOnlyIndex,
+                          snapshot.filter('author=me').set_metadata_attr,
+                          'report.doc', 'rating', [1.0])
+
+    def test_snapshot_of_viewed_index(self):
+        test_data = [('report.doc', {'author':['me'], 'rating':[2.0]}),
+                     ('summary.doc', {'author':['you'], 'rating':[4.0]})]
+        index_main = medinx.MetadataIndex(test_data)
+
+        # View made before the snapshot
+        selection = index_main.filter('author=me')
+        snapshot = index_main.snapshot()
+        selection.set_metadata_attr('report.doc', 'rating', [1.0])
+        self.assertEqual(snapshot.get_metadata('report.doc')['rating'], [2.0])
+        self.assertEqual(index_main.get_metadata('report.doc')['rating'],
+                         [1.0])
+        self.assertEqual(selection.get_metadata('report.doc')['rating'], [1.0])
+
+        # Edits through views made after a snapshot reach the index and its
+        # saved files
+        index_main.snapshot()
+        index_main.filter('author=you').set_metadata_attr('summary.doc',
+                                                          'rating', [3.0])
+        self.assertEqual(index_main.get_metadata('summary.doc')['rating'],
+                         [3.0])
+        self.assertEqual(index_main.snapshot().get_metadata('summary.doc'),
+                         {'author':['you'], 'rating':[3.0]})
+
+        # Views of a view write in the first index
+        nested = index_main.filter('rating<5').filter('author=you')
+        nested.set_metadata_attr('summary.doc', 'author', ['them'])
+        self.assertEqual(index_main.get_metadata('summary.doc')['author'],
+                         ['them'])
+        self.assertEqual(snapshot.get_metadata('summary.doc')['author'],
+                         ['you'])
+
+    def test_compact_storage(self):
+        test_data = [('report.doc', {'author':['me', 'you'], 'rating':[1.0],
+                                     'reviewed':[True],
+                                     'review_date':[parse_date('2016-02-01'),
+                                                    parse_date('2016-02-01T12:00+02:00')]}),
+                     ('summary.doc', {'author':['me'], 'rating':[4.5],
+                                      'reviewed':[False], 'tag':[]})]
+        expected = [(fn, {a: list(vs) for a, vs in md.items()})
+                    for fn, md in test_data]
+        index_main = medinx.MetadataIndex(test_data)
+        index_main.compact()
+
+        for fn, md in expected:
+            self.assertEqual(index_main.get_metadata(fn), md)
+            for attr, values in md.items():
+                self.assertEqual([type(v) for v in index_main.get_metadata(fn)[attr]],
+                                 [type(v) for v in values])
+        self.assertEqual(index_main.get_metadata('report.doc')['review_date'][1].isoformat(),
+                         '2016-02-01T12:00:00+02:00')
+
+        self.assertEqual(index_main.filter('author=me rating>2').get_files(),
+                         ['summary.doc'])
+        self.assertEqual(index_main.filter('reviewed=True').get_files(),
+                         ['report.doc'])
+
+        index_main.set_metadata_attr('summary.doc', 'tag', ['new'])
+        self.assertEqual(index_main.get_metadata('summary.doc')['tag'], ['new'])
+
+    def test_load_folder_compact(self):
+        test_data = self._dump_test_files(self.test_data)
+        index_main = medinx.parse_folder(self.tmp_dir, compact=True)
+        index_ref = medinx.parse_folder(self.tmp_dir)
+
+        self.assertEqual(sorted(index_main.get_files()),
+                         sorted(index_ref.get_files()))
+        for fn in index_ref.get_files():
+            self.assertEqual(index_main.get_metadata(fn),
+                             index_ref.get_metadata(fn))
+
+    def test_iter_folder(self):
+        self._dump_test_files(self.test_data)
+        index_ref = medinx.parse_folder(self.tmp_dir)
+
+        entries = medinx.iter_folder(self.tmp_dir)
+        self.assertEqual(next(entries)[0], index_ref.get_files()[0])
+
+        index_main = medinx.MetadataIndex([])
+        for fn, md in medinx.iter_folder(self.tmp_dir):
+            index_main.add_entry(fn, md)
+        self.assertEqual(index_main.get_files(), index_ref.get_files())
+        self.assertEqual(index_main.get_attribute_types(),
+                         index_ref.get_attribute_types())
+
+        self.assertRaises(medinx._medinx.InconsistentValue,
+                          index_main.add_entry, 'bad.doc', {'tag':[],
+                                                            'rating':['high']})
+        self.assertNotIn('tag', index_main.get_attributes())
+        self.assertNotIn('bad.doc', index_main.get_files())
+
     def test_bad_queries(self):
         #TODO
         pass
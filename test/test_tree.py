@@ -0,0 +1,74 @@
+import unittest
+import os.path as op
+
+import medinx
+from medinx import DirTree
+
+class DirTreeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.paths = ['/data/a/x.doc', '/data/a/b/y.doc', '/data/a/b/z.doc',
+                      '/data/c/w.doc', '/data/c']
+
+    def test_counts(self):
+        tree = DirTree(self.paths)
+        self.assertEqual(len(tree), 5)
+        self.assertEqual(tree.top(), '/data')
+        self.assertEqual(tree.count('/data/a'), 3)
+        self.assertEqual(tree.count('/data/c'), 2)
+        self.assertEqual(tree.count('/data/missing'), 0)
+        self.assertEqual(tree.children('/data'), [('/data/a', 3), ('/data/c', 2)])
+        self.assertTrue(tree.is_entry('/data/c'))
+        self.assertFalse(tree.is_entry('/data/a'))
+
+        tree.remove('/data/a/b/y.doc')
+        tree.remove('/data/a/b/z.doc')
+        self.assertEqual(tree.children('/data/a'), [('/data/a/x.doc', 1)])
+        self.assertEqual(tree.count('/'), 3)
+        self.assertRaises(KeyError, tree.remove, '/data/a')
+
+    def test_format(self):
+        tree = DirTree(self.paths[:3])
+        self.assertEqual(tree.format(totals=DirTree(self.paths)),
+                         ['/data/a (3/3)',
+                          '├── b (2/2)',
+                          '│   ├── y.doc',
+                          '│   └── z.doc',
+                          '└── x.doc'])
+        self.assertEqual(tree.format('/data', max_depth=1),
+                         ['/data (3)', '└── a (3)'])
+
+    def test_index_tree(self):
+        index = medinx.MetadataIndex([(fn, {'author':['me' if '/a/' in fn else 'you']})
+                                      for fn in self.paths[:4]])
+        tree = index.get_tree()
+        self.assertEqual(tree.count('/data'), 4)
+        # Kept up to date as entries are added
+        index.add_entry('/data/c', {'author':['me']})
+        self.assertEqual(tree.count('/data'), 5)
+
+        tree = index.get_tree('author=you')
+        self.assertEqual(tree.children('/data'), [('/data/c', 1)])
+        tree = index.get_tree('', scope='/data/a/b')
+        self.assertEqual(len(tree), 2)
+
+        # Trees of queries are updated with changed entries
+        tree = index.get_tree('author=me')
+        self.assertIs(index.get_tree('author=me'), tree)
+        self.assertEqual(tree.count('/data'), 4)
+        index.set_metadata_attr('/data/c/w.doc', 'author', ['me'])
+        index.set_metadata_attr('/data/a/x.doc', 'author', ['you'])
+        index.add_entry('/data/d/v.doc', {'author':['me']})
+        self.assertEqual(tree.children('/data'), [('/data/a', 2), ('/data/c', 2),
+                                                  ('/data/d', 1)])
+        self.assertEqual(index.get_tree('author=you').children('/data'),
+                         [('/data/a', 1)])
+        self.assertEqual(index.get_views(), [])
+
+        # Only the last ones are kept
+        for i in range(medinx._medinx.TREE_CACHE_SIZE):
+            index.get_tree('author=%d' % i)
+        self.assertIsNot(index.get_tree('author=me'), tree)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import tempfile
+import shutil
+import os.path as op
+import os
+
+import medinx
+from medinx import SavedView, ChangeEvent
+from medinx._events import ENTRY_ADDED, ATTRIBUTE_SET
+from ._helpers import create_mdf_file
+
+class SavedViewTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='medinx_tmp_')
+        self.data_dir = op.join(self.tmp_dir, 'data')
+        for i in range(10):
+            create_mdf_file(self.data_dir, 'folder_%d/doc_%d.doc' % (i % 2, i),
+                                           {'author':['author_%d' % (i % 3)],
+                                            'rating':[float(i)]})
+        # Sidecar files modified just before a scan are parsed again by
+        # the next one (see _walk.ScanCache), make them older:
+        past = os.stat(self.data_dir).st_mtime_ns - 10 * 10**9
+        for folder, sub_folders, files in os.walk(self.data_dir):
+            for fn in files:
+                os.utime(op.join(folder, fn), ns=(past, past))
+        self.index = medinx.MetadataIndex.from_folder(self.data_dir)
+        self.changes = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _notified(self, view, added, removed):
+        self.changes.append(([op.basename(fn) for fn in added],
+                             [op.basename(fn) for fn in removed]))
+
+    def _names(self, view):
+        return sorted(op.basename(fn) for fn in view.get_files())
+
+    def test_edit_and_add(self):
+        view = self.index.register_view('top', 'rating>6')
+        view.subscribe(self._notified)
+        self.assertEqual(self._names(view), ['doc_7.doc', 'doc_8.doc', 'doc_9.doc'])
+        self.assertIsInstance(view, SavedView)
+        self.assertIs(self.index.get_view('top'), view)
+
+        fn = op.join(self.data_dir, 'folder_0', 'doc_0.doc')
+        self.index.set_metadata_attr(fn, 'rating', [10.0])
+        self.assertIn(fn, view)
+        self.index.set_metadata_attr(fn, 'author', ['me']) # no change of view
+        self.index.add_entry(op.join(self.data_dir, 'new.doc'), {'rating':[1.0]})
+        self.index.add_entry(op.join(self.data_dir, 'new2.doc'), {'rating':[8.0]})
+        self.assertEqual(self.changes, [(['doc_0.doc'], []), (['new2.doc'], [])])
+        self.assertEqual(len(view), 5)
+        self.assertEqual(sorted(self.index.filter('rating>6').get_files()),
+                         view.get_files())
+
+        # Views are not passed on to filtered indexes nor snapshots
+        self.assertEqual(self.index.snapshot()._saved_views, {})
+        self.index.unregister_view('top')
+        self.assertRaises(KeyError, self.index.get_view, 'top')
+
+    def test_edit_through_filtered_index(self):
+        view = self.index.register_view('top', 'rating>6')
+        view.subscribe(self._notified)
+        tree = self.index.get_tree('rating>6')
+        batches = []
+        self.index.subscribe(batches.append)
+
+        selection = self.index.filter('author=author_0').filter('rating<5')
+        fn = op.join(self.data_dir, 'folder_0', 'doc_0.doc')
+        selection.set_metadata_attr(fn, 'rating', [10.0])
+        new_fn = op.join(self.data_dir, 'folder_1', 'new.doc')
+        selection.add_entry(new_fn, {'rating':[8.0]})
+
+        self.assertEqual(self.changes, [(['doc_0.doc'], []), (['new.doc'], [])])
+        self.assertEqual(view.get_files(),
+                         sorted(self.index.filter('rating>6').get_files()))
+        self.assertEqual(tree.count(self.data_dir), 5)
+        self.assertEqual(batches, [[ChangeEvent(ATTRIBUTE_SET, fn, 'rating', [10.0])],
+                                   [ChangeEvent(ENTRY_ADDED, new_fn)]])
+        self.assertIn(new_fn, self.index.get_files())
+
+    def test_refresh(self):
+        view = self.index.register_view('mine', 'author=author_0',
+                                        scope=op.join(self.data_dir, 'folder_0'))
+        other = self.index.register_view('others', 'author!=author_0')
+        view.subscribe(self._notified)
+        self.assertEqual(self._names(view), ['doc_0.doc', 'doc_6.doc'])
+
+        evaluated = []
+        matches = view._matches
+        view._matches = lambda index, fn, md: evaluated.append(fn) or \
+                        matches(index, fn, md)
+
+        create_mdf_file(self.data_dir, 'folder_0/doc_2.doc', {'author':['author_0'],
+                                                              'rating':[20.0]})
+        create_mdf_file(self.data_dir, 'folder_1/doc_3.doc', {'author':['author_00']})
+        os.remove(op.join(self.data_dir, 'folder_0', 'doc_6.doc.mdf'))
+        self.index.refresh()
+        self.assertEqual(sorted(op.basename(fn) for fn in evaluated),
+                         ['doc_2.doc', 'doc_3.doc'])
+        self.assertEqual(self.changes, [(['doc_2.doc'], ['doc_6.doc'])])
+        self.assertEqual(self._names(view), ['doc_0.doc', 'doc_2.doc'])
+        self.assertEqual(sorted(other.get_files()),
+                         sorted(self.index.filter('author!=author_0').get_files()))
+
+    def test_fs_predicates(self):
+        view = self.index.register_view('big', 'file_size>13')
+        self.assertEqual(len(view), 0)
+        with open(op.join(self.data_dir, 'folder_1', 'doc_1.doc'), 'a') as fout:
+            fout.write('more_content')
+        self.index.refresh()
+        self.assertEqual(self._names(view), ['doc_1.doc'])
+
+    def test_invalid(self):
+        self.assertRaises(medinx._medinx.InvalidPredicateFormat,
+                          self.index.register_view, 'bad', 'author=')
+        self.assertRaises(medinx._medinx.InvalidPredicateFormat,
+                          self.index.filter, 'author=author_0rating>2')
+        self.assertEqual(self.index.get_views(), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,232 @@
+import unittest
+import tempfile
+import shutil
+import os.path as op
+import os
+import json
+import time
+
+import medinx
+from medinx._walk import iter_sidecars, PathFilter, DEFAULT_EXCLUDES, ScanCache
+from ._helpers import create_mdf_file
+
+class WalkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='medinx_tmp_')
+        for fn in ['top.doc', 'projects/a/report.doc', 'projects/a/old.bak',
+                   'projects/b/deep/er/note.txt', 'projects/b/deep',
+                   '.git/objects/blob', 'node_modules/pkg/index.js',
+                   'archives/2016/bill.pdf']:
+            create_mdf_file(self.tmp_dir, fn, {'tag':['x']})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _found(self, **options):
+        return sorted(op.relpath(fn, self.tmp_dir) for _, fn, _
+                      in iter_sidecars(self.tmp_dir, **options))
+
+    def test_default_excludes(self):
+        self.assertEqual(self._found(),
+                         ['archives/2016/bill.pdf', 'projects/a/old.bak',
+                          'projects/a/report.doc', 'projects/b/deep',
+                          'projects/b/deep/er/note.txt', 'top.doc'])
+        self.assertIn('.git/objects/blob', self._found(exclude=None))
+
+    def test_patterns(self):
+        self.assertEqual(self._found(exclude=DEFAULT_EXCLUDES + ['*.bak', 'archives/',
+                                                             'deep/']),
+                         ['projects/a/report.doc', 'top.doc'])
+        self.assertEqual(self._found(exclude=DEFAULT_EXCLUDES + ['projects/*/deep']),
+                         ['archives/2016/bill.pdf', 'projects/a/old.bak',
+                          'projects/a/report.doc', 'top.doc'])
+        self.assertEqual(self._found(exclude=DEFAULT_EXCLUDES + ['**/a',
+                                                             '!projects/a']),
+                         self._found())
+        self.assertEqual(self._found(include=['projects/b/'], exclude=None),
+                         ['projects/b/deep', 'projects/b/deep/er/note.txt'])
+        self.assertEqual(self._found(include=['*.doc', '*.pdf']),
+                         ['archives/2016/bill.pdf', 'projects/a/report.doc',
+                          'top.doc'])
+
+    def test_path_filter(self):
+        path_filter = PathFilter(exclude=['tmp/', '/build', 'a/**/z.txt'])
+        self.assertTrue(path_filter.is_excluded('src/tmp', True))
+        self.assertFalse(path_filter.is_excluded('src/tmp', False))
+        self.assertTrue(path_filter.is_excluded('build', True))
+        self.assertFalse(path_filter.is_excluded('src/build', True))
+        self.assertTrue(path_filter.is_excluded('a/z.txt', False))
+        self.assertTrue(path_filter.is_excluded('a/b/c/z.txt', False))
+
+    def test_max_depth(self):
+        self.assertEqual(self._found(max_depth=0), ['top.doc'])
+        self.assertEqual(self._found(max_depth=2),
+                         ['archives/2016/bill.pdf', 'projects/a/old.bak',
+                          'projects/a/report.doc', 'projects/b/deep', 'top.doc'])
+
+    def test_load_folder_with_options(self):
+        index_main = medinx.parse_folder(self.tmp_dir,
+                                        exclude=DEFAULT_EXCLUDES + ['projects/'])
+        self.assertEqual(sorted(op.relpath(fn, self.tmp_dir)
+                                for fn in index_main.get_files()),
+                         ['archives/2016/bill.pdf', 'top.doc'])
+
+    def test_missing_associated_file(self):
+        with open(op.join(self.tmp_dir, 'orphan.doc.mdf'), 'w') as fout:
+            fout.write(json.dumps({'tag':['x']}))
+        self.assertRaises(IOError, medinx.parse_folder, self.tmp_dir)
+
+    def test_tolerant_load(self):
+        with open(op.join(self.tmp_dir, 'orphan.doc.mdf'), 'w') as fout:
+            fout.write(json.dumps({'tag':['x']}))
+        create_mdf_file(self.tmp_dir, 'projects/bad_json.doc', {})
+        with open(op.join(self.tmp_dir, 'projects/bad_json.doc.mdf'), 'w') as fout:
+            fout.write('{"tag": [')
+        create_mdf_file(self.tmp_dir, 'projects/bad_type.doc', {'tag':[1.0]})
+
+        index_main = medinx.parse_folder(self.tmp_dir, tolerant=True)
+        self.assertEqual(len(index_main.get_files()), 6)
+        self.assertEqual(index_main.get_attribute_types(), {'tag':str})
+        errors = {op.relpath(e.path, self.tmp_dir) : type(e.error)
+                  for e in index_main.load_errors}
+        self.assertEqual(errors, {'orphan.doc.mdf' : OSError,
+                                  'projects/bad_json.doc.mdf' : json.JSONDecodeError,
+                                  'projects/bad_type.doc.mdf' :
+                                  medinx._medinx.InconsistentValue})
+
+        create_mdf_file(self.tmp_dir, 'projects/bad_json.doc', {'tag':['fixed']})
+        os.remove(op.join(self.tmp_dir, 'orphan.doc.mdf'))
+        index_main.refresh()
+        self.assertEqual(len(index_main.get_files()), 7)
+        self.assertEqual(len(index_main.load_errors), 1)
+
+        self.assertRaises(medinx._medinx.InconsistentValue,
+                          medinx.parse_folder, self.tmp_dir)
+
+    def test_follow_symlinks(self):
+        os.symlink(op.join(self.tmp_dir, 'projects'),
+                   op.join(self.tmp_dir, 'archives/projects_link'))
+        # Loop:
+        os.symlink(self.tmp_dir, op.join(self.tmp_dir, 'projects/a/root_link'))
+        os.symlink(op.join(self.tmp_dir, 'projects/b/deep'),
+                   op.join(self.tmp_dir, 'deep_link'))
+        create_mdf_file(self.tmp_dir, 'deep_link', {'tag':['x']})
+
+        self.assertNotIn('archives/projects_link/a/report.doc', self._found())
+        self.assertEqual(len(self._found()), 7)
+
+        # Each folder traversed once, deep_link and projects/b/deep are
+        # the same folder:
+        found = self._found(follow_symlinks=True)
+        self.assertEqual(len(found), 6)
+        self.assertEqual(len(set(op.realpath(op.join(self.tmp_dir, fn))
+                                 for fn in found)), 6)
+        self.assertIn('top.doc', found)
+        self.assertEqual(len(self._found(follow_symlinks=True, dedupe=False)), 7)
+
+    def test_dangling_symlink(self):
+        os.symlink(op.join(self.tmp_dir, 'missing.doc'),
+                   op.join(self.tmp_dir, 'dangling.doc'))
+        with open(op.join(self.tmp_dir, 'dangling.doc.mdf'), 'w') as fout:
+            fout.write(json.dumps({'tag':['x']}))
+
+        self.assertIn('dangling.doc', self._found(dedupe=True))
+        index_main = medinx.parse_folder(self.tmp_dir, tolerant=True,
+                                         follow_symlinks=True)
+        self.assertEqual(len(index_main.get_files()), 6)
+        self.assertEqual([op.relpath(e.path, self.tmp_dir)
+                          for e in index_main.load_errors],
+                         ['dangling.doc.mdf'])
+        self.assertRaises(IOError, medinx.parse_folder, self.tmp_dir,
+                          follow_symlinks=True)
+
+    def test_hardlinks(self):
+        os.link(op.join(self.tmp_dir, 'top.doc'),
+                op.join(self.tmp_dir, 'projects/top_link.doc'))
+        os.link(op.join(self.tmp_dir, 'top.doc.mdf'),
+                op.join(self.tmp_dir, 'projects/top_link.doc.mdf'))
+        create_mdf_file(self.tmp_dir, 'other.doc', {})
+        os.remove(op.join(self.tmp_dir, 'other.doc.mdf'))
+        os.link(op.join(self.tmp_dir, 'top.doc.mdf'),
+                op.join(self.tmp_dir, 'other.doc.mdf'))
+
+        self.assertIn('projects/top_link.doc', self._found())
+        found = self._found(dedupe=True)
+        self.assertEqual(len([fn for fn in found if 'top' in fn]), 1)
+        # Same sidecar, different associated files:
+        self.assertIn('other.doc', found)
+
+        index_main = medinx.parse_folder(self.tmp_dir, dedupe=True)
+        self.assertEqual(index_main.get_metadata(op.join(self.tmp_dir, 'other.doc')),
+                         {'tag':['x']})
+
+        # Paths of a hardlinked sidecar are edited independently
+        index_main = medinx.MetadataIndex.from_folder(self.tmp_dir)
+        index_main.set_metadata_attr(op.join(self.tmp_dir, 'other.doc'),
+                                     'tag', ['y'])
+        self.assertEqual(index_main.get_metadata(op.join(self.tmp_dir, 'top.doc')),
+                         {'tag':['x']})
+        self.assertEqual(index_main.get_metadata(op.join(self.tmp_dir,
+                                                         'projects/top_link.doc')),
+                         {'tag':['x']})
+
+    def test_refresh(self):
+        self._age_files()
+        cache = ScanCache()
+        index_main = medinx.parse_folder(self.tmp_dir, cache=cache)
+        top_fn = op.join(self.tmp_dir, 'top.doc')
+        index_main.set_metadata_attr(top_fn, 'tag', ['edited'])
+        # The cache keeps parsed values:
+        cached_top = cache.sidecars[top_fn + '.mdf'][1]
+        self.assertEqual(cached_top, {'tag':['x']})
+
+        create_mdf_file(self.tmp_dir, 'projects/a/report.doc', {'tag':['y', 'z']})
+        create_mdf_file(self.tmp_dir, 'projects/b/new.doc', {'tag':['new']})
+        os.remove(op.join(self.tmp_dir, 'archives/2016/bill.pdf.mdf'))
+        index_main.refresh()
+
+        index_ref = medinx.parse_folder(self.tmp_dir)
+        self.assertEqual(sorted(index_main.get_files()),
+                         sorted(index_ref.get_files()))
+        for fn in index_ref.get_files():
+            self.assertEqual(index_main.get_metadata(fn),
+                             index_ref.get_metadata(fn))
+        # Unchanged sidecar not parsed again, removed one forgotten:
+        self.assertIs(index_main.get_metadata(top_fn), cached_top)
+        self.assertNotIn(op.join(self.tmp_dir, 'archives/2016/bill.pdf.mdf'),
+                         cache.sidecars)
+
+    def test_view_edits_reach_index(self):
+        self._age_files()
+        cache = ScanCache()
+        index_main = medinx.parse_folder(self.tmp_dir, cache=cache)
+        top_fn = op.join(self.tmp_dir, 'top.doc')
+        index_main.filter('tag=x').set_metadata_attr(top_fn, 'tag', ['edited'])
+        self.assertEqual(index_main.get_metadata(top_fn), {'tag':['edited']})
+        self.assertEqual(cache.sidecars[top_fn + '.mdf'][1], {'tag':['x']})
+        # Unsaved editions are discarded by refresh
+        index_main.refresh()
+        self.assertEqual(index_main.get_metadata(top_fn), {'tag':['x']})
+
+    def test_unchanged_folder_not_listed(self):
+        self._age_files()
+        cache = ScanCache()
+        found = list(iter_sidecars(self.tmp_dir, cache=cache))
+        # Sidecar added without changing the folder mtime:
+        folder = op.join(self.tmp_dir, 'projects/a')
+        mtime_ns = os.stat(folder).st_mtime_ns
+        create_mdf_file(self.tmp_dir, 'projects/a/hidden.doc', {'tag':['x']})
+        os.utime(folder, ns=(mtime_ns, mtime_ns))
+        self.assertEqual(list(iter_sidecars(self.tmp_dir, cache=cache)), found)
+        self.assertEqual(len(list(iter_sidecars(self.tmp_dir))), len(found) + 1)
+
+    def _age_files(self):
+        """ Set mtimes in the past so that they are trusted by ScanCache """
+        mtime_ns = int((time.time() - 10) * 1e9)
+        for root, dirs, files in os.walk(self.tmp_dir):
+            for name in dirs + files:
+                os.utime(op.join(root, name), ns=(mtime_ns, mtime_ns))
+
+if __name__ == "__main__":
+    unittest.main()
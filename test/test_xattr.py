@@ -0,0 +1,94 @@
+import unittest
+import tempfile
+import shutil
+import os.path as op
+import os
+import json
+
+import medinx
+from medinx import _xattr
+from medinx._walk import MANIFEST_NAME
+from ._helpers import create_mdf_file
+
+@unittest.skipUnless(_xattr.is_supported(), 'extended attributes not supported')
+class XattrTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='medinx_tmp_')
+        self.test_data = [
+            ('report.doc', {'author':['me', 'you'], 'rating':[1.0],
+                            'review_date':['#2016-02-01T12:00:00+02:00']}),
+            ('docs/summary.doc', {'author':['them'], 'reviewed':[False]}),
+            ('docs', {'keyword':['folder']})]
+        for fn, md in self.test_data:
+            create_mdf_file(self.tmp_dir, fn, md)
+        try:
+            os.setxattr(op.join(self.tmp_dir, 'report.doc'), 'user.medinx_test', b'')
+        except OSError:
+            shutil.rmtree(self.tmp_dir)
+            self.skipTest('extended attributes not supported on temporary folder')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_import_export(self):
+        index_ref = medinx.parse_folder(self.tmp_dir)
+        self.assertEqual(medinx.import_xattrs(self.tmp_dir), 3)
+        self.assertFalse(op.exists(op.join(self.tmp_dir, 'report.doc.mdf')))
+        self.assertEqual(medinx.parse_folder(self.tmp_dir).get_files(), [])
+
+        index = medinx.MetadataIndex.from_folder(self.tmp_dir, backend='xattr')
+        self._assert_same_index(index, index_ref)
+
+        self.assertEqual(medinx.export_xattrs(self.tmp_dir), 3)
+        self.assertEqual(medinx.MetadataIndex.from_folder(self.tmp_dir,
+                                                          backend='xattr')
+                         .get_files(), [])
+        self._assert_same_index(medinx.parse_folder(self.tmp_dir), index_ref)
+
+    def test_save_and_refresh(self):
+        medinx.import_xattrs(self.tmp_dir)
+        index = medinx.MetadataIndex.from_folder(self.tmp_dir, backend='xattr',
+                                                 compact=True)
+        index.set_metadata_attr(op.join(self.tmp_dir, 'docs'), 'tag', ['edited'])
+        index.save()
+        self.assertFalse(op.exists(op.join(self.tmp_dir, 'docs.mdf')))
+        self.assertEqual(json.loads(os.getxattr(op.join(self.tmp_dir, 'docs'),
+                                                _xattr.XATTR_NAME).decode('utf-8')),
+                         {'keyword':['folder'], 'tag':['edited']})
+
+        _xattr.remove_xattr(op.join(self.tmp_dir, 'report.doc'))
+        index.refresh()
+        self.assertEqual(sorted(index.get_files()),
+                         [op.join(self.tmp_dir, fn) for fn in
+                          ['docs', 'docs/summary.doc']])
+        self.assertEqual(index.filter('tag=edited').get_files(),
+                         [op.join(self.tmp_dir, 'docs')])
+
+    def test_export_to_manifest(self):
+        medinx.import_xattrs(self.tmp_dir)
+        medinx.export_xattrs(self.tmp_dir, 'manifest')
+        with open(op.join(self.tmp_dir, 'docs', MANIFEST_NAME)) as fin:
+            self.assertEqual(json.load(fin), {'summary.doc' : {'author':['them'],
+                                                               'reviewed':[False]}})
+
+    def test_tolerant(self):
+        medinx.import_xattrs(self.tmp_dir)
+        os.setxattr(op.join(self.tmp_dir, 'report.doc'), _xattr.XATTR_NAME, b'{')
+        self.assertRaises(ValueError, medinx.MetadataIndex.from_folder,
+                          self.tmp_dir, backend='xattr')
+        index = medinx.MetadataIndex.from_folder(self.tmp_dir, backend='xattr',
+                                                 tolerant=True)
+        self.assertEqual(len(index.get_files()), 2)
+        self.assertEqual([e.path for e in index.load_errors],
+                         [op.join(self.tmp_dir, 'report.doc')])
+
+    def _assert_same_index(self, index_main, index_ref):
+        self.assertEqual(sorted(index_main.get_files()),
+                         sorted(index_ref.get_files()))
+        for fn in index_ref.get_files():
+            self.assertEqual(index_main.get_metadata(fn),
+                             index_ref.get_metadata(fn))
+
+if __name__ == "__main__":
+    unittest.main()